@@ -0,0 +1,52 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from ..core.config import settings
+from ..core.profiling import profiler
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(default=None)):
+    if not x_profile_token or not hmac.compare_digest(x_profile_token.encode("latin-1"), settings.PROFILING_TOKEN.encode("latin-1")):
+        raise HTTPException(status_code=403, detail="Token profiling tidak valid.")
+
+# Only included by main.py when PROFILING_TOKEN is set
+router = APIRouter(dependencies=[Depends(require_profiling_token)])
+
+@router.post("/profiles")
+def start_profile(
+    seconds: int = Query(default=30, ge=1, le=settings.PROFILE_MAX_WINDOW_SECONDS),
+    label: str = "window"
+):
+    """
+    Endpoint untuk memprofil semua pekerjaan worker ini selama `seconds` detik.
+    Hasilnya dapat dibaca di /profiles/{id} setelah selesai.
+    """
+    session = profiler.start_window(seconds, label)
+    return {"id": session.id, "kind": session.kind, "seconds": seconds}
+
+@router.get("/profiles")
+def list_profiles():
+    """
+    Endpoint untuk melihat daftar profil yang sedang berjalan dan yang tersimpan.
+    """
+    return {"profiles": profiler.list_profiles()}
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Endpoint untuk membaca ringkasan profil: fungsi terpanas (self/total) dan waktu per kelompok thread.
+    """
+    summary = profiler.load(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profil tidak ditemukan.")
+    return summary
+
+@router.get("/profiles/{profile_id}/download")
+def download_profile(profile_id: str):
+    """
+    Endpoint untuk mengunduh stack lengkap profil (format folded, untuk flamegraph.pl atau speedscope).
+    """
+    path = profiler.folded_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil tidak ditemukan atau belum selesai.")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{profile_id}.folded")
@@ -1,22 +1,52 @@
-from fastapi import APIRouter, HTTPException
-from .schemas import AnalyzeRequest, AnalyzeResponse, ChatRequest, ChatResponse, ChartData, ProductMetadata, SellerReputation
-from ..services import scraper_service, rag_service, analysis_service
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from .schemas import (
+    AnalyzeRequest, AnalyzeResponse, ChatRequest, ChatResponse, ChartData, ProductMetadata, ReviewPage,
+    SellerReputation, StoredAnalysis
+)
+from ..services import scraper_service, rag_service, analysis_service, topic_service
+from ..services.results_store import get_results_store, review_source
+from ..services.seller_reputation_service import analyze_seller_reputation
 from ..services.system_metrics_service import system_metrics
+from ..core import executors, priority, startup
+from ..core.admission import scrape_admission
+from ..core.config import settings
+from ..core.executors import analysis_executor, scrape_executor
+from ..core.shared_state import get_shared_state
 
 # --- INI ADALAH BARIS YANG HILANG ATAU SALAH ---
 # Mendefinisikan instance APIRouter yang akan kita gunakan
 # untuk semua endpoint di file ini.
 router = APIRouter()
+
+logger = logging.getLogger(__name__)
 # ----------------------------------------------------
 
 # Endpoint sekarang harus menggunakan @router, bukan @app
 @router.post("/analyze", response_model=AnalyzeResponse)
-def analyze_product(request: AnalyzeRequest):
+async def analyze_product(request: AnalyzeRequest):
     """
     Endpoint untuk memulai analisis produk dengan real sentiment analysis dan seller reputation.
     """
-    # Use comprehensive scraping that includes seller reputation
-    comprehensive_data = scraper_service.scrape_product_with_seller_reputation(request.url, max_reviews=40)
+    # Shed load with 429 up front if the scrape queue is already too long. Both paths submit
+    # their scrape job before the next await, so the next request's admit() counts it.
+    scrape_admission.admit()
+    product_id = scraper_service.get_product_id(request.url)
+    if request.streaming:
+        return await _analyze_product_streaming(request, product_id)
+
+    # Use comprehensive scraping that includes seller reputation; browser work waits for a scrape worker
+    comprehensive_data = await scrape_executor.run(
+        scraper_service.scrape_product_with_seller_reputation, request.url, max_reviews=request.max_reviews
+    )
     
     reviews_data = comprehensive_data.get("reviews_data", [])
     metadata = comprehensive_data.get("metadata", {})
@@ -29,34 +59,319 @@ def analyze_product(request: AnalyzeRequest):
     # Extract just the text for RAG (backward compatibility)
     review_texts = [review["text"] for review in reviews_data if "text" in review]
     
-    index_message = rag_service.create_vector_store(review_texts)
-    summary = rag_service.generate_initial_summary(review_texts)
-    
-    # Use new analysis function with real rating data
-    chart_data_dict = analysis_service.analyze_sentiments_and_topics(reviews_data)
+    # Condense the product description for chat prompts in the background
+    rag_service.llm_gateway.submit(rag_service.condense_description(metadata.get("description", "")))
+
+    # Indexing, storing, the summary and the analysis with real rating data are independent; run them together
+    index_message, summary, chart_data_dict, topic_clusters, _ = await asyncio.gather(
+        analysis_executor.run(rag_service.create_vector_store, review_texts, product_id),
+        rag_service.generate_initial_summary(reviews_data),
+        analysis_executor.run(analysis_service.analyze_sentiments_and_topics, reviews_data),
+        analysis_executor.run(topic_service.cluster_review_topics, reviews_data),
+        analysis_executor.run(_store_reviews, product_id, request.url, reviews_data)
+    )
+    chart_data_dict["topic_clusters"] = topic_clusters
     
-    return AnalyzeResponse(
+    response = AnalyzeResponse(
         message=f"Analisis selesai dengan seller reputation. {index_message}",
+        product_id=product_id,
+        summary=summary,
+        product_metadata=ProductMetadata(**metadata),
+        seller_reputation=SellerReputation(**seller_reputation),
+        chart_data=ChartData(**chart_data_dict)
+    )
+    await analysis_executor.run(_store_analysis, response)
+    return response
+
+async def _analyze_product_streaming(request: AnalyzeRequest, product_id: str) -> AnalyzeResponse:
+    """
+    Streaming mode: reviews flow from the scraper through sentiment, keyword counting,
+    snippet selection and RAG indexing one page at a time, so memory stays constant
+    no matter how many reviews are requested. The browser work is one scrape job
+    (one browser slot); analysis and indexing run on an analysis worker fed through
+    a bounded handoff, so CPU and embedding work never hold a browser slot.
+    """
+    handoff = _ReviewHandoff(settings.STREAM_HANDOFF_MAX_REVIEWS)
+    # Submitted synchronously so the scrape slot is taken before this handler first yields
+    scrape = scrape_executor.submit(_scrape_product_streaming, request.url, request.max_reviews, handoff)
+    scrape.add_done_callback(_log_scrape_failure)
+    try:
+        # Only take an analysis worker once the browser is delivering reviews, or the scrape ended without any
+        ready = asyncio.ensure_future(handoff.ready.wait())
+        try:
+            await asyncio.wait({scrape, ready}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            ready.cancel()
+        if not handoff.ready.is_set():
+            await scrape  # Finished without handing anything over, so it raised; surface that error
+        analyzer, index_message = await analysis_executor.run(_analyze_and_index_reviews, handoff, request, product_id)
+    except BaseException as e:
+        handoff.close(failed=True)
+        scrape.cancel()  # Drops the job if it is still queued; a running one stops at its next review
+        if handoff.error is not None and not isinstance(e, asyncio.CancelledError):
+            # The browser side failed first; report that rather than the empty stream it left behind
+            raise handoff.error
+        raise
+    metadata, seller_reputation = await scrape
+
+    # Summary and topics work on a bounded reservoir sample of the stream
+    rag_service.llm_gateway.submit(rag_service.condense_description(metadata.get("description", "")))
+    summary, topic_clusters = await asyncio.gather(
+        rag_service.generate_initial_summary(analyzer.sample),
+        analysis_executor.run(topic_service.cluster_review_topics, analyzer.sample)
+    )
+
+    chart_data_dict = analyzer.result()
+    chart_data_dict["topic_clusters"] = topic_clusters
+
+    response = AnalyzeResponse(
+        message=f"Analisis streaming selesai untuk {analyzer.total_reviews} ulasan. {index_message}",
+        product_id=product_id,
         summary=summary,
         product_metadata=ProductMetadata(**metadata),
         seller_reputation=SellerReputation(**seller_reputation),
         chart_data=ChartData(**chart_data_dict)
     )
+    await analysis_executor.run(_store_analysis, response)
+    return response
+
+class _ReviewHandoff:
+    """
+    Bounded queue between the scrape worker producing reviews and the analysis
+    worker consuming them. The producer blocks once maxsize reviews are waiting
+    and learns from put() when the consumer stopped reading (indexing gave up or
+    the request failed), so it can close the browser instead of scraping pages
+    nobody reads.
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize: int):
+        self._queue = queue.Queue(maxsize)
+        self._loop = asyncio.get_running_loop()
+        self._drained = False
+        self.stopped = threading.Event()
+        self.failed = False  # The request failed; the producer skips its remaining browser work
+        self.error: Optional[BaseException] = None  # Set by the producer if scraping raised
+        self.ready = asyncio.Event()  # Set on the event loop once the first review (or the end) is queued
+
+    def put(self, review: dict) -> bool:
+        """Queue a review from the scrape worker; False once the consumer stopped reading."""
+        while not self.stopped.is_set():
+            try:
+                self._queue.put(review, timeout=0.5)
+            except queue.Full:
+                continue
+            if not self.ready.is_set():
+                self._loop.call_soon_threadsafe(self.ready.set)
+            return True
+        return False
+
+    def finish(self):
+        self.put(self._END)
+
+    def close(self, failed: bool = False):
+        """Called when the consumer is done; before the end of the stream this stops the producer."""
+        self.failed = self.failed or failed
+        if not self._drained:
+            self.stopped.set()
+
+    def __iter__(self):
+        while True:
+            try:
+                review = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    return  # The request was abandoned and the producer will not send the end marker
+                continue
+            if review is self._END:
+                self._drained = True
+                return
+            yield review
+
+def _scrape_product_streaming(url: str, max_reviews: int, handoff: _ReviewHandoff):
+    """
+    The browser part of streaming mode, run as one scrape job: product metadata,
+    then reviews handed over page by page as they are parsed, then seller
+    reputation. Returns None if the request failed on the analysis side.
+    """
+    reviews_iter = None
+    try:
+        metadata = scraper_service.scrape_product_metadata(url)
+        reviews_iter = scraper_service.iter_product_reviews(url, max_reviews)
+        for review in reviews_iter:
+            if not handoff.put(review):
+                break
+    except BaseException as e:
+        handoff.error = e
+        raise
+    finally:
+        if reviews_iter is not None:
+            reviews_iter.close()  # Quits the browser if we stopped early
+        handoff.finish()
+    if handoff.failed:
+        return None
+    return metadata, analyze_seller_reputation(url)
+
+def _log_scrape_failure(scrape: asyncio.Future):
+    """Retrieve the streaming scrape's exception so it is logged even when the request ended first."""
+    if not scrape.cancelled() and scrape.exception() is not None:
+        logger.warning(f"[ANALYZE] Streaming scrape failed: {scrape.exception()!r}")
+
+def _analyze_and_index_reviews(handoff: _ReviewHandoff, request: AnalyzeRequest, product_id: str):
+    """
+    The analysis part of streaming mode, run on one analysis worker: reviews from
+    the scrape worker are analysed, stored and indexed as they arrive.
+    """
+    try:
+        reviews_iter = iter(handoff)
+        first_review = next(reviews_iter, None)
+        if first_review is None or "ERROR:" in first_review.get("text", ""):
+            error_msg = first_review.get("text", "") if first_review else "Gagal mengambil ulasan."
+            raise HTTPException(status_code=400, detail=error_msg)
+
+        analyzer = analysis_service.StreamingReviewAnalyzer()
+        analyzed_reviews = analyzer.consume(itertools.chain([first_review], reviews_iter))
+        stored_reviews = get_results_store().record_reviews(product_id, review_source(request.url), analyzed_reviews)
+        index_message = rag_service.create_vector_store(
+            (review["text"] for review in stored_reviews if "ERROR:" not in review.get("text", "")),
+            product_id
+        )
+    except BaseException:
+        handoff.close(failed=True)
+        raise
+    handoff.close()
+    return analyzer, index_message
+
+def _store_reviews(product_id: str, url: str, reviews_data: list):
+    get_results_store().save_reviews(product_id, review_source(url), reviews_data)
+
+def _store_analysis(response: AnalyzeResponse):
+    """Keep the latest analysis so it can be read back without scraping again."""
+    get_results_store().save_analysis(response.product_id, response.model_dump(exclude={"product_id"}))
+
+@router.get("/products/{product_id}/reviews", response_model=ReviewPage)
+def get_stored_reviews(
+    product_id: str,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    rating: Optional[int] = Query(default=None, ge=1, le=5),
+    source: Optional[str] = None
+):
+    """
+    Endpoint untuk membaca ulasan tersimpan dari analisis sebelumnya, per halaman.
+    Gunakan next_cursor dari respons sebagai ?cursor= untuk halaman berikutnya.
+    """
+    store = get_results_store()
+    try:
+        reviews, next_cursor, total = store.get_reviews(product_id, limit, cursor, rating, source)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid.")
+    if not reviews and cursor is None and store.get_analysis(product_id) is None:
+        raise HTTPException(status_code=404, detail="Produk belum pernah dianalisis.")
+    return ReviewPage(product_id=product_id, reviews=reviews, total=total, next_cursor=next_cursor)
+
+@router.get("/products/{product_id}/analysis", response_model=StoredAnalysis)
+def get_stored_analysis(product_id: str, request: Request, response: Response):
+    """
+    Endpoint untuk membaca hasil analisis terakhir (ringkasan, chart data, seller reputation) tanpa scraping ulang.
+    Mendukung If-None-Match: jika ETag sama, dibalas 304 tanpa body.
+    """
+    stored = get_results_store().get_analysis(product_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Produk belum pernah dianalisis.")
+    analyzed_at, analysis, etag = stored
+
+    # Browsers and proxies may reuse the result until the scrape goes stale, then revalidate with the ETag
+    max_age = max(0, int(analyzed_at + settings.SCRAPE_RESULT_TTL_SECONDS - time.time()))
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if max_age else "public, no-cache"
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    return StoredAnalysis(product_id=product_id, analyzed_at=analyzed_at, **analysis)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: a W/ prefix is ignored, "*" matches any current version."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+async def _cancel_on_disconnect(http_request: Request, coroutine, poll_interval: float = 0.5):
+    """Await coroutine, cancelling it (and the LLM call behind it) if the client goes away first."""
+    task = asyncio.ensure_future(coroutine)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=poll_interval)
+        if done:
+            return task.result()
+        if await http_request.is_disconnected():
+            task.cancel()
+            raise HTTPException(status_code=499, detail="Klien memutus koneksi.")
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_with_reviews(request: ChatRequest):
+async def chat_with_reviews(request: ChatRequest, http_request: Request):
     """
     Endpoint untuk mengirim pertanyaan ke RAG pipeline.
     """
     if not request.query:
         raise HTTPException(status_code=400, detail="Pertanyaan tidak boleh kosong.")
     
-    answer = rag_service.query_rag(request.query, request.product_metadata)
+    answer = await _cancel_on_disconnect(
+        http_request,
+        rag_service.query_rag(request.query, request.product_id, request.product_metadata)
+    )
     return ChatResponse(answer=answer)
 
+@router.post("/chat/stream")
+async def chat_with_reviews_stream(request: ChatRequest, http_request: Request):
+    """
+    Versi streaming dari /chat: jawaban dikirim per token sebagai Server-Sent Events.
+    Setiap event `data` berisi {"token": "..."}; event `done` menandai akhir jawaban.
+    Generasi dihentikan bila klien memutus koneksi.
+    """
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Pertanyaan tidak boleh kosong.")
+
+    tokens = rag_service.stream_rag(request.query, request.product_id, request.product_metadata)
+
+    async def event_stream():
+        try:
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    break
+                yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+            else:
+                yield "event: done\ndata: {}\n\n"
+        finally:
+            await tokens.aclose()  # Cancels the upstream generation if it is still running
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/system-stats")
 def get_system_stats():
     """
     Endpoint untuk mengambil statistik sistem real-time.
     """
-    return system_metrics.get_all_metrics()
\ No newline at end of file
+    stats = system_metrics.get_all_metrics()
+    stats["vector_stores"] = rag_service.vector_store_registry.stats()
+    stats["embedding_cache"] = rag_service.embedding_cache_stats()
+    stats["retrieval"] = dict(rag_service.retrieval_stats)
+    stats["llm_gateway"] = rag_service.llm_gateway.stats()
+    stats["executors"] = executors.all_stats()
+    stats["admission"] = scrape_admission.stats()
+    stats["priority"] = priority.scheduler.stats()
+    stats["shared_state"] = get_shared_state().stats()
+    stats["startup"] = startup.report()
+    stats["chat_context"] = dict(rag_service.context_stats)
+    stats["llm_cache"] = {
+        "summaries": rag_service.summary_cache.stats(),
+        "chat_answers": rag_service.chat_answer_cache.stats()
+    }
+    return stats
\ No newline at end of file
@@ -1,8 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 
 class AnalyzeRequest(BaseModel):
     url: str
+    max_reviews: int = Field(default=40, ge=1, le=50000)
+    # Streaming mode processes reviews page by page with constant memory; use it for large max_reviews
+    streaming: bool = False
 
 class ProductMetadata(BaseModel):
     product_title: Optional[str] = None
@@ -38,10 +41,33 @@ class ChartData(BaseModel):
     positive_keywords: List[Dict[str, Any]]
     negative_keywords: List[Dict[str, Any]]
     review_snippets: Optional[List[Dict[str, Any]]] = []
+    topic_clusters: Optional[List[Dict[str, Any]]] = []
     analysis_summary: Optional[Dict[str, Any]] = None
 
 class AnalyzeResponse(BaseModel):
     message: str
+    product_id: Optional[str] = None
+    summary: str
+    product_metadata: Optional[ProductMetadata] = None
+    seller_reputation: Optional[SellerReputation] = None
+    chart_data: ChartData
+
+class StoredReview(BaseModel):
+    id: int
+    text: str
+    rating: Optional[int] = None
+    source: str
+    scraped_at: float
+
+class ReviewPage(BaseModel):
+    product_id: str
+    reviews: List[StoredReview]
+    total: Optional[int] = None  # Reviews matching the filters, across all pages; first page only
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; null on the last page
+
+class StoredAnalysis(BaseModel):
+    product_id: str
+    analyzed_at: float
     summary: str
     product_metadata: Optional[ProductMetadata] = None
     seller_reputation: Optional[SellerReputation] = None
@@ -49,6 +75,7 @@ class AnalyzeResponse(BaseModel):
 
 class ChatRequest(BaseModel):
     query: str
+    product_id: str  # From AnalyzeResponse.product_id
     product_metadata: Optional[ProductMetadata] = None
 
 class ChatResponse(BaseModel):
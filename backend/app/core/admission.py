@@ -0,0 +1,80 @@
+import logging
+import math
+import threading
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from .config import settings
+from .executors import BoundedExecutor, scrape_executor
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionController:
+    """
+    Rejects work up front when the executor behind it is saturated. The wait a
+    new job would see is predicted from the executor's queue depth, worker count
+    and recent run times; above max_wait_seconds the request is shed with 429
+    and a Retry-After of when the backlog should have drained enough, instead of
+    queueing until the client times out.
+    """
+
+    def __init__(self, executor: BoundedExecutor, max_wait_seconds: float, default_run_seconds: float):
+        self.executor = executor
+        self.max_wait_seconds = max_wait_seconds
+        self.default_run_seconds = default_run_seconds
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.shed = 0
+        self.last_predicted_wait = 0.0
+
+    def _average_run_seconds(self) -> float:
+        run_times = list(self.executor.run_times)
+        return sum(run_times) / len(run_times) if run_times else self.default_run_seconds
+
+    def predicted_wait(self) -> float:
+        """Seconds a job submitted now would wait for a worker."""
+        workers = self.executor.max_workers
+        jobs_ahead = self.executor.active + self.executor.queued - workers + 1
+        if jobs_ahead <= 0:
+            return 0.0
+        # Workers free up in waves of max_workers jobs; in-progress jobs are assumed half done
+        return (math.ceil(jobs_ahead / workers) - 0.5) * self._average_run_seconds()
+
+    def admit(self):
+        """Raise HTTPException 429 with Retry-After if the request should be shed."""
+        wait = self.predicted_wait()
+        with self._lock:
+            self.last_predicted_wait = wait
+            if wait <= self.max_wait_seconds:
+                self.admitted += 1
+                return
+            self.shed += 1
+        retry_after = max(1, math.ceil(wait - self.max_wait_seconds))
+        logger.warning(
+            f"[ADMISSION] Shedding {self.executor.name} request: predicted wait {wait:.1f}s "
+            f"> {self.max_wait_seconds:g}s, retry after {retry_after}s"
+        )
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server sedang sibuk. Silakan coba lagi dalam {retry_after} detik.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.admitted + self.shed
+        return {
+            "max_wait_seconds": self.max_wait_seconds,
+            "predicted_wait_seconds": round(self.predicted_wait(), 1),
+            "last_predicted_wait_seconds": round(self.last_predicted_wait, 1),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "shed_rate": round(self.shed / total * 100, 2) if total else 0.0
+        }
+
+
+# Guards /analyze: every admitted request needs a scrape worker (one browser)
+scrape_admission = AdmissionController(
+    scrape_executor, settings.ADMISSION_MAX_WAIT_SECONDS, settings.ADMISSION_DEFAULT_SCRAPE_SECONDS
+)
@@ -5,8 +5,98 @@ load_dotenv()
 
 class Settings:
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    # Upper bound for vector stores kept in memory across all products (LRU eviction beyond it)
+    VECTOR_STORE_MEMORY_BUDGET_MB: int = int(os.getenv("VECTOR_STORE_MEMORY_BUDGET_MB", "512"))
+    # On-disk location of the per-product Chroma collections
+    CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "chroma_db")
+    # Products with at most this many chunks use the in-process NumPy index instead of Chroma
+    FLAT_INDEX_MAX_CHUNKS: int = int(os.getenv("FLAT_INDEX_MAX_CHUNKS", "2000"))
+    # Content-addressed embedding cache (memory-mapped vectors + SQLite index)
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+    # SQLite file with stored reviews and the latest analysis per product (read-back API)
+    RESULTS_DB_PATH: str = os.getenv("RESULTS_DB_PATH", "results_store/results.sqlite")
+    # How long a scrape stays fresh; stored analyses are served with Cache-Control max-age counting down from it
+    SCRAPE_RESULT_TTL_SECONDS: int = int(os.getenv("SCRAPE_RESULT_TTL_SECONDS", "86400"))
+    # Embedding pipeline: texts per API call, batches in flight, retries on quota errors
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+    # Embedding backend: "remote" (Gemini API), "local" (sentence-transformers on CPU) or "fake" (offline)
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "remote").lower()
+    LOCAL_EMBEDDING_MODEL: str = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    LOCAL_EMBEDDING_BATCH_SIZE: int = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+    LOCAL_EMBEDDING_THREADS: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", "4"))
+    # Load the local embedding model at startup instead of on the first request
+    LOCAL_EMBEDDING_WARMUP: bool = os.getenv("LOCAL_EMBEDDING_WARMUP", "true").lower() == "true"
 
-settings = Settings()
+    # Answer keyword-heavy chat questions (sizes, model codes) from BM25 alone, without a query embedding
+    LEXICAL_FAST_PATH: bool = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+    # LLM gateway: "gemini" or "fake" (offline stand-in), concurrent call cap and per-call deadlines
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "gemini").lower()
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_STREAM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_STREAM_TIMEOUT_SECONDS", "120"))
+    FAKE_LLM_LATENCY: float = float(os.getenv("FAKE_LLM_LATENCY", "1.0"))
+    # Map-reduce summary: tokens per map/reduce prompt, partial summaries merged per reduce call,
+    # LLM calls in flight, characters kept per review, map prompts per summary (past it reviews are sampled)
+    SUMMARY_GROUP_TOKEN_BUDGET: int = int(os.getenv("SUMMARY_GROUP_TOKEN_BUDGET", "3000"))
+    SUMMARY_REDUCE_FAN_IN: int = int(os.getenv("SUMMARY_REDUCE_FAN_IN", "8"))
+    SUMMARY_MAX_CONCURRENCY: int = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))
+    SUMMARY_REVIEW_MAX_CHARS: int = int(os.getenv("SUMMARY_REVIEW_MAX_CHARS", "600"))
+    SUMMARY_MAX_MAP_GROUPS: int = int(os.getenv("SUMMARY_MAX_MAP_GROUPS", "64"))
+    # Chat prompt budgets (estimated tokens) for retrieved review context and the product description
+    CHAT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1000"))
+    CHAT_DESCRIPTION_TOKEN_BUDGET: int = int(os.getenv("CHAT_DESCRIPTION_TOKEN_BUDGET", "250"))
+    # LLM response caches: summaries match on the exact prompt, chat answers on query similarity per product
+    SUMMARY_CACHE_TTL_SECONDS: int = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "86400"))
+    SUMMARY_CACHE_MAX_ENTRIES: int = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "256"))
+    CHAT_CACHE_TTL_SECONDS: int = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+    CHAT_CACHE_MAX_ENTRIES_PER_PRODUCT: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES_PER_PRODUCT", "200"))
+    CHAT_CACHE_MAX_PRODUCTS: int = int(os.getenv("CHAT_CACHE_MAX_PRODUCTS", "500"))
+    CHAT_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("CHAT_CACHE_SIMILARITY_THRESHOLD", "0.95"))
 
-if not settings.GEMINI_API_KEY:
-    raise ValueError("FATAL ERROR: GEMINI_API_KEY tidak ditemukan di file .env")
\ No newline at end of file
+    # Browser pool size: scrapes running at once (each holds one headless Chrome); more wait in a queue
+    SCRAPE_MAX_CONCURRENCY: int = int(os.getenv("SCRAPE_MAX_CONCURRENCY", "2"))
+    # Threads for blocking post-scrape work (indexing, sentiment analysis, topic clustering)
+    ANALYSIS_MAX_WORKERS: int = int(os.getenv("ANALYSIS_MAX_WORKERS", "4"))
+    # Streaming /analyze: reviews buffered between the scrape worker and the analysis worker indexing them;
+    # the browser pauses when the buffer is full
+    STREAM_HANDOFF_MAX_REVIEWS: int = int(os.getenv("STREAM_HANDOFF_MAX_REVIEWS", "200"))
+    # /analyze is rejected with 429 once the predicted wait for a scrape worker exceeds this
+    ADMISSION_MAX_WAIT_SECONDS: float = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "60"))
+    # Assumed scrape duration until the scrape executor has measured some
+    ADMISSION_DEFAULT_SCRAPE_SECONDS: float = float(os.getenv("ADMISSION_DEFAULT_SCRAPE_SECONDS", "45"))
+    # Request priority lanes as name=max_concurrency:weight. Each lane has its own budget; free
+    # server-wide slots go to waiting lanes in proportion to weight. /analyze is bulk, the rest interactive
+    PRIORITY_LANES: str = os.getenv("PRIORITY_LANES", "interactive=64:8,bulk=8:2,background=4:1")
+    # Requests handled at once across all lanes
+    PRIORITY_MAX_CONCURRENCY: int = int(os.getenv("PRIORITY_MAX_CONCURRENCY", "64"))
+    # State shared by uvicorn workers (caches, reindex generations, metrics): "sqlite" (file below,
+    # works with --workers N on one host) or "memory" (single worker only)
+    SHARED_STATE_BACKEND: str = os.getenv("SHARED_STATE_BACKEND", "sqlite").lower()
+    SHARED_STATE_PATH: str = os.getenv("SHARED_STATE_PATH", "shared_state/state.sqlite")
+    # How often each worker publishes its metrics for cluster-wide /system-stats
+    METRICS_PUBLISH_INTERVAL_SECONDS: float = float(os.getenv("METRICS_PUBLISH_INTERVAL_SECONDS", "5"))
+    # Sliding window for latency percentiles (p50/p95/p99) per route and pipeline stage
+    METRICS_WINDOW_SECONDS: float = float(os.getenv("METRICS_WINDOW_SECONDS", "300"))
+    # Enables on-demand profiling when set: requests carrying "X-Profile-Token: <token>" are profiled,
+    # and /api/v1/admin/profiles starts window profiles and serves results. Unset, nothing is installed
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    # Stack sampling interval across all threads while a profile is running
+    PROFILE_SAMPLE_INTERVAL_MS: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+    PROFILE_TOP_FUNCTIONS: int = int(os.getenv("PROFILE_TOP_FUNCTIONS", "25"))
+    PROFILE_MAX_WINDOW_SECONDS: int = int(os.getenv("PROFILE_MAX_WINDOW_SECONDS", "300"))
+    # Stored profiles kept on disk; the oldest are deleted beyond this
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "50"))
+    # Subsystems to initialise at startup instead of on first use, comma-separated
+    # (llm, embeddings, embedding_pipeline, vector_store, results_store, shared_state); empty for the fastest start
+    STARTUP_WARMUP: list = [name.strip() for name in os.getenv("STARTUP_WARMUP", "").split(",") if name.strip()]
+
+    def require_gemini_api_key(self) -> str:
+        """Checked when the Gemini client is first built, not at import, so workers without LLM traffic still start."""
+        if not self.GEMINI_API_KEY:
+            raise ValueError("FATAL ERROR: GEMINI_API_KEY tidak ditemukan di file .env")
+        return self.GEMINI_API_KEY
+
+settings = Settings()
\ No newline at end of file
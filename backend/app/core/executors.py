@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """
+    Named thread pool for one kind of blocking work, awaited from async
+    handlers. Work beyond max_workers waits in the pool's queue instead of
+    taking threads from Starlette's shared threadpool, so long scrapes cannot
+    starve cheap endpoints. Queue depth and time spent waiting are tracked.
+    """
+
+    registry: Dict[str, "BoundedExecutor"] = {}
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0  # jobs that returned
+        self.failed = 0  # jobs that raised
+        self.wait_times = deque(maxlen=1000)  # seconds from submit to start, last 1000 jobs
+        self.run_times = deque(maxlen=1000)  # seconds each job held a worker, last 1000 jobs
+        BoundedExecutor.registry[name] = self
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> "asyncio.Future[Any]":
+        """
+        Queue fn(*args, **kwargs) on this pool now and return an awaitable future.
+        The job counts as queued from this call rather than from the caller's next
+        await, so admission decisions taken in between already see it. Cancelling
+        the future drops a job that is still queued; a running one finishes in its thread.
+        """
+        submitted_at = time.time()
+        with self._lock:
+            self.queued += 1
+
+        def _job():
+            started_at = time.time()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.wait_times.append(started_at - submitted_at)
+            succeeded = False
+            try:
+                result = fn(*args, **kwargs)
+                succeeded = True
+                return result
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    if succeeded:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    # Failed jobs held a worker too, so they count towards the slot times admission predicts from
+                    self.run_times.append(time.time() - started_at)
+
+        future = self._pool.submit(_job)
+        future.add_done_callback(self._release_if_dropped)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on this pool and await its result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def _release_if_dropped(self, future: Future):
+        # A job cancelled while still queued never reached _job, so its queue place is given back here
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        wait_times = list(self.wait_times)
+        run_times = list(self.run_times)
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(sum(wait_times) / len(wait_times) * 1000, 1) if wait_times else 0.0,
+            "max_wait_ms": round(max(wait_times) * 1000, 1) if wait_times else 0.0,
+            "avg_run_ms": round(sum(run_times) / len(run_times) * 1000, 1) if run_times else 0.0
+        }
+
+
+def all_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.stats() for name, executor in BoundedExecutor.registry.items()}
+
+
+# Browser work (Selenium scrapes); one worker per browser we allow to run at once
+scrape_executor = BoundedExecutor("scrape", settings.SCRAPE_MAX_CONCURRENCY)
+
+# Blocking CPU/disk work after scraping: indexing, sentiment analysis, topic clustering
+analysis_executor = BoundedExecutor("analysis", settings.ANALYSIS_MAX_WORKERS)
@@ -0,0 +1,59 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# Lock files held by the current thread, so nested acquisitions of the same lock do not deadlock
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(path: str, wait_log_seconds: float = 5.0) -> Iterator[None]:
+    """
+    Exclusive lock shared by every process (uvicorn worker) on this host,
+    held on a lock file for the duration of the block. Threads of one process
+    exclude each other too; a thread may re-enter a lock it already holds.
+    """
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = set()
+    path = os.path.abspath(path)
+    if path in held:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    started_at = time.time()
+    with open(path, "a+b") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        waited = time.time() - started_at
+        if waited > wait_log_seconds:
+            logger.info(f"[LOCK] Waited {waited:.1f}s for {os.path.basename(path)}")
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
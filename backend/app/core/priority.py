@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+BACKGROUND = "background"
+
+# Highest priority first
+LANE_ORDER = (INTERACTIVE, BULK, BACKGROUND)
+
+# Default lane for a path prefix; anything unmatched is interactive
+ROUTE_LANES = (
+    ("/api/v1/analyze", BULK),
+    # Monitoring and operator tooling must not compete with user traffic
+    ("/metrics", BACKGROUND),
+    ("/api/v1/system-stats", BACKGROUND),
+    ("/api/v1/admin", BACKGROUND),
+)
+
+
+@dataclass
+class Lane:
+    """One request class: its own concurrency budget and a weight for sharing free slots."""
+    name: str
+    max_concurrency: int
+    weight: int
+    active: int = 0
+    completed: int = 0
+    # Stride-scheduling position: advanced by 1/weight on every grant
+    pass_value: float = 0.0
+    waiters: Deque[asyncio.Future] = field(default_factory=deque)
+    wait_times: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def stats(self) -> Dict[str, Any]:
+        wait_times = list(self.wait_times)
+        latencies = sorted(self.latencies)
+        p95_latency = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        return {
+            "max_concurrency": self.max_concurrency,
+            "weight": self.weight,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "completed": self.completed,
+            "avg_wait_ms": round(sum(wait_times) / len(wait_times) * 1000, 1) if wait_times else 0.0,
+            "max_wait_ms": round(max(wait_times) * 1000, 1) if wait_times else 0.0,
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "p95_latency_ms": round(p95_latency * 1000, 1)
+        }
+
+
+def parse_lanes(spec: str) -> List[Tuple[str, int, int]]:
+    """Parse "name=limit:weight,..." into (name, limit, weight) tuples."""
+    lanes = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, budget = item.partition("=")
+        limit, _, weight = budget.partition(":")
+        lanes.append((name.strip(), int(limit), int(weight or 1)))
+    return lanes
+
+
+class PriorityScheduler:
+    """
+    Admits requests into lanes (interactive, bulk, background). Each lane has a
+    concurrency budget, so a burst of long scrapes can only occupy the bulk
+    lane's slots; the server-wide slots left over are handed to waiting lanes
+    in proportion to their weights (stride scheduling). Runs on the server's
+    event loop, so no locking is needed.
+    """
+
+    def __init__(self, lanes: List[Tuple[str, int, int]], max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.lanes: Dict[str, Lane] = {name: Lane(name, limit, weight) for name, limit, weight in lanes}
+        self.active = 0
+
+    def classify(self, path: str, requested: Optional[str] = None) -> str:
+        """
+        Lane for a request: its route's default lane, or a lower-priority one the
+        client asked for with X-Priority. A header naming a higher-priority lane
+        is ignored. If the lane is not configured, the next lower one that is
+        configured is used, and a higher one only when no lower one exists.
+        """
+        lane = next((route_lane for prefix, route_lane in ROUTE_LANES if path.startswith(prefix)), INTERACTIVE)
+        rank = LANE_ORDER.index(lane)
+        if requested in LANE_ORDER:
+            rank = max(rank, LANE_ORDER.index(requested))
+        for candidate in (*LANE_ORDER[rank:], *reversed(LANE_ORDER[:rank])):
+            if candidate in self.lanes:
+                return candidate
+        return next(iter(self.lanes))
+
+    def _can_start(self, lane: Lane) -> bool:
+        return lane.active < lane.max_concurrency and self.active < self.max_concurrency
+
+    def _start(self, lane: Lane):
+        lane.active += 1
+        self.active += 1
+        lane.pass_value += 1.0 / lane.weight
+
+    async def acquire(self, lane_name: str) -> float:
+        """Wait for a slot in the lane; returns the seconds spent waiting."""
+        lane = self.lanes[lane_name]
+        # Lanes still queued when slots are free are held by their own budget, so starting here skips nobody
+        if not lane.waiters and self._can_start(lane):
+            self._start(lane)
+            lane.wait_times.append(0.0)
+            return 0.0
+
+        if not lane.waiters:
+            # An idle lane rejoins at the current position instead of claiming a backlog of turns
+            lane.pass_value = max(lane.pass_value, self._min_waiting_pass())
+        enqueued_at = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        lane.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._free(lane)  # Slot was granted as the caller went away
+            else:
+                lane.waiters.remove(waiter)
+            raise
+        waited = time.perf_counter() - enqueued_at
+        lane.wait_times.append(waited)
+        return waited
+
+    def release(self, lane_name: str, latency: float):
+        """Give the slot back after a request finished, recording how long it held it."""
+        lane = self.lanes[lane_name]
+        lane.completed += 1
+        lane.latencies.append(latency)
+        self._free(lane)
+
+    def _free(self, lane: Lane):
+        lane.active -= 1
+        self.active -= 1
+        self._dispatch()
+
+    def _min_waiting_pass(self) -> float:
+        passes = [lane.pass_value for lane in self.lanes.values() if lane.waiters]
+        return min(passes) if passes else 0.0
+
+    def _dispatch(self):
+        while self.active < self.max_concurrency:
+            ready = [lane for lane in self.lanes.values() if lane.waiters and lane.active < lane.max_concurrency]
+            if not ready:
+                return
+            lane = min(ready, key=lambda candidate: candidate.pass_value)
+            waiter = lane.waiters.popleft()
+            if waiter.done():
+                continue
+            self._start(lane)
+            waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+
+
+scheduler = PriorityScheduler(parse_lanes(settings.PRIORITY_LANES), settings.PRIORITY_MAX_CONCURRENCY)
@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# A frame is (filename, first line, function name); a stack runs outermost first
+Frame = Tuple[str, int, str]
+
+# Leaf frames of threads that are parked, not working: idle pool workers, an event
+# loop waiting in select, condition waits. Their samples are dropped.
+IDLE_LEAVES = {
+    ("thread.py", "_worker"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+# Thread and pool entry points under every worker stack; left out of the top-functions tables
+PLUMBING_FRAMES = {
+    ("threading.py", "_bootstrap"),
+    ("threading.py", "_bootstrap_inner"),
+    ("threading.py", "run"),
+    ("thread.py", "run"),
+    ("thread.py", "_worker"),
+}
+# Background threads that only sleep between periodic jobs
+IGNORED_THREADS = {"metrics-publisher"}
+
+_PROFILE_ID = re.compile(r"^[0-9a-z-]+$")
+
+
+def _thread_group(name: str) -> str:
+    """"scrape-worker_0" -> "scrape-worker", so pool threads are reported together."""
+    return re.sub(r"[_ -]?\d+$", "", name) or name
+
+
+def _short_path(filename: str) -> str:
+    """Package-relative path for libraries, repo-relative for our code, basename for the stdlib."""
+    position = filename.rfind("site-packages" + os.sep)
+    if position != -1:
+        return filename[position + len("site-packages" + os.sep):]
+    cwd = os.getcwd() + os.sep
+    if filename.startswith(cwd):
+        return filename[len(cwd):]
+    return os.path.basename(filename)
+
+
+def _frame_label(frame: Frame) -> str:
+    filename, line, name = frame
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+class ProfileSession:
+    """Samples collected for one profile: a single request or a time window."""
+
+    def __init__(self, kind: str, label: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.kind = kind
+        self.label = label
+        self.started_at = time.time()
+        self.stopped_at: Optional[float] = None
+        self.samples = 0
+        self.stacks: Counter = Counter()  # (thread group, stack) -> samples
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for on-demand investigations. While at least one
+    session is open, a background thread snapshots the Python stack of every
+    thread (sys._current_frames) each interval, so work on the scrape and
+    analysis executors and the LLM gateway loop is captured, not only the
+    request's own thread. Nothing runs while no session is open.
+
+    A stopped session is written to the profile directory as <id>.json (a
+    summary with the hottest functions by self and total time, and time per
+    thread group) and <id>.folded (collapsed stacks for flamegraph.pl or
+    speedscope). Concurrent requests share threads, so a request profile also
+    contains whatever else the server did meanwhile.
+    """
+
+    def __init__(self, directory: str, interval_seconds: float, top_functions: int, keep: int):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.top_functions = top_functions
+        self.keep = keep
+        self._sessions: Dict[str, ProfileSession] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Sessions ---
+
+    def start(self, kind: str, label: str) -> ProfileSession:
+        session = ProfileSession(kind, label)
+        with self._lock:
+            self._sessions[session.id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        logger.info(f"[PROFILE] Started {kind} profile {session.id} ({label})")
+        return session
+
+    def start_window(self, seconds: float, label: str) -> ProfileSession:
+        """Profile everything this worker does for the next `seconds`, then store the result."""
+        session = self.start("window", label)
+        timer = threading.Timer(seconds, self.stop, args=(session,))
+        timer.daemon = True
+        timer.start()
+        return session
+
+    def stop(self, session: ProfileSession) -> Dict[str, Any]:
+        with self._lock:
+            if self._sessions.pop(session.id, None) is None:
+                return self.summarise(session)
+            session.stopped_at = time.time()
+        summary = self.summarise(session)
+        try:
+            self._save(session, summary)
+        except OSError as e:
+            logger.warning(f"[PROFILE] Could not store profile {session.id}: {str(e)}")
+        logger.info(f"[PROFILE] Stored {session.kind} profile {session.id}: {session.samples} samples "
+                    f"over {summary['duration_seconds']}s")
+        return summary
+
+    def running(self, profile_id: str) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._sessions.get(profile_id)
+
+    # --- Sampling ---
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+            stacks = self._sample(own_ident)
+            with self._lock:
+                for session in self._sessions.values():
+                    session.samples += 1
+                    session.stacks.update(stacks)
+            time.sleep(self.interval_seconds)
+
+    @staticmethod
+    def _sample(own_ident: int) -> List[Tuple[str, Tuple[Frame, ...]]]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, "unknown")
+            if ident == own_ident or name in IGNORED_THREADS:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            stack.reverse()
+            stacks.append((_thread_group(name), tuple(stack)))
+        return stacks
+
+    # --- Results ---
+
+    def summarise(self, session: ProfileSession) -> Dict[str, Any]:
+        with self._lock:
+            stacks = list(session.stacks.items())
+            samples = session.samples
+        busy_samples = sum(count for _, count in stacks)
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        threads: Counter = Counter()
+        for (thread, stack), count in stacks:
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+            threads[thread] += count
+
+        # Sleep jitter and the sampling itself stretch the interval; use the one actually achieved
+        stopped_at = session.stopped_at or time.time()
+        duration = stopped_at - session.started_at
+        interval_ms = duration / samples * 1000 if samples else self.interval_seconds * 1000
+
+        def top(counts: Counter) -> List[Dict[str, Any]]:
+            return [
+                {
+                    "function": _frame_label(frame),
+                    "self_ms": round(self_counts[frame] * interval_ms, 1),
+                    "total_ms": round(total_counts[frame] * interval_ms, 1),
+                    "self_pct": round(self_counts[frame] / busy_samples * 100, 1),
+                    "total_pct": round(total_counts[frame] / busy_samples * 100, 1)
+                }
+                for frame, _ in islice(
+                    ((frame, count) for frame, count in counts.most_common()
+                     if (os.path.basename(frame[0]), frame[2]) not in PLUMBING_FRAMES),
+                    self.top_functions
+                )
+            ]
+
+        return {
+            "id": session.id,
+            "kind": session.kind,
+            "label": session.label,
+            "status": "done" if session.stopped_at else "running",
+            "started_at": session.started_at,
+            "duration_seconds": round(duration, 3),
+            "interval_ms": round(interval_ms, 2),
+            "samples": samples,
+            "busy_samples": busy_samples,
+            # Busy thread-time per thread group (scrape-worker, analysis-worker, llm-gateway, ...)
+            "threads": {
+                thread: {"ms": round(count * interval_ms, 1), "pct": round(count / busy_samples * 100, 1)}
+                for thread, count in threads.most_common()
+            },
+            "top_self": top(self_counts) if busy_samples else [],
+            "top_total": top(total_counts) if busy_samples else []
+        }
+
+    def _path(self, profile_id: str, extension: str) -> Optional[str]:
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def _save(self, session: ProfileSession, summary: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(session.id, "folded"), "w", encoding="utf-8") as folded:
+            for (thread, stack), count in session.stacks.items():
+                folded.write(f"{thread};{';'.join(_frame_label(frame) for frame in stack)} {count}\n")
+        with open(self._path(session.id, "json"), "w", encoding="utf-8") as summary_file:
+            json.dump(summary, summary_file, ensure_ascii=False, indent=2)
+
+        stored = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in stored[:max(0, len(stored) - self.keep)]:
+            for extension in ("json", "folded"):
+                try:
+                    os.remove(self._path(entry.name[:-len(".json")], extension))
+                except (OSError, TypeError):
+                    pass
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of a stored profile, or of a running one so far."""
+        session = self.running(profile_id)
+        if session is not None:
+            return self.summarise(session)
+        path = self._path(profile_id, "json")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as summary_file:
+            return json.load(summary_file)
+
+    def folded_path(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, "folded")
+        return path if path is not None and os.path.exists(path) else None
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Running and stored profiles, newest first, without their function tables."""
+        fields = ("id", "kind", "label", "status", "started_at", "duration_seconds", "samples", "busy_samples")
+        profiles = {}
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    try:
+                        with open(entry.path, encoding="utf-8") as summary_file:
+                            summary = json.load(summary_file)
+                    except (OSError, ValueError):
+                        continue
+                    profiles[summary["id"]] = {field: summary.get(field) for field in fields}
+        with self._lock:
+            running = list(self._sessions.values())
+        for session in running:
+            profiles[session.id] = {field: value for field, value in self.summarise(session).items() if field in fields}
+        return sorted(profiles.values(), key=lambda profile: profile["started_at"], reverse=True)
+
+
+# Idle until a profile is requested; the middleware and admin routes are only installed with PROFILING_TOKEN
+profiler = SamplingProfiler(
+    settings.PROFILE_DIR,
+    settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+    settings.PROFILE_TOP_FUNCTIONS,
+    settings.PROFILE_KEEP
+)
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+from .startup import Lazy
+
+logger = logging.getLogger(__name__)
+
+# Expired cache rows are deleted on every Nth write
+PURGE_EVERY_WRITES = 200
+
+
+class MemorySharedState:
+    """
+    Single-process stand-in for SQLiteSharedState with the same interface:
+    state is only shared between threads of this worker.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._generations: Dict[str, int] = {}
+        self._metrics: Dict[str, Tuple[Dict[str, Any], float]] = {}
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[1] < time.time():
+                return None
+            return entry
+
+    def put(self, namespace: str, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[(namespace, key)] = (value, expires_at)
+
+    def generation(self, name: str) -> int:
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def bump_generation(self, name: str) -> int:
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            return self._generations[name]
+
+    def publish_metrics(self, worker_id: str, snapshot: Dict[str, Any]):
+        with self._lock:
+            self._metrics[worker_id] = (snapshot, time.time())
+
+    def worker_metrics(self, max_age_seconds: float) -> Dict[str, Dict[str, Any]]:
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            return {worker_id: snapshot for worker_id, (snapshot, updated_at) in self._metrics.items() if updated_at >= cutoff}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "entries": len(self._entries), "generations": len(self._generations)}
+
+
+class SQLiteSharedState:
+    """
+    State shared by all uvicorn workers on one host through a SQLite file in
+    WAL mode: cache entries (JSON values with an expiry), generation counters
+    that tell workers when a product was reindexed elsewhere, and each
+    worker's latest metrics snapshot for cluster-wide aggregation.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS worker_metrics ("
+            "worker_id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        logger.info(f"[SHARED] Using shared state at {path}")
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at) of a live entry, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at >= ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, namespace: str, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY_WRITES == 0:
+                self._db.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+
+    def generation(self, name: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM generations WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self, name: str) -> int:
+        """Increment a counter atomically across workers; returns the new value."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO generations (name, value) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+                (name,)
+            )
+            value = self._db.execute("SELECT value FROM generations WHERE name = ?", (name,)).fetchone()[0]
+            self._db.commit()
+        return value
+
+    def publish_metrics(self, worker_id: str, snapshot: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO worker_metrics (worker_id, snapshot, updated_at) VALUES (?, ?, ?)",
+                (worker_id, json.dumps(snapshot), time.time())
+            )
+            self._db.commit()
+
+    def worker_metrics(self, max_age_seconds: float) -> Dict[str, Dict[str, Any]]:
+        """Latest snapshot of every worker that published within max_age_seconds."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT worker_id, snapshot FROM worker_metrics WHERE updated_at >= ?",
+                (time.time() - max_age_seconds,)
+            ).fetchall()
+        return {worker_id: json.loads(snapshot) for worker_id, snapshot in rows}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            generations = self._db.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        return {"backend": self.backend, "path": self.path, "entries": entries, "generations": generations}
+
+
+def _create_shared_state():
+    if settings.SHARED_STATE_BACKEND == "memory":
+        return MemorySharedState()
+    return SQLiteSharedState(settings.SHARED_STATE_PATH)
+
+# --- Shared state (created on first use) ---
+_shared_state = Lazy("shared_state", _create_shared_state)
+
+def get_shared_state():
+    return _shared_state.get()
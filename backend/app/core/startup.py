@@ -0,0 +1,83 @@
+import logging
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Expensive third-party packages; the startup report lists which are already imported
+HEAVY_MODULES = [
+    "google.generativeai", "langchain_google_genai", "langchain_text_splitters", "langchain_community.vectorstores",
+    "chromadb", "pandas", "sklearn", "selenium", "webdriver_manager", "torch", "sentence_transformers"
+]
+
+_import_seconds: Optional[float] = None
+
+
+class Lazy(Generic[T]):
+    """
+    A subsystem built by factory on first get() (once, under a lock) instead of
+    at import time. Every instance is registered by name, so a startup hook can
+    warm selected subsystems up and the startup report can show init times.
+    """
+
+    registry: Dict[str, "Lazy"] = {}
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._initialized = False
+        self._lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+        Lazy.registry[name] = self
+
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def get(self) -> T:
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    start_time = time.perf_counter()
+                    self._value = self._factory()
+                    self.init_seconds = time.perf_counter() - start_time
+                    self._initialized = True
+                    logger.info(f"[STARTUP] {self.name} initialised in {self.init_seconds * 1000:.0f}ms")
+        return self._value
+
+
+def warm_up(names: List[str]):
+    """Initialise the named subsystems now (startup hook); unknown names are logged and skipped."""
+    for name in names:
+        lazy = Lazy.registry.get(name)
+        if lazy is None:
+            logger.warning(f"[STARTUP] Unknown warm-up subsystem '{name}', available: {sorted(Lazy.registry)}")
+            continue
+        lazy.get()
+
+
+def record_import_time(seconds: float):
+    global _import_seconds
+    _import_seconds = seconds
+    loaded = [module for module in HEAVY_MODULES if module in sys.modules]
+    logger.info(f"[STARTUP] App imported in {seconds * 1000:.0f}ms; heavy modules loaded: {loaded or 'none'}")
+
+
+def report() -> Dict[str, Any]:
+    """Import time, which heavy packages are loaded, and the state of each lazy subsystem."""
+    return {
+        "import_ms": round(_import_seconds * 1000, 1) if _import_seconds is not None else None,
+        "heavy_modules_loaded": [module for module in HEAVY_MODULES if module in sys.modules],
+        "subsystems": {
+            name: {
+                "initialized": lazy.initialized,
+                "init_ms": round(lazy.init_seconds * 1000, 1) if lazy.init_seconds is not None else None
+            }
+            for name, lazy in Lazy.registry.items()
+        }
+    }
@@ -1,27 +1,66 @@
 # main.py
+import time
+_import_started = time.perf_counter()
+
 import sys
 import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 
 if sys.platform.startswith('win'):
     # Force SelectorEventLoop on Windows
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from .api import endpoints
+from .api import admin, endpoints
 from .middleware.metrics_middleware import MetricsMiddleware
+from .middleware.priority_middleware import PriorityMiddleware
+from .middleware.profiling_middleware import ProfilingMiddleware
+from .core import priority, profiling, startup
+from .core.config import settings
+from .core.shared_state import get_shared_state
+from .services import prometheus_exporter, rag_service
+from .services.system_metrics_service import system_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_models():
+    if not settings.GEMINI_API_KEY and settings.LLM_BACKEND != "fake":
+        logger.warning("[STARTUP] GEMINI_API_KEY tidak ditemukan di file .env; ringkasan dan chat akan gagal")
+    # Workers publish their metrics so /system-stats on any worker covers all of them
+    system_metrics.start_publishing(get_shared_state(), settings.METRICS_PUBLISH_INTERVAL_SECONDS)
+    # Subsystems are built on first use unless listed in STARTUP_WARMUP
+    startup.warm_up(settings.STARTUP_WARMUP)
+    # Load the local embedding model once at startup so no request pays for it
+    if settings.EMBEDDING_BACKEND == "local" and settings.LOCAL_EMBEDDING_WARMUP:
+        rag_service.warm_up_embeddings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_models()
+    yield
+    system_metrics.stop_publishing()
+
 
 app = FastAPI(
     title="Marketplace Analyzer API",
     description="API untuk menganalisis ulasan produk dari marketplace.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Konfigurasi CORS (Cross-Origin Resource Sharing) - env driven
 cors_origins_env = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:3000")
 origins = [origin.strip() for origin in cors_origins_env.split(",")]
 
+# Priority lanes innermost, so measured response times include time queued in a lane
+app.add_middleware(PriorityMiddleware, scheduler=priority.scheduler)
+
 # Add metrics middleware first (before CORS)
 app.add_middleware(MetricsMiddleware)
 
@@ -33,9 +72,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# On-demand profiling is only wired in when a token is configured, so it costs nothing otherwise
+if settings.PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware, profiler=profiling.profiler, token=settings.PROFILING_TOKEN)
+
 # Sertakan router dari endpoints.py
 app.include_router(endpoints.router, prefix="/api/v1")
+if settings.PROFILING_TOKEN:
+    app.include_router(admin.router, prefix="/api/v1/admin", include_in_schema=False)
+
+startup.record_import_time(time.perf_counter() - _import_started)
 
 @app.get("/", tags=["Root"])
 def read_root():
-    return {"message": "Selamat datang di Marketplace Analyzer API!"}
\ No newline at end of file
+    return {"message": "Selamat datang di Marketplace Analyzer API!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape target: request/stage histograms, cache counters, pool and queue gauges."""
+    return Response(prometheus_exporter.render_metrics(), media_type=prometheus_exporter.CONTENT_TYPE)
@@ -1,39 +1,85 @@
+import re
 import time
 import logging
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Dict, Optional
 from app.services.system_metrics_service import system_metrics
 
 logger = logging.getLogger(__name__)
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """Middleware to track API metrics."""
-    
-    async def dispatch(self, request: Request, call_next):
+# Router prefix (e.g. "/api/v1") missing from each route's scope["route"].path. FastAPI releases
+# that copy routes into the app on include_router already put the prefix in route.path, and the
+# prefix recovered here is "". Current releases include routers lazily and scope["route"] is the
+# route as declared on its APIRouter, so the prefix is recovered once from the matched request path.
+_route_prefixes: Dict[int, str] = {}
+
+def route_template(scope) -> Optional[str]:
+    """Matched route template with its router prefix, e.g. "/api/v1/products/{product_id}/reviews"."""
+    route = scope.get("route")
+    if route is None or not hasattr(route, "path_regex"):
+        return None
+    prefix = _route_prefixes.get(id(route))
+    if prefix is None:
+        match = re.search(route.path_regex.pattern.lstrip("^"), scope["path"])
+        prefix = _route_prefixes[id(route)] = scope["path"][:match.start()] if match else ""
+    return prefix + route.path
+
+def _route_label(scope) -> str:
+    """Method plus matched route template, so /products/{product_id}/reviews is one series, not one per product."""
+    return f"{scope['method']} {route_template(scope) or 'unmatched'}"
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware to track API metrics. Times each request to its
+    response headers and to its last body byte (they differ for streamed
+    responses), counts body bytes sent, and adds an X-Response-Time header
+    with the time to headers. Bodies pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Record API call
         system_metrics.record_api_call()
-        
-        # Track response time
-        start_time = time.time()
-        
+        start_time = time.perf_counter()
+        headers_at = None
+        finished_at = None
+        bytes_sent = 0
+
+        async def send_with_metrics(message):
+            nonlocal headers_at, finished_at, bytes_sent
+            message_type = message["type"]
+            if message_type == "http.response.body":
+                bytes_sent += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await send(message)
+                    finished_at = time.perf_counter()
+                    return
+            elif message_type == "http.response.start":
+                headers_at = time.perf_counter()
+                # Add response time header for debugging
+                message["headers"] = [
+                    *message.get("headers", ()), (b"x-response-time", f"{headers_at - start_time:.3f}s".encode("latin-1"))
+                ]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            
-            # Calculate and record response time
-            end_time = time.time()
-            response_time = end_time - start_time
-            system_metrics.record_response_time(response_time)
-            
-            # Add response time header for debugging
-            response.headers["X-Response-Time"] = f"{response_time:.3f}s"
-            
-            return response
-            
+            await self.app(scope, receive, send_with_metrics)
         except Exception as e:
             # Still record response time even for errors
-            end_time = time.time()
-            response_time = end_time - start_time
-            system_metrics.record_response_time(response_time)
-            
+            response_time = time.perf_counter() - start_time
             logger.error(f"[METRICS] Request failed after {response_time:.3f}s: {e}")
             raise
+        finally:
+            # A client that disconnects mid-stream ends the request when the app gives up on it
+            end_time = finished_at or time.perf_counter()
+            system_metrics.record_request(
+                _route_label(scope),
+                end_time - start_time,
+                headers_at - start_time if headers_at is not None else None,
+                bytes_sent
+            )
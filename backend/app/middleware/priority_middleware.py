@@ -0,0 +1,39 @@
+import time
+import logging
+from app.core.priority import PriorityScheduler
+
+logger = logging.getLogger(__name__)
+
+class PriorityMiddleware:
+    """
+    Pure ASGI middleware that runs each HTTP request inside its priority lane:
+    the request waits for a lane slot before reaching the app and holds it
+    until the response is fully sent (including streamed bodies).
+    A client may send "X-Priority: bulk|background" to lower its own priority;
+    asking for a higher priority than the route's default lane has no effect.
+    """
+
+    def __init__(self, app, scheduler: PriorityScheduler):
+        self.app = app
+        self.scheduler = scheduler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        requested = None
+        for name, value in scope["headers"]:
+            if name == b"x-priority":
+                requested = value.decode("latin-1").strip().lower()
+                break
+        lane = self.scheduler.classify(scope["path"], requested)
+
+        waited = await self.scheduler.acquire(lane)
+        if waited > 1.0:
+            logger.info(f"[PRIORITY] {scope['method']} {scope['path']} waited {waited:.2f}s in the {lane} lane")
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.scheduler.release(lane, time.perf_counter() - start_time)
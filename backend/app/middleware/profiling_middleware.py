@@ -0,0 +1,53 @@
+import asyncio
+import hmac
+import logging
+from app.core.profiling import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that profiles single requests on demand: a request
+    carrying "X-Profile-Token: <PROFILING_TOKEN>" is sampled from arrival to
+    its last response byte, and the response gets an X-Profile-Id header to
+    fetch the result from /api/v1/admin/profiles/{id}. Only installed when
+    PROFILING_TOKEN is set.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, token: str, exclude_prefix: str = "/api/v1/admin"):
+        self.app = app
+        self.profiler = profiler
+        self.token = token.encode("latin-1")
+        # The admin routes authenticate with the same header; calling them should not start profiles
+        self.exclude_prefix = exclude_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        supplied = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                supplied = value
+                break
+        if supplied is None:
+            await self.app(scope, receive, send)
+            return
+        if not hmac.compare_digest(supplied, self.token):
+            logger.warning(f"[PROFILE] Ignoring invalid profiling token on {scope['method']} {scope['path']}")
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.start("request", f"{scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"x-profile-id", session.id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            # Summarising and writing the artefacts happens off the event loop
+            await asyncio.to_thread(self.profiler.stop, session)
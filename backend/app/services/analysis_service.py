@@ -1,6 +1,7 @@
-import pandas as pd
-from sklearn.feature_extraction.text import CountVectorizer
+from collections import Counter
+from typing import Iterable
 import os
+import random
 
 def load_stopwords():
     """Memuat daftar stop words dari file teks."""
@@ -60,6 +61,16 @@ def analyze_sentiment_heuristic(text: str) -> int:
     else:
         return 1  # Very negative
 
+def resolve_rating(review_data: dict) -> tuple[int, str]:
+    """
+    Returns (rating, source): the rating from the page when valid, otherwise the
+    sentiment heuristic.
+    """
+    original_rating = review_data.get("rating")
+    if original_rating and 1 <= original_rating <= 5:
+        return original_rating, "page"
+    return analyze_sentiment_heuristic(review_data.get("text", "")), "sentiment"
+
 def get_top_keywords(texts: list[str], top_n: int = 10, label_suffix: str = ""):
     """Mengekstrak kata kunci paling umum dari daftar teks dengan fallback untuk stopwords."""
     if not texts:
@@ -69,6 +80,9 @@ def get_top_keywords(texts: list[str], top_n: int = 10, label_suffix: str = ""):
     if not full_text.strip():
         return []
     
+    # sklearn and pandas take seconds to import, so they are loaded on first analysis
+    from sklearn.feature_extraction.text import CountVectorizer
+
     try:
         # Use stopwords if available, otherwise use basic filtering
         if indonesian_stop_words:
@@ -116,18 +130,12 @@ def analyze_sentiments_and_topics(reviews_data: list[dict]) -> dict:
     
     for review_data in reviews_data:
         text = review_data.get("text", "")
-        original_rating = review_data.get("rating")
-        
-        if original_rating and 1 <= original_rating <= 5:
-            # Use actual rating from page
-            rating = original_rating
+        # Use actual rating from page, sentiment analysis as fallback
+        rating, source = resolve_rating(review_data)
+        if source == "page":
             ratings_from_page += 1
-            source = "page"
         else:
-            # Use sentiment analysis as fallback
-            rating = analyze_sentiment_heuristic(text)
             ratings_from_sentiment += 1
-            source = "sentiment"
             
         processed_reviews.append({
             "text": text,
@@ -136,6 +144,7 @@ def analyze_sentiments_and_topics(reviews_data: list[dict]) -> dict:
         })
     
     # Create DataFrame for analysis
+    import pandas as pd
     df = pd.DataFrame(processed_reviews)
     
     # 1. Real Rating Distribution Analysis
@@ -187,4 +196,123 @@ def analyze_sentiments_and_topics(reviews_data: list[dict]) -> dict:
         "negative_keywords": negative_keywords,
         "review_snippets": review_snippets,
         "analysis_summary": analysis_summary
-    }
\ No newline at end of file
+    }
+
+
+class StreamingReviewAnalyzer:
+    """
+    Incremental counterpart of analyze_sentiments_and_topics().
+    Reviews are consumed one at a time and only aggregates are kept (rating
+    counts, keyword counters, one snippet per star and a fixed-size sample), so
+    memory stays constant regardless of how many reviews flow through.
+    """
+
+    SNIPPET_MAX_CHARS = 150
+    SAMPLE_SIZE = 200        # Reservoir sample used for summary and topic clustering
+    MAX_VOCABULARY = 50000   # Keyword counters are pruned back to half this size when exceeded
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE, seed: int = 42):
+        self.sample_size = sample_size
+        self.rating_counts = Counter()
+        self.rating_sum = 0
+        self.total_reviews = 0
+        self.ratings_from_page = 0
+        self.ratings_from_sentiment = 0
+        self.positive_terms = Counter()
+        self.negative_terms = Counter()
+        self.snippets = {}  # stars -> first review text seen with that rating
+        self.sample = []    # Reservoir sample of {"text", "rating"} dicts
+        self._random = random.Random(seed)
+
+        from sklearn.feature_extraction.text import CountVectorizer
+        if indonesian_stop_words:
+            self._tokenize = CountVectorizer(stop_words=indonesian_stop_words).build_analyzer()
+            self._keyword_label = "top keywords"
+        else:
+            self._tokenize = CountVectorizer(stop_words=['dan', 'yang', 'di', 'untuk', 'dengan', 'ini', 'itu', 'tidak', 'ke', 'dari', 'pada', 'adalah', 'atau', 'juga', 'akan', 'sudah', 'ada', 'bisa', 'saya', 'kita', 'mereka']).build_analyzer()
+            self._keyword_label = "raw terms"
+
+    def add(self, review_data: dict):
+        """Consume a single review."""
+        text = review_data.get("text", "")
+        if not text or "ERROR:" in text:
+            return
+
+        rating, source = resolve_rating(review_data)
+        if source == "page":
+            self.ratings_from_page += 1
+        else:
+            self.ratings_from_sentiment += 1
+
+        self.total_reviews += 1
+        self.rating_sum += rating
+        self.rating_counts[rating] += 1
+
+        if rating >= 4:
+            self._count_terms(self.positive_terms, text)
+        elif rating <= 2:
+            self._count_terms(self.negative_terms, text)
+
+        if rating not in self.snippets:
+            self.snippets[rating] = text if len(text) <= self.SNIPPET_MAX_CHARS else text[:self.SNIPPET_MAX_CHARS - 3] + "..."
+
+        # Reservoir sampling (Algorithm R)
+        sampled = {"text": text, "rating": rating}
+        if len(self.sample) < self.sample_size:
+            self.sample.append(sampled)
+        else:
+            slot = self._random.randrange(self.total_reviews)
+            if slot < self.sample_size:
+                self.sample[slot] = sampled
+
+    def consume(self, reviews: Iterable[dict]) -> Iterable[dict]:
+        """Pass reviews through unchanged while analysing them, for chaining stages."""
+        for review_data in reviews:
+            self.add(review_data)
+            yield review_data
+
+    def _count_terms(self, counter: Counter, text: str):
+        counter.update(self._tokenize(text))
+        if len(counter) > self.MAX_VOCABULARY:
+            # Keep the most frequent half; rare terms cannot reach the top keywords anyway
+            kept = counter.most_common(self.MAX_VOCABULARY // 2)
+            counter.clear()
+            counter.update(dict(kept))
+
+    def _top_keywords(self, counter: Counter, top_n: int, label_suffix: str) -> list[dict]:
+        return [
+            {"text": word, "value": int(freq), "label": f"{self._keyword_label}{label_suffix}"}
+            for word, freq in counter.most_common(top_n)
+        ]
+
+    def result(self) -> dict:
+        """Returns the same structure as analyze_sentiments_and_topics()."""
+        if self.total_reviews == 0:
+            return {
+                "rating_distribution": [],
+                "positive_keywords": [],
+                "negative_keywords": [],
+                "review_snippets": [],
+                "analysis_summary": "No valid reviews found"
+            }
+
+        return {
+            "rating_distribution": [
+                {"stars": int(stars), "count": int(count)}
+                for stars, count in sorted(self.rating_counts.items())
+            ],
+            "positive_keywords": self._top_keywords(self.positive_terms, 5, " (positive reviews)"),
+            "negative_keywords": self._top_keywords(self.negative_terms, 5, " (negative reviews)"),
+            "review_snippets": [
+                {"stars": stars, "text": self.snippets[stars], "count": self.rating_counts[stars]}
+                for stars in [5, 4, 3, 2, 1] if stars in self.snippets
+            ],
+            "analysis_summary": {
+                "total_reviews": self.total_reviews,
+                "average_rating": round(self.rating_sum / self.total_reviews, 2),
+                "ratings_from_page": self.ratings_from_page,
+                "ratings_from_sentiment": self.ratings_from_sentiment,
+                "data_quality": "high" if self.ratings_from_page > self.ratings_from_sentiment else "medium",
+                "streaming": True
+            }
+        }
@@ -0,0 +1,148 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from .analysis_service import indonesian_stop_words
+
+# Keeps sizes, model codes and decimals intact: "xl", "a52s", "1.5l", "40/41", "usb-c"
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[./-][0-9a-z]+)*")
+
+# Clothing and shoe sizes that carry no digits but are exact-match terms
+SIZE_TERMS = {"xs", "s", "m", "l", "xl", "xxl", "xxxl", "2xl", "3xl", "4xl", "allsize"}
+
+STOP_WORDS = set(indonesian_stop_words)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def is_specific_term(term: str) -> bool:
+    """Sizes and anything containing a digit (model codes, dimensions, capacities)."""
+    return term in SIZE_TERMS or any(char.isdigit() for char in term)
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over a product's review chunks.
+    Built incrementally at indexing time alongside the vectors and saved as a
+    single JSON file, so lexical search needs no embedding call.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {document position: term frequency}
+        self._positions: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Rough resident size: document text plus ~64 bytes per posting."""
+        posting_count = sum(len(postings) for postings in self.postings.values())
+        return sum(len(document) for document in self.documents) + posting_count * 64
+
+    def add(self, ids: List[str], documents: List[str]) -> int:
+        """Index documents whose ids are not present yet; returns how many were added."""
+        added = 0
+        for doc_id, document in zip(ids, documents):
+            if doc_id in self._positions:
+                continue
+            position = len(self.ids)
+            self._positions[doc_id] = position
+            self.ids.append(doc_id)
+            self.documents.append(document)
+            terms = tokenize(document)
+            self.lengths.append(len(terms))
+            self._total_length += len(terms)
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, {})[position] = frequency
+            added += 1
+        return added
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        if not self.ids:
+            return []
+        query_terms = [term for term in tokenize(query) if term not in STOP_WORDS] or tokenize(query)
+        doc_count = len(self.ids)
+        average_length = self._total_length / doc_count or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(query_terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (Document(page_content=self.documents[position], id=self.ids[position]), score)
+            for position, score in top
+        ]
+
+    def is_keyword_query(self, query: str, max_terms: int = 4) -> bool:
+        """
+        A short query built around exact terms (sizes, model codes) that all
+        appear in this index. Such queries are answered lexically, skipping the
+        query embedding; everything else goes through hybrid retrieval.
+        """
+        terms = [term for term in tokenize(query) if term not in STOP_WORDS]
+        specific_terms = [term for term in terms if is_specific_term(term)]
+        return (
+            0 < len(terms) <= max_terms
+            and bool(specific_terms)
+            and all(term in self.postings for term in specific_terms)
+        )
+
+    # --- Persistence ---
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "documents": self.documents,
+                "lengths": self.lengths,
+                "postings": {term: list(postings.items()) for term, postings in self.postings.items()}
+            }, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls()
+        index.ids = data["ids"]
+        index.documents = data["documents"]
+        index.lengths = data["lengths"]
+        index.postings = {term: dict(map(tuple, postings)) for term, postings in data["postings"].items()}
+        index._positions = {doc_id: i for i, doc_id in enumerate(index.ids)}
+        index._total_length = sum(index.lengths)
+        return index
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """Fuse ranked lists: each document scores sum(1 / (rrf_k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, document in enumerate(results, start=1):
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, document)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
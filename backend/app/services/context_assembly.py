@@ -0,0 +1,67 @@
+from typing import List, Tuple
+
+from .summary_service import estimate_tokens
+
+# The splitter repeats up to chunk_overlap (100) characters between neighbouring
+# chunks; overlaps are searched up to this length and must be at least MIN_OVERLAP
+MAX_OVERLAP_CHARS = 200
+MIN_OVERLAP_CHARS = 20
+
+# A chunk is only cut to fit the remaining budget if at least this much of it survives
+MIN_TRIMMED_TOKENS = 40
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, at a sentence or word boundary where possible."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < max_chars // 2:
+        boundary = cut.rfind(" ")
+    return (cut[:boundary + 1] if boundary > 0 else cut).rstrip() + " …"
+
+
+def _strip_overlap(text: str, selected: List[str]) -> str:
+    """Remove a prefix or suffix of text that repeats the edge of an already selected chunk."""
+    for other in selected:
+        if text in other:
+            return ""
+        limit = min(MAX_OVERLAP_CHARS, len(text), len(other))
+        for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if other.endswith(text[:size]):
+                text = text[size:]
+                break
+        limit = min(MAX_OVERLAP_CHARS, len(text), len(other))
+        for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if other.startswith(text[-size:]):
+                text = text[:-size]
+                break
+    return text.strip()
+
+
+def assemble_context(chunks: List[str], token_budget: int) -> Tuple[List[str], int]:
+    """
+    Select retrieved chunks, most relevant first, until token_budget is used up.
+    Text repeated between overlapping chunks of the same review is kept once,
+    and the last chunk is trimmed to fit when enough of it remains. Returns the
+    selected texts and their estimated token count.
+    """
+    selected: List[str] = []
+    used_tokens = 0
+    for chunk in chunks:
+        text = _strip_overlap(chunk, selected)
+        if not text:
+            continue
+        tokens = estimate_tokens(text)
+        remaining = token_budget - used_tokens
+        if tokens > remaining:
+            if remaining >= MIN_TRIMMED_TOKENS:
+                text = trim_to_tokens(text, remaining)
+                selected.append(text)
+                used_tokens += estimate_tokens(text)
+            break
+        selected.append(text)
+        used_tokens += tokens
+    return selected, used_tokens
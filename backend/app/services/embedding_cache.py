@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .system_metrics_service import system_metrics
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 1024   # Rows allocated in the vector file up front; grows by doubling
+SQLITE_BATCH_SIZE = 500   # Keys per "IN (...)" lookup, below SQLite's variable limit
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embedding model.
+    Vectors are keyed by model name, embedding kind (document/query) and a hash of
+    the text, stored as rows of a memory-mapped float32 matrix with a SQLite file
+    mapping keys to rows. Identical texts are embedded once, across products and restarts.
+
+    Several processes may share one cache directory: rows are allocated inside a
+    SQLite write transaction from the database's own MAX(row), vectors are written
+    before the rows are committed, and a reader remaps the matrix when another
+    process has grown the file past its mapping.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, cache_dir: str):
+        self.base = base
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        model_slug = re.sub(r"[^a-zA-Z0-9_-]+", "_", model_name).strip("_")
+        self._matrix_path = os.path.join(cache_dir, f"{model_slug}.f32")
+        # Autocommit mode: writes take the database lock explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, f"{model_slug}.sqlite"), check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._row_count = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+        self._load_dim()
+
+        logger.info(f"[EMBED-CACHE] Opened cache for {model_name} with {self._row_count} vectors")
+
+    # --- LangChain Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    # --- Cache internals ---
+
+    def _key(self, text: str, kind: str) -> str:
+        # Document and query embeddings differ for retrieval models, so the kind is part of the key
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [self._key(text, kind) for text in texts]
+        vectors: Dict[str, np.ndarray] = self._lookup(set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+
+        hit_count = sum(1 for key in keys if key in vectors)
+        self._record(hit_count, len(keys) - hit_count)
+
+        if missing:
+            missing_keys = list(missing.keys())
+            missing_texts = list(missing.values())
+            if kind == "query":
+                new_vectors = [self.base.embed_query(missing_texts[0])]
+            else:
+                new_vectors = self.base.embed_documents(missing_texts)
+            new_vectors = np.asarray(new_vectors, dtype=np.float32)
+            self._store(missing_keys, new_vectors)
+            vectors.update(zip(missing_keys, new_vectors))
+
+        return [vectors[key].tolist() for key in keys]
+
+    def _load_dim(self):
+        """Pick up the vector dimension (and open the matrix) once any process has stored a vector."""
+        if self._dim is not None:
+            return
+        dim_row = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        if dim_row:
+            self._dim = dim_row[0]
+            self._open_matrix(max(self._row_count, INITIAL_CAPACITY))
+
+    def _existing_rows(self, keys: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+            batch = keys[start:start + SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._db.execute(f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch).fetchall())
+        return rows
+
+    def _lookup(self, keys: set) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            self._load_dim()
+            if self._matrix is None:
+                return {}
+            rows = self._existing_rows(list(keys))
+            if rows and max(rows.values()) >= self._matrix.shape[0]:
+                # Another process grew the file since it was mapped here
+                self._remap()
+            for key, row in rows.items():
+                found[key] = np.array(self._matrix[row])
+        return found
+
+    def _store(self, keys: List[str], vectors: np.ndarray):
+        with self._lock:
+            # The write lock serialises row allocation across every process sharing the cache
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._load_dim()
+                if self._dim is None:
+                    self._dim = int(vectors.shape[1])
+                    self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (self._dim,))
+                    self._open_matrix(INITIAL_CAPACITY)
+                elif vectors.shape[1] != self._dim:
+                    logger.warning(f"[EMBED-CACHE] Dimension mismatch ({vectors.shape[1]} != {self._dim}), not caching")
+                    self._db.execute("ROLLBACK")
+                    return
+
+                # Keys another process stored meanwhile keep their rows; only new ones are written
+                existing = self._existing_rows(keys)
+                new_indexes = [i for i, key in enumerate(keys) if key not in existing]
+                first_row = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+                if new_indexes:
+                    self._ensure_capacity(first_row + len(new_indexes))
+                    self._matrix[first_row:first_row + len(new_indexes)] = vectors[new_indexes]
+                    self._matrix.flush()  # Vectors reach the file before their rows become visible
+                    self._db.executemany(
+                        "INSERT INTO vectors (key, row) VALUES (?, ?)",
+                        [(keys[i], first_row + offset) for offset, i in enumerate(new_indexes)]
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._row_count = first_row + len(new_indexes)
+
+    def _open_matrix(self, capacity: int):
+        size_bytes = capacity * self._dim * 4
+        with open(self._matrix_path, "ab") as f:
+            if f.tell() < size_bytes:
+                f.truncate(size_bytes)
+        capacity = os.path.getsize(self._matrix_path) // (self._dim * 4)
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def _ensure_capacity(self, rows_needed: int):
+        if rows_needed <= self._matrix.shape[0]:
+            return
+        self._remap()  # The file may already be large enough if another process grew it
+        capacity = self._matrix.shape[0]
+        if rows_needed <= capacity:
+            return
+        while capacity < rows_needed:
+            capacity *= 2
+        self._matrix.flush()
+        self._matrix = None
+        self._open_matrix(capacity)
+
+    def _remap(self):
+        """Map the file at its current size."""
+        self._matrix.flush()
+        self._matrix = None
+        self._open_matrix(0)
+
+    def _record(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            system_metrics.record_cache_hit("embeddings", hits)
+        if misses:
+            system_metrics.record_cache_miss("embeddings", misses)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "vectors": self._row_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "size_mb": round(self._row_count * (self._dim or 0) * 4 / (1024 * 1024), 1)
+        }
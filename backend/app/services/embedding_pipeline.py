@@ -0,0 +1,115 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from .system_metrics_service import STAGE_EMBED, system_metrics
+
+logger = logging.getLogger(__name__)
+
+# Substrings identifying quota / transient upstream failures worth retrying
+RETRYABLE_ERROR_MARKERS = [
+    "429", "quota", "resource has been exhausted", "resourceexhausted", "rate limit",
+    "503", "unavailable", "deadline", "timeout", "timed out"
+]
+
+# Called with (offset, texts, vectors) as each batch completes, e.g. to persist partial progress.
+# offset is the position of the batch's first text in the input list.
+BatchCallback = Callable[[int, List[str], List[List[float]]], None]
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Quota and transient errors are retried; anything else (bad key, bad input) fails fast."""
+    description = f"{type(error).__name__} {error}".lower()
+    return any(marker in description for marker in RETRYABLE_ERROR_MARKERS)
+
+
+class EmbeddingPipeline:
+    """
+    Batched, concurrency-limited embedding stage.
+    Texts are split into batches of batch_size, at most max_workers batches are in
+    flight at once, and quota errors are retried with exponential backoff plus
+    jitter. on_batch is invoked from the calling thread as each batch finishes,
+    so completed work is checkpointed even if a later batch fails. With a
+    CachedEmbeddings embedder, finished batches are also in the cache, so a rerun
+    after a failure only embeds the batches that never completed.
+    """
+
+    def __init__(self, embedder: Embeddings, batch_size: int = 100, max_workers: int = 4,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.embedder = embedder
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.batches_completed = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts: List[str], on_batch: Optional[BatchCallback] = None) -> List[List[float]]:
+        """Embed texts and return vectors in input order."""
+        if not texts:
+            return []
+
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        results: List[Optional[List[List[float]]]] = [None] * len(batches)
+        start_time = time.time()
+
+        if len(batches) == 1:
+            results[0] = self._embed_with_retry(batches[0], 0)
+            if on_batch:
+                on_batch(0, batches[0], results[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches)), thread_name_prefix="embed") as executor:
+                futures = {
+                    executor.submit(self._embed_with_retry, batch, index): index
+                    for index, batch in enumerate(batches)
+                }
+                try:
+                    for future in as_completed(futures):
+                        index = futures[future]
+                        results[index] = future.result()
+                        if on_batch:
+                            on_batch(index * self.batch_size, batches[index], results[index])
+                except Exception:
+                    # Don't start batches that are still queued; already finished ones are checkpointed
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        elapsed = time.time() - start_time
+        logger.info(f"[EMBED] Embedded {len(texts)} texts in {len(batches)} batches "
+                    f"({self.max_workers} workers) in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-6):.0f} texts/s)")
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def _embed_with_retry(self, batch: List[str], index: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with system_metrics.stage(STAGE_EMBED):
+                    vectors = self.embedder.embed_documents(batch)
+                with self._lock:
+                    self.batches_completed += 1
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    logger.error(f"[EMBED] Batch {index} failed after {attempt + 1} attempts: {str(e)}")
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"[EMBED] Batch {index} hit retryable error ({str(e)[:80]}), "
+                               f"retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "max_workers": self.max_workers,
+            "batches_completed": self.batches_completed,
+            "retries": self.retries
+        }
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class FakeQuotaError(Exception):
+    """Raised by FakeEmbeddings when its simulated request quota is exceeded."""
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Offline stand-in for the remote embedding API, for benchmarks and local runs.
+    Each call sleeps like a network round trip (fixed latency plus a per-text cost),
+    vectors are deterministic per text, and an optional requests-per-second quota
+    raises a 429-style error the same way the real endpoint does under load.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.3, per_text_latency: float = 0.002,
+                 requests_per_second: Optional[float] = None):
+        self.dim = dim
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.requests_per_second = requests_per_second
+        self.requests = 0
+        self.texts_embedded = 0
+        self.quota_errors = 0
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_requests = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._request(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._request(1)
+        return self._vector(text)
+
+    def _request(self, text_count: int):
+        with self._lock:
+            if self.requests_per_second:
+                now = time.time()
+                if now - self._window_start >= 1.0:
+                    self._window_start = now
+                    self._window_requests = 0
+                if self._window_requests >= self.requests_per_second:
+                    self.quota_errors += 1
+                    raise FakeQuotaError("429 Resource has been exhausted (fake quota)")
+                self._window_requests += 1
+            self.requests += 1
+            self.texts_embedded += text_count
+        time.sleep(self.latency + self.per_text_latency * text_count)
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
@@ -0,0 +1,39 @@
+import asyncio
+import hashlib
+from typing import AsyncIterator
+
+
+class FakeLLM:
+    """
+    Offline stand-in for Gemini, for load tests and local runs without a key.
+    A call waits like a real generation (fixed latency plus a per-prompt-token
+    cost), then returns a deterministic Kelebihan/Kekurangan-style answer.
+    stream() yields the same answer word by word at tokens_per_second.
+    """
+
+    def __init__(self, latency: float = 1.0, per_token_latency: float = 0.0001, tokens_per_second: float = 50.0):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self._prompt_latency(prompt))
+        return self._answer(prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self._prompt_latency(prompt))
+        for word in self._answer(prompt).split(" "):
+            await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield word + " "
+
+    def _prompt_latency(self, prompt: str) -> float:
+        return self.latency + self.per_token_latency * (len(prompt) // 4)
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return (f"**Kelebihan:**\n- Jawaban uji ({digest})\n- Kualitas sesuai harga\n\n"
+                f"**Kekurangan:**\n- Pengiriman kadang lambat")
@@ -0,0 +1,220 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+class FlatVectorIndex(VectorStore):
+    """
+    Exact in-process vector index for small per-product corpora.
+    Vectors live in one contiguous, L2-normalised float32 matrix; a query is a
+    single matrix-vector product followed by argpartition for the top k. The
+    index can be saved to .npy/.json files and loaded back memory-mapped.
+    get()/upsert()/count() mirror the subset of the Chroma collection API used
+    for indexing, so the same upsert code works against either store.
+    """
+
+    def __init__(self, embedding: Embeddings, ids: Optional[List[str]] = None,
+                 documents: Optional[List[str]] = None, matrix: Optional[np.ndarray] = None):
+        self._embedding = embedding
+        self._ids: List[str] = ids or []
+        self._documents: List[str] = documents or []
+        self._matrix: Optional[np.ndarray] = matrix
+        self._positions: Dict[str, int] = {doc_id: i for i, doc_id in enumerate(self._ids)}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size: vectors plus document text."""
+        matrix_bytes = self._matrix.nbytes if self._matrix is not None else 0
+        return matrix_bytes + sum(len(document) for document in self._documents)
+
+    # --- Collection-style API used by indexing ---
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Return the stored subset of ids (all ids when ids is None), plus embeddings/documents if included."""
+        include = include or []
+        positions = range(len(self._ids)) if ids is None else [self._positions[i] for i in ids if i in self._positions]
+        positions = list(positions)
+        result: Dict[str, Any] = {"ids": [self._ids[p] for p in positions]}
+        if "documents" in include:
+            result["documents"] = [self._documents[p] for p in positions]
+        if "embeddings" in include:
+            result["embeddings"] = self._matrix[positions] if self._matrix is not None else np.empty((0, 0), dtype=np.float32)
+        return result
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str]):
+        vectors = self._normalise(np.asarray(embeddings, dtype=np.float32))
+        new_rows = []
+        for doc_id, vector, document in zip(ids, vectors, documents):
+            position = self._positions.get(doc_id)
+            if position is not None:
+                if not self._matrix.flags.writeable:
+                    self._matrix = np.array(self._matrix)  # Copy out of a read-only memory map
+                self._matrix[position] = vector
+                self._documents[position] = document
+            else:
+                self._positions[doc_id] = len(self._ids) + len(new_rows)
+                new_rows.append((doc_id, vector, document))
+
+        if new_rows:
+            new_matrix = np.stack([vector for _, vector, _ in new_rows])
+            self._matrix = new_matrix if self._matrix is None else np.ascontiguousarray(np.vstack([self._matrix, new_matrix]))
+            self._ids.extend(doc_id for doc_id, _, _ in new_rows)
+            self._documents.extend(document for _, _, document in new_rows)
+
+    # --- VectorStore API used for retrieval ---
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [f"doc-{len(self._ids) + i}" for i in range(len(texts))]
+        self.upsert(ids, self._embedding.embed_documents(texts), texts)
+        return ids
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        """Exact cosine top-k: one matrix-vector product plus argpartition."""
+        if self._matrix is None or len(self._ids) == 0:
+            return []
+        query = self._normalise(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        scores = self._matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (Document(page_content=self._documents[i], id=self._ids[i]), float(scores[i]))
+            for i in top
+        ]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score  # Scores are already cosine similarities
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, **kwargs: Any) -> "FlatVectorIndex":
+        index = cls(embedding)
+        index.add_texts(texts, ids=ids)
+        return index
+
+    # --- Persistence ---
+    #
+    # A save writes a new, never modified pair <path>-<version>.npy/.json and then
+    # atomically points <path>.current at it. Readers (possibly other workers with
+    # the previous version memory-mapped) keep their files: nothing is replaced
+    # in place, which Windows refuses for mapped files, and a reader never sees a
+    # .npy and .json from different saves.
+
+    def save(self, path: str):
+        """Write a new version of the index and make it current; older versions are removed where possible."""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        version = uuid.uuid4().hex[:16]
+        matrix = self._matrix if self._matrix is not None else np.empty((0, 0), dtype=np.float32)
+        with open(f"{path}-{version}.npy", "wb") as f:
+            np.save(f, matrix)
+        with open(f"{path}-{version}.json", "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "documents": self._documents}, f, ensure_ascii=False)
+        with open(f"{path}.current.tmp", "w", encoding="utf-8") as f:
+            f.write(version)
+        _replace(f"{path}.current.tmp", f"{path}.current")
+        FlatVectorIndex._remove_stale(path, keep=version)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True) -> "FlatVectorIndex":
+        """Load the current version; with mmap the vectors are paged in from disk on demand."""
+        for attempt in range(3):
+            prefix = FlatVectorIndex._current_prefix(path)
+            try:
+                matrix = np.load(f"{prefix}.npy", mmap_mode="r" if mmap else None)
+                with open(f"{prefix}.json", "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise  # Otherwise a newer save removed the version we read; follow the pointer again
+        return cls(embedding, ids=data["ids"], documents=data["documents"], matrix=matrix if matrix.size else None)
+
+    @staticmethod
+    def version(path: str) -> Optional[str]:
+        """Identifier of the current saved version (None if nothing is saved); changes on every save."""
+        try:
+            with open(f"{path}.current", "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            legacy = f"{path}.json"
+            return f"legacy-{os.stat(legacy).st_mtime_ns}" if os.path.exists(legacy) else None
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.current") or (os.path.exists(f"{path}.npy") and os.path.exists(f"{path}.json"))
+
+    @staticmethod
+    def delete(path: str):
+        for name in (f"{path}.current", f"{path}.npy", f"{path}.json"):
+            if os.path.exists(name):
+                os.remove(name)
+        FlatVectorIndex._remove_stale(path, keep=None)
+
+    @staticmethod
+    def _current_prefix(path: str) -> str:
+        """<path>-<version> of the current save, or <path> for indexes saved before versioning."""
+        try:
+            with open(f"{path}.current", "r", encoding="utf-8") as f:
+                return f"{path}-{f.read().strip()}"
+        except FileNotFoundError:
+            return path
+
+    @staticmethod
+    def _remove_stale(path: str, keep: Optional[str]):
+        """Remove other versions and pre-versioning files; ones still mapped (Windows) go on a later save."""
+        directory = os.path.dirname(path) or "."
+        base = os.path.basename(path)
+        stale = [f"{base}.npy", f"{base}.json"]
+        for name in os.listdir(directory):
+            if name.startswith(f"{base}-") and name.endswith((".npy", ".json")):
+                if keep is None or name[len(base) + 1:].rsplit(".", 1)[0] != keep:
+                    stale.append(name)
+        for name in stale:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _normalise(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def _replace(source: str, destination: str, attempts: int = 5):
+    """os.replace, retried briefly: on Windows it fails while another process has the destination open."""
+    for attempt in range(attempts):
+        try:
+            os.replace(source, destination)
+            return
+        except PermissionError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..core.shared_state import get_shared_state
+from .system_metrics_service import system_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_cache_key(model_name: str, prompt: str) -> str:
+    """Exact-match key for an LLM call: model plus a hash of the full prompt."""
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Exact-match response cache with TTL and LRU size limit (used for summaries).
+    With a shared_namespace, entries are also written to the shared state and
+    local misses are looked up there, so all workers reuse each other's results;
+    the local LRU stays in front as a first level.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, shared_namespace: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_namespace = shared_namespace
+        self.name = shared_namespace or "responses"  # Label for cache metrics
+        self._entries: "OrderedDict[str, tuple[Any, float]]" = OrderedDict()  # key -> (response, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                system_metrics.record_cache_hit(self.name)
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+        shared_entry = get_shared_state().get(self.shared_namespace, key) if self.shared_namespace else None
+        with self._lock:
+            if shared_entry is None:
+                self.misses += 1
+                system_metrics.record_cache_miss(self.name)
+                return None
+            self._store_locally(key, *shared_entry)
+            self.hits += 1
+            self.shared_hits += 1
+            system_metrics.record_cache_hit(self.name)
+            return shared_entry[0]
+
+    def put(self, key: str, response: Any):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_locally(key, response, expires_at)
+        if self.shared_namespace:
+            get_shared_state().put(self.shared_namespace, key, response, expires_at)
+
+    def _store_locally(self, key: str, response: Any, expires_at: float):
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 1) if total else 0.0
+        }
+
+
+class SemanticAnswerCache:
+    """
+    Chat answer cache scoped per product that matches on query embeddings.
+    A stored answer is reused when a new question's embedding has cosine
+    similarity >= threshold with a cached question for the same product, so
+    rephrasings of FAQ-style questions ("apakah barang original?") hit too.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries_per_product: int, max_products: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_product = max_entries_per_product
+        self.max_products = max_products
+        # product_id -> deque of (normalised query vector, query, answer, expires_at)
+        self._products: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, product_id: str, query_vector: List[float]) -> Optional[str]:
+        query = self._normalise(query_vector)
+        now = time.time()
+        with self._lock:
+            entries = self._products.get(product_id)
+            if entries:
+                # Drop expired entries while we are here
+                live = [entry for entry in entries if entry[3] >= now]
+                if len(live) != len(entries):
+                    entries.clear()
+                    entries.extend(live)
+                if live:
+                    similarities = np.stack([entry[0] for entry in live]) @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        self._products.move_to_end(product_id)
+                        self.hits += 1
+                        system_metrics.record_cache_hit("chat_answers")
+                        logger.info(f"[LLM-CACHE] Chat cache hit for {product_id} "
+                                    f"(similarity {similarities[best]:.3f} to '{live[best][1][:50]}')")
+                        return live[best][2]
+            self.misses += 1
+            system_metrics.record_cache_miss("chat_answers")
+            return None
+
+    def put(self, product_id: str, query_vector: List[float], query: str, answer: str):
+        entry = (self._normalise(query_vector), query, answer, time.time() + self.ttl_seconds)
+        with self._lock:
+            entries = self._products.get(product_id)
+            if entries is None:
+                entries = self._products[product_id] = deque(maxlen=self.max_entries_per_product)
+            entries.append(entry)
+            self._products.move_to_end(product_id)
+            while len(self._products) > self.max_products:
+                self._products.popitem(last=False)
+
+    def invalidate(self, product_id: str):
+        """Forget a product's answers, e.g. after new reviews were indexed."""
+        with self._lock:
+            self._products.pop(product_id, None)
+
+    @staticmethod
+    def _normalise(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm > 0 else array
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = sum(len(product_entries) for product_entries in self._products.values())
+        return {
+            "products": len(self._products),
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+            "similarity_threshold": self.threshold
+        }
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from .system_metrics_service import STAGE_LLM, system_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def _deadline(seconds: float):
+    """asyncio.timeout() on Python 3.11+; on 3.10 the same by cancelling the task when time is up."""
+    if hasattr(asyncio, "timeout"):
+        async with asyncio.timeout(seconds):
+            yield
+        return
+    task = asyncio.current_task()
+    expired = False
+
+    def _expire():
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    handle = asyncio.get_running_loop().call_later(seconds, _expire)
+    try:
+        yield
+    except asyncio.CancelledError:
+        if expired:
+            raise asyncio.TimeoutError() from None
+        raise
+    finally:
+        handle.cancel()
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call (queueing included) runs past its deadline."""
+
+
+class GeminiLLM:
+    """
+    Gateway backend for a google.generativeai GenerativeModel, using its async API.
+    get_model is called per request, so the model can be built lazily on first use.
+    """
+
+    def __init__(self, get_model: Callable[[], Any]):
+        self.get_model = get_model
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.get_model().generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+_END_OF_STREAM = object()
+
+
+class _StreamFailure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM calls from summaries and chat.
+    Calls run on a dedicated event loop thread, so sync code (via run/
+    generate_sync) and async handlers share one global in-flight cap. Every call
+    has a deadline covering both queueing and generation, the time spent waiting
+    for a slot is recorded, and cancelling the awaiting caller (e.g. on client
+    disconnect) cancels the upstream request.
+    """
+
+    def __init__(self, backend, max_in_flight: int = 16, timeout: float = 60.0, stream_timeout: float = 120.0):
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        # Counters below are only mutated on the gateway loop thread
+        self.calls = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.queue_times = deque(maxlen=1000)  # seconds waited for a slot, last 1000 calls
+        self.latencies = deque(maxlen=1000)  # seconds from slot to completion
+
+    # --- Public API ---
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Await a full completion from any event loop."""
+        return await asyncio.wrap_future(self._submit(self._generate(prompt, timeout or self.timeout)))
+
+    def generate_sync(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Blocking variant for worker threads."""
+        return self._submit(self._generate(prompt, timeout or self.timeout)).result()
+
+    def run(self, coroutine: Awaitable[Any]) -> Any:
+        """Run a coroutine that uses the gateway (e.g. a map-reduce summary) from sync code."""
+        return self._submit(coroutine).result()
+
+    def submit(self, coroutine: Awaitable[Any]) -> Future:
+        """Schedule a coroutine on the gateway loop without waiting for it (background work)."""
+        return self._submit(coroutine)
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Yield text chunks as they are generated. Closing the iterator early
+        (or cancelling the consumer) cancels the upstream stream.
+        """
+        caller_loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def _deliver(item):
+            try:
+                caller_loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                pass  # Caller loop already closed
+
+        async def _produce():
+            try:
+                async for chunk in self._stream(prompt, timeout or self.stream_timeout):
+                    _deliver(chunk)
+                _deliver(_END_OF_STREAM)
+            except BaseException as e:
+                _deliver(_StreamFailure(e))
+                raise
+
+        producer = self._submit(_produce())
+        try:
+            while True:
+                item = await chunks.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, _StreamFailure):
+                    raise item.error
+                yield item
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        queue_times = list(self.queue_times)
+        latencies = list(self.latencies)
+        return {
+            "backend": type(self.backend).__name__,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "avg_queue_ms": round(sum(queue_times) / len(queue_times) * 1000, 1) if queue_times else 0.0,
+            "max_queue_ms": round(max(queue_times) * 1000, 1) if queue_times else 0.0,
+            "avg_latency_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0
+        }
+
+    # --- Gateway loop ---
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def _submit(self, coroutine) -> Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop())
+
+    async def _generate(self, prompt: str, timeout: float) -> str:
+        enqueued_at = time.time()
+        self.queued += 1
+        waiting = True
+        try:
+            async with _deadline(timeout):
+                async with self._semaphore:
+                    waiting = False
+                    self.queued -= 1
+                    started_at = self._start_call(enqueued_at)
+                    try:
+                        return await self.backend.generate(prompt)
+                    finally:
+                        self._finish_call(started_at)
+        except (TimeoutError, asyncio.TimeoutError):  # Distinct classes before Python 3.11
+            self.timeouts += 1
+            logger.warning(f"[LLM] Call exceeded its {timeout:g}s deadline")
+            raise LLMTimeoutError(f"batas waktu {timeout:g} detik terlampaui")
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    async def _stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        enqueued_at = time.time()
+        self.queued += 1
+        waiting = True
+        try:
+            async with _deadline(timeout):
+                async with self._semaphore:
+                    waiting = False
+                    self.queued -= 1
+                    started_at = self._start_call(enqueued_at)
+                    try:
+                        async for chunk in self.backend.stream(prompt):
+                            yield chunk
+                    finally:
+                        self._finish_call(started_at)
+        except (TimeoutError, asyncio.TimeoutError):  # Distinct classes before Python 3.11
+            self.timeouts += 1
+            logger.warning(f"[LLM] Call exceeded its {timeout:g}s deadline")
+            raise LLMTimeoutError(f"batas waktu {timeout:g} detik terlampaui")
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    def _start_call(self, enqueued_at: float) -> float:
+        started_at = time.time()
+        self.queue_times.append(started_at - enqueued_at)
+        self.calls += 1
+        self.in_flight += 1
+        return started_at
+
+    def _finish_call(self, started_at: float):
+        latency = time.time() - started_at
+        self.in_flight -= 1
+        self.latencies.append(latency)
+        system_metrics.record_stage(STAGE_LLM, latency)
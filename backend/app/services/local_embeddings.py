@@ -0,0 +1,59 @@
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU embedding backend using sentence-transformers, for running without the
+    remote embedding endpoint. The model is loaded once, either explicitly via
+    warm_up() at startup or lazily on first use behind a lock, and texts are
+    encoded in batches with a configurable number of torch threads.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, num_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def warm_up(self):
+        """Load the model and run one encode so the first real request pays no load cost."""
+        self._get_model().encode(["warm up"], batch_size=1)
+
+    def _get_model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    # Imported here so the remote backend never pays for torch
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+
+                    if self.num_threads:
+                        torch.set_num_threads(self.num_threads)
+                    start_time = time.time()
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+                    logger.info(f"[EMBED] Local model {self.model_name} loaded in {time.time() - start_time:.2f}s "
+                                f"({torch.get_num_threads()} threads)")
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self._get_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
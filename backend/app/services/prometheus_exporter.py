@@ -0,0 +1,160 @@
+import logging
+from itertools import accumulate
+from operator import itemgetter
+from typing import Dict, List, Tuple
+
+from ..core import executors, priority
+from ..core.admission import scrape_admission
+from . import rag_service
+from .system_metrics_service import BUCKET_BOUNDS, HISTOGRAM_BUCKETS, system_metrics
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "market_analyzer"
+
+# Prometheus histograms use every 4th internal bucket (0.1ms, 0.2ms, 0.4ms, ... ~28 min),
+# so each series exports 26 buckets instead of 101; le strings are formatted once.
+EXPORT_BUCKET_STEP = 4
+_EXPORT_INDEXES = range(0, HISTOGRAM_BUCKETS, EXPORT_BUCKET_STEP)
+_EXPORT_BOUNDS = [f"{BUCKET_BOUNDS[index]:.6g}" for index in _EXPORT_INDEXES]
+_export_counts = itemgetter(*_EXPORT_INDEXES)
+
+_label_cache: Dict[Tuple[Tuple[str, str], ...], str] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    """Rendered {k="v",...} label set; memoised because the same series are rendered on every scrape."""
+    key = tuple(labels.items())
+    rendered = _label_cache.get(key)
+    if rendered is None:
+        rendered = ",".join(f'{name}="{_escape(str(value))}"' for name, value in key)
+        if len(_label_cache) < 10000:
+            _label_cache[key] = rendered
+    return rendered
+
+
+class _Exposition:
+    """Collects families in the Prometheus text format: one HELP/TYPE header per family, then its samples."""
+
+    def __init__(self):
+        self._families: Dict[str, List[str]] = {}
+
+    def _family(self, name: str, kind: str, help_text: str) -> List[str]:
+        samples = self._families.get(name)
+        if samples is None:
+            samples = self._families[name] = [f"# HELP {METRIC_PREFIX}_{name} {help_text}", f"# TYPE {METRIC_PREFIX}_{name} {kind}"]
+        return samples
+
+    def sample(self, name: str, kind: str, help_text: str, labels: str, value: float):
+        self._family(name, kind, help_text).append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}")
+
+    def histogram(self, name: str, help_text: str, labels: str, counts: List[int], count: int, total_seconds: float):
+        samples = self._family(name, "histogram", help_text)
+        series = f"{METRIC_PREFIX}_{name}"
+        bucket_prefix = f'{series}_bucket{{{labels},le="'
+        cumulative = _export_counts(list(accumulate(counts)))
+        samples.extend([f'{bucket_prefix}{bound}"}} {bucket_count}' for bound, bucket_count in zip(_EXPORT_BOUNDS, cumulative)])
+        samples.append(f'{series}_bucket{{{labels},le="+Inf"}} {count}')
+        samples.append(f"{series}_sum{{{labels}}} {total_seconds}")
+        samples.append(f"{series}_count{{{labels}}} {count}")
+
+    def render(self) -> str:
+        return "\n".join(line for samples in self._families.values() for line in samples) + "\n"
+
+
+def _dense(buckets: Dict[str, int]) -> List[int]:
+    counts = [0] * (HISTOGRAM_BUCKETS + 1)
+    for index, bucket_count in buckets.items():
+        counts[int(index)] = bucket_count
+    return counts
+
+
+def _worker_series(exposition: _Exposition, worker: str, start_time: float, api_calls: int, caches: Dict[str, List[int]],
+                   route_bytes: Dict[str, int], histograms: Dict[str, Dict[str, Tuple[List[int], int, float]]]):
+    """Counters and latency histograms one worker keeps in system_metrics."""
+    exposition.sample("start_time_seconds", "gauge", "Worker start time (unix seconds).",
+                      _labels(worker=worker), start_time)
+    exposition.sample("api_calls_total", "counter", "HTTP requests seen by the metrics middleware.",
+                      _labels(worker=worker), api_calls)
+    for cache, (hits, misses) in sorted(caches.items()):
+        exposition.sample("cache_hits_total", "counter", "Cache hits per cache.", _labels(worker=worker, cache=cache), hits)
+        exposition.sample("cache_misses_total", "counter", "Cache misses per cache.", _labels(worker=worker, cache=cache), misses)
+    for route, (counts, count, total_seconds) in sorted(histograms.get("routes", {}).items()):
+        method, _, template = route.partition(" ")
+        exposition.histogram("request_duration_seconds", "Request latency to the last response byte per route template.",
+                             _labels(worker=worker, method=method, route=template), counts, count, total_seconds)
+    for route, (counts, count, total_seconds) in sorted(histograms.get("route_headers", {}).items()):
+        method, _, template = route.partition(" ")
+        exposition.histogram("request_headers_seconds", "Request latency to the response headers per route template.",
+                             _labels(worker=worker, method=method, route=template), counts, count, total_seconds)
+    for route, bytes_sent in sorted(route_bytes.items()):
+        method, _, template = route.partition(" ")
+        exposition.sample("response_bytes_total", "counter", "Response body bytes sent per route template.",
+                          _labels(worker=worker, method=method, route=template), bytes_sent)
+    for stage, (counts, count, total_seconds) in sorted(histograms.get("stages", {}).items()):
+        exposition.histogram("stage_duration_seconds", "Pipeline stage latency (driver_start, page_load, parse, embed, llm, ...).",
+                             _labels(worker=worker, stage=stage), counts, count, total_seconds)
+
+
+def _process_series(exposition: _Exposition, worker: str):
+    """Point-in-time state of this worker's pools, lanes and gateway, read without computing averages."""
+    for name, executor in list(executors.BoundedExecutor.registry.items()):
+        labels = _labels(worker=worker, executor=name)
+        exposition.sample("executor_workers", "gauge", "Threads in each bounded executor (scrape = browser pool).", labels, executor.max_workers)
+        exposition.sample("executor_active", "gauge", "Jobs running in each executor.", labels, executor.active)
+        exposition.sample("executor_queued", "gauge", "Jobs waiting for an executor thread.", labels, executor.queued)
+        exposition.sample("executor_utilisation", "gauge", "Share of executor threads busy.", labels,
+                          round(executor.active / executor.max_workers, 4) if executor.max_workers else 0.0)
+        exposition.sample("executor_completed_total", "counter", "Jobs that returned successfully per executor.", labels, executor.completed)
+        exposition.sample("executor_failed_total", "counter", "Jobs that raised per executor.", labels, executor.failed)
+
+    for name, lane in list(priority.scheduler.lanes.items()):
+        labels = _labels(worker=worker, lane=name)
+        exposition.sample("lane_active", "gauge", "Requests running in each priority lane.", labels, lane.active)
+        exposition.sample("lane_queued", "gauge", "Requests waiting for a slot in each priority lane.", labels, len(lane.waiters))
+        exposition.sample("lane_completed_total", "counter", "Requests finished per priority lane.", labels, lane.completed)
+
+    labels = _labels(worker=worker)
+    exposition.sample("admission_admitted_total", "counter", "Analyze requests admitted.", labels, scrape_admission.admitted)
+    exposition.sample("admission_shed_total", "counter", "Analyze requests rejected with 429.", labels, scrape_admission.shed)
+
+    gateway = rag_service.llm_gateway
+    exposition.sample("llm_in_flight", "gauge", "LLM calls in progress.", labels, gateway.in_flight)
+    exposition.sample("llm_queued", "gauge", "LLM calls waiting for a gateway slot.", labels, gateway.queued)
+    exposition.sample("llm_calls_total", "counter", "LLM calls made through the gateway.", labels, gateway.calls)
+    exposition.sample("llm_timeouts_total", "counter", "LLM calls that timed out.", labels, gateway.timeouts)
+    exposition.sample("llm_errors_total", "counter", "LLM calls that failed.", labels, gateway.errors)
+    exposition.sample("llm_cancelled_total", "counter", "LLM calls cancelled by their caller.", labels, gateway.cancelled)
+
+    registry = rag_service.vector_store_registry.stats()
+    exposition.sample("vector_stores_resident", "gauge", "Product indexes held in memory.", labels, registry["resident_products"])
+    exposition.sample("vector_store_loads_total", "counter", "Product indexes loaded into memory.", labels, registry["loads"])
+    exposition.sample("vector_store_evictions_total", "counter", "Product indexes evicted to stay within budget.", labels, registry["evictions"])
+
+
+def render_metrics() -> str:
+    """
+    Everything in /system-stats that a scraper needs, in the Prometheus text
+    format. Request and stage histograms and cache counters cover every live
+    worker (others as of their last published snapshot); pool, lane and
+    gateway gauges describe the worker that answered. All series carry a
+    worker label, so aggregate with sum by (...) across workers.
+    """
+    exposition = _Exposition()
+    own = system_metrics.lifetime()
+    _worker_series(exposition, system_metrics.worker_id, own["start_time"], own["api_calls"], own["caches"], own["route_bytes"],
+                   own["histograms"])
+    for worker_id, snapshot in sorted(system_metrics.other_worker_snapshots().items()):
+        histograms = {
+            family_name: {name: (_dense(entry["buckets"]), entry["count"], entry["sum"]) for name, entry in series.items()}
+            for family_name, series in snapshot.get("lifetime", {}).items()
+        }
+        _worker_series(exposition, worker_id, snapshot["start_time"], snapshot["api_calls"],
+                       snapshot.get("caches", {}), snapshot.get("route_bytes", {}), histograms)
+    _process_series(exposition, system_metrics.worker_id)
+    return exposition.render()
@@ -1,76 +1,588 @@
-import google.generativeai as genai
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import asyncio
+import logging
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from typing import AsyncIterator, Iterable
 from ..core.config import settings
+from ..core.file_lock import file_lock
+from ..core.shared_state import get_shared_state
+from ..core.startup import Lazy
+from .bm25_index import BM25Index, reciprocal_rank_fusion
+from .context_assembly import assemble_context, trim_to_tokens
+from .embedding_cache import CachedEmbeddings
+from .embedding_pipeline import EmbeddingPipeline
+from .fake_embeddings import FakeEmbeddings
+from .fake_llm import FakeLLM
+from .flat_vector_index import FlatVectorIndex
+from .llm_cache import ResponseCache, SemanticAnswerCache, prompt_cache_key
+from .llm_gateway import GeminiLLM, LLMGateway
+from .local_embeddings import LocalEmbeddings
+from .summary_service import MapReduceSummarizer, estimate_tokens
+from .system_metrics_service import system_metrics
+from .vector_store_registry import VectorStoreRegistry, collection_name_for, estimate_store_bytes
+
+logger = logging.getLogger(__name__)
 
 # --- KONFIGURASI YANG BENAR ---
+# google-generativeai, langchain dan chromadb butuh beberapa detik untuk diimpor, jadi
+# klien-kliennya dibuat saat pertama dipakai (lihat core/startup.py untuk warm-up).
+
+# 1. Model LLM untuk generasi teks. genai.configure() dipanggil sekali di sini,
+# dan GenerativeModel otomatis memakai kunci tersebut.
+LLM_MODEL_NAME = 'gemini-2.5-flash'
 
-# 1. Konfigurasi GLOBAL untuk pustaka google-generativeai asli
-# Ini akan digunakan oleh genai.GenerativeModel
-genai.configure(api_key=settings.GEMINI_API_KEY)
+def _create_gemini_model():
+    import google.generativeai as genai
+    genai.configure(api_key=settings.require_gemini_api_key())
+    return genai.GenerativeModel(LLM_MODEL_NAME)
 
-# 2. Inisialisasi model LLM untuk generasi teks
-# Ia sekarang akan secara otomatis menggunakan kunci dari genai.configure()
-# Kita HAPUS argumen api_key dari sini.
-gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+_gemini_model = Lazy("llm", _create_gemini_model)
 
-# 3. Inisialisasi model Embedding dari LangChain
-# Pembungkus LangChain ini MEMBUTUHKAN api key secara langsung.
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001", 
-    google_api_key=settings.GEMINI_API_KEY
+def get_gemini_model():
+    return _gemini_model.get()
+
+# Semua panggilan LLM (ringkasan dan chat) lewat gateway: batas waktu per panggilan,
+# batas jumlah panggilan bersamaan, dan pembatalan saat klien terputus.
+# LLM_BACKEND="fake" memakai FakeLLM agar uji beban bisa berjalan offline.
+llm_gateway = LLMGateway(
+    FakeLLM(latency=settings.FAKE_LLM_LATENCY) if settings.LLM_BACKEND == "fake" else GeminiLLM(get_gemini_model),
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    stream_timeout=settings.LLM_STREAM_TIMEOUT_SECONDS
 )
+
+# 2. Model Embedding sesuai EMBEDDING_BACKEND:
+#    "remote" (Gemini API), "local" (sentence-transformers di CPU) atau "fake" (offline).
+# The name is known without building the model, since collection names depend on it.
+EMBEDDING_MODEL_NAME = {
+    "local": settings.LOCAL_EMBEDDING_MODEL,
+    "fake": "fake-embedding"
+}.get(settings.EMBEDDING_BACKEND, "models/embedding-001")
+
+def _create_base_embeddings():
+    if settings.EMBEDDING_BACKEND == "local":
+        return LocalEmbeddings(
+            settings.LOCAL_EMBEDDING_MODEL,
+            batch_size=settings.LOCAL_EMBEDDING_BATCH_SIZE,
+            num_threads=settings.LOCAL_EMBEDDING_THREADS
+        )
+    if settings.EMBEDDING_BACKEND == "fake":
+        return FakeEmbeddings(latency=0.0, per_text_latency=0.0)
+    # Pembungkus LangChain untuk Gemini MEMBUTUHKAN api key secara langsung.
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model="models/embedding-001",
+        google_api_key=settings.require_gemini_api_key()
+    )
+
+# Dibungkus cache berbasis konten agar teks yang sama tidak di-embed ulang.
+_embedding_model = Lazy("embeddings", lambda: CachedEmbeddings(
+    _create_base_embeddings(),
+    model_name=EMBEDDING_MODEL_NAME,
+    cache_dir=settings.EMBEDDING_CACHE_DIR
+))
+
+def get_embedding_model() -> CachedEmbeddings:
+    return _embedding_model.get()
+
+# Batched, concurrency-limited embedding with backoff on quota errors.
+# The local backend parallelises inside torch, so it gets a single worker.
+_embedding_pipeline = Lazy("embedding_pipeline", lambda: EmbeddingPipeline(
+    get_embedding_model(),
+    batch_size=settings.EMBEDDING_BATCH_SIZE,
+    max_workers=1 if settings.EMBEDDING_BACKEND == "local" else settings.EMBEDDING_MAX_CONCURRENCY,
+    max_retries=settings.EMBEDDING_MAX_RETRIES
+))
+
+def get_embedding_pipeline() -> EmbeddingPipeline:
+    return _embedding_pipeline.get()
+
+def warm_up_embeddings():
+    """Load the local embedding model ahead of the first request (no-op for other backends)."""
+    base_embeddings = get_embedding_model().base
+    if hasattr(base_embeddings, "warm_up"):
+        base_embeddings.warm_up()
+
+def embedding_cache_stats() -> dict:
+    """Cache stats without building the embedding model just to report on it."""
+    if not _embedding_model.initialized:
+        return {"initialized": False}
+    return _embedding_model.get().stats()
 # ---------------------------------
 
-vector_store = None
+# Persistent Chroma client shared by all product collections. Collections survive
+# restarts; chromadb's LRU segment cache keeps resident indexes within the budget.
+VECTOR_STORE_MEMORY_BUDGET_BYTES = settings.VECTOR_STORE_MEMORY_BUDGET_MB * 1024 * 1024
 
-def create_vector_store(texts: list[str]):
-    global vector_store
-    if not texts:
-        return "Tidak ada teks ulasan untuk diindeks."
+def _create_chroma_client():
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+    return chromadb.PersistentClient(
+        path=settings.CHROMA_PERSIST_DIR,
+        settings=ChromaSettings(
+            anonymized_telemetry=False,
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=VECTOR_STORE_MEMORY_BUDGET_BYTES
+        )
+    )
+
+_chroma_client = Lazy("vector_store", _create_chroma_client)
+
+def get_chroma_client():
+    return _chroma_client.get()
+
+# Reviews are split and indexed this many at a time, so an iterable of any
+# length can be indexed without materialising all chunks at once. Each group
+# is embedded by the pipeline in EMBEDDING_BATCH_SIZE calls running in parallel.
+INDEX_BATCH_SIZE = 1000
+
+def _collection_name(product_id: str) -> str:
+    return collection_name_for(product_id, EMBEDDING_MODEL_NAME)
+
+def _flat_index_path(product_id: str) -> str:
+    return os.path.join(settings.CHROMA_PERSIST_DIR, "flat", _collection_name(product_id))
+
+def _lexical_index_path(product_id: str) -> str:
+    return os.path.join(settings.CHROMA_PERSIST_DIR, "bm25", f"{_collection_name(product_id)}.json")
+
+# Workers on one host share the index files, so writes are serialised across processes:
+# one lock per product around each read-modify-write of its saved index, and one for
+# all Chroma writes, since chromadb's PersistentClient is not safe for concurrent writers.
+# Both are only held for the write itself (see _ProductIndexWriter).
+def _product_index_lock(product_id: str):
+    return file_lock(os.path.join(settings.CHROMA_PERSIST_DIR, "locks", f"{_collection_name(product_id)}.lock"))
+
+def _chroma_write_lock():
+    return file_lock(os.path.join(settings.CHROMA_PERSIST_DIR, "locks", "chroma.lock"))
+
+def _chroma_collection_exists(product_id: str) -> bool:
+    try:
+        get_chroma_client().get_collection(_collection_name(product_id))
+        return True
+    except Exception:
+        return False
+
+def _open_store(product_id: str):
+    """Open (or create) the product's persistent collection. No embedding calls are made."""
+    from langchain_community.vectorstores import Chroma
+    return Chroma(
+        client=get_chroma_client(),
+        collection_name=_collection_name(product_id),
+        embedding_function=get_embedding_model()
+    )
 
+@dataclass
+class ProductIndex:
+    """What the registry holds per product: the vector store and its BM25 index."""
+    vector_store: object
+    lexical_index: BM25Index
+
+def _load_lexical_index(product_id: str, vector_store) -> BM25Index:
+    """Load the product's BM25 index, building it from the stored chunks if it predates hybrid retrieval."""
+    path = _lexical_index_path(product_id)
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    lexical_index = BM25Index()
+    stored = vector_store.get(include=["documents"])  # FlatVectorIndex, Chroma wrapper and raw collection alike
+    lexical_index.add(stored["ids"], stored["documents"])
+    if len(lexical_index) > 0:
+        with _product_index_lock(product_id):
+            lexical_index.save(path)
+    return lexical_index
+
+def _load_persisted_store(product_id: str):
+    """Registry loader: reopen a product indexed earlier, possibly before a restart."""
+    flat_path = _flat_index_path(product_id)
+    if FlatVectorIndex.exists(flat_path):
+        vector_store = FlatVectorIndex.load(flat_path, get_embedding_model(), mmap=True)
+        vector_bytes = vector_store.nbytes
+    else:
+        try:
+            chunk_count = get_chroma_client().get_collection(_collection_name(product_id)).count()
+        except Exception:
+            return None
+        if chunk_count == 0:
+            return None
+        vector_store, vector_bytes = _open_store(product_id), estimate_store_bytes(chunk_count, 0)
+
+    lexical_index = _load_lexical_index(product_id, vector_store)
+    return ProductIndex(vector_store, lexical_index), vector_bytes + lexical_index.nbytes
+
+# Every index is persisted, so products are (re)loaded from disk through _load_persisted_store and eviction
+# only drops the registry's reference: that unmaps flat indexes and frees BM25 indexes, while Chroma
+# segments are bounded by chromadb's own LRU segment cache
+vector_store_registry = VectorStoreRegistry(VECTOR_STORE_MEMORY_BUDGET_BYTES, default_loader=_load_persisted_store)
+
+# LLM response caches. Summaries are keyed by the exact prompt; chat answers are
+# matched by query embedding within the same product, so rephrased questions hit.
+summary_cache = ResponseCache(
+    max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS,
+    shared_namespace="summaries"
+)
+chat_answer_cache = SemanticAnswerCache(
+    threshold=settings.CHAT_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.CHAT_CACHE_TTL_SECONDS,
+    max_entries_per_product=settings.CHAT_CACHE_MAX_ENTRIES_PER_PRODUCT,
+    max_products=settings.CHAT_CACHE_MAX_PRODUCTS
+)
+
+# Index generation of each product as last seen by this worker. Indexing new reviews
+# bumps the shared generation, so other workers notice their resident index and
+# cached answers for the product are stale.
+_seen_index_generations: dict = {}
+
+def _sync_index_generation(product_id: str):
+    generation = get_shared_state().generation(f"index:{product_id}")
+    seen = _seen_index_generations.get(product_id)
+    if seen is not None and seen != generation:
+        logger.info(f"[RAG] {product_id} was reindexed by another worker; reloading its index")
+        vector_store_registry.invalidate(product_id)
+        chat_answer_cache.invalidate(product_id)
+    _seen_index_generations[product_id] = generation
+
+def _review_chunk_ids(review_text: str, chunk_count: int) -> list[str]:
+    """Document IDs derived from the review's content hash, so re-indexing is idempotent."""
+    digest = hashlib.sha256(review_text.encode("utf-8")).hexdigest()[:32]
+    return [f"{digest}-{i}" for i in range(chunk_count)]
+
+def _migrate_flat_to_chroma(product_id: str, flat_index: FlatVectorIndex):
+    """Move a product that outgrew the flat index into its Chroma collection."""
+    collection = get_chroma_client().get_or_create_collection(_collection_name(product_id))
+    stored = flat_index.get(include=["embeddings", "documents"])
+    for start in range(0, len(stored["ids"]), INDEX_BATCH_SIZE):
+        collection.upsert(
+            ids=stored["ids"][start:start + INDEX_BATCH_SIZE],
+            embeddings=stored["embeddings"][start:start + INDEX_BATCH_SIZE],
+            documents=stored["documents"][start:start + INDEX_BATCH_SIZE]
+        )
+    FlatVectorIndex.delete(_flat_index_path(product_id))
+    logger.info(f"[RAG] {product_id} grew past {settings.FLAT_INDEX_MAX_CHUNKS} chunks, migrated to Chroma")
+    return collection
+
+# Chunks of one indexing run added to the BM25 index in memory before they are merged into the saved index
+LEXICAL_FLUSH_CHUNKS = 10000
+
+def _file_version(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+class _ProductIndexWriter:
+    """
+    Persists one indexing run of a product. Every read or write takes the
+    product lock (plus the Chroma lock for Chroma writes) only for its own
+    duration and starts from what other workers saved meanwhile, so concurrent
+    runs for a product merge instead of overwriting each other. Reading the
+    reviews (the live scrape in streaming mode) and embedding happen outside
+    the locks, so a slow run blocks neither other products nor chat.
+    """
+
+    def __init__(self, product_id: str):
+        self.product_id = product_id
+        self.flat_path = _flat_index_path(product_id)
+        self.lexical_path = _lexical_index_path(product_id)
+        self.target = None  # FlatVectorIndex or the raw Chroma collection, as of the last locked read
+        self._flat_version = None
+        self.lexical_index = None
+        self._lexical_version = None
+        self._pending_ids: list[str] = []
+        self._pending_texts: list[str] = []
+
+    def _refresh(self):
+        """Catch up with the saved index; called with the product lock held."""
+        if self.target is not None and not isinstance(self.target, FlatVectorIndex):
+            return  # Products never move back from Chroma to the flat index
+        version = FlatVectorIndex.version(self.flat_path)
+        if version is not None:
+            if self.target is None or version != self._flat_version:
+                self.target = FlatVectorIndex.load(self.flat_path, get_embedding_model(), mmap=False)
+                self._flat_version = version
+        elif _chroma_collection_exists(self.product_id):
+            self.target = get_chroma_client().get_collection(_collection_name(self.product_id))
+        elif self.target is None or self._flat_version is not None:
+            self.target, self._flat_version = FlatVectorIndex(get_embedding_model()), None
+
+    def existing_ids(self, chunk_ids: list[str]) -> set:
+        if not chunk_ids:
+            return set()
+        with _product_index_lock(self.product_id):
+            self._refresh()
+            return set(self.target.get(ids=chunk_ids, include=[])["ids"])
+
+    def write(self, ids: list[str], vectors: list[list[float]], documents: list[str]):
+        """Upsert one embedding batch and save it before returning."""
+        with _product_index_lock(self.product_id):
+            self._refresh()
+            if isinstance(self.target, FlatVectorIndex):
+                new_count = len(ids) - len(self.target.get(ids=ids, include=[])["ids"])
+                if self.target.count() + new_count > settings.FLAT_INDEX_MAX_CHUNKS:
+                    with _chroma_write_lock():  # Product lock first, then Chroma: one order everywhere
+                        self.target = _migrate_flat_to_chroma(self.product_id, self.target)
+            if isinstance(self.target, FlatVectorIndex):
+                self.target.upsert(ids=ids, embeddings=vectors, documents=documents)
+                self.target.save(self.flat_path)
+                self._flat_version = FlatVectorIndex.version(self.flat_path)
+            else:
+                with _chroma_write_lock():
+                    self.target.upsert(ids=ids, embeddings=vectors, documents=documents)
+
+    def add_lexical(self, ids: list[str], texts: list[str]):
+        self._pending_ids.extend(ids)
+        self._pending_texts.extend(texts)
+        if len(self._pending_ids) >= LEXICAL_FLUSH_CHUNKS:
+            self.flush_lexical()
+
+    def flush_lexical(self):
+        """Merge this run's BM25 additions into the saved index."""
+        with _product_index_lock(self.product_id):
+            if self.lexical_index is None or _file_version(self.lexical_path) != self._lexical_version:
+                self._refresh()
+                self.lexical_index = _load_lexical_index(self.product_id, self.target)
+            if self.lexical_index.add(self._pending_ids, self._pending_texts) or not os.path.exists(self.lexical_path):
+                self.lexical_index.save(self.lexical_path)
+            self._lexical_version = _file_version(self.lexical_path)
+        self._pending_ids, self._pending_texts = [], []
+
+    def resident_store(self):
+        """(vector store, size_bytes) of the product as saved now, for the registry."""
+        with _product_index_lock(self.product_id):
+            self._refresh()
+        if isinstance(self.target, FlatVectorIndex):
+            return self.target, self.target.nbytes
+        return _open_store(self.product_id), estimate_store_bytes(self.target.count(), 0)
+
+def create_vector_store(texts: Iterable[str], product_id: str):
+    """
+    Upsert reviews into the product's persistent index.
+    Small products (up to FLAT_INDEX_MAX_CHUNKS chunks) use a FlatVectorIndex
+    saved next to the Chroma data; larger ones use a Chroma collection.
+    Only reviews whose content hash is not stored yet are embedded. Every
+    embedding batch is written as soon as it completes, so a failure part-way
+    keeps the progress made so far and a retry resumes from there.
+    Runs for the same product in several workers may overlap; see
+    _ProductIndexWriter for how their writes are merged.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.create_documents(texts)
-    
-    vector_store = Chroma.from_documents(
-        documents=chunks,
-        embedding=embedding_model
+    writer = _ProductIndexWriter(product_id)
+
+    text_count = 0
+    new_chunk_count = 0
+    reused_chunk_count = 0
+    index_error = None
+    text_iter = iter(texts)
+    try:
+        while batch := list(islice(text_iter, INDEX_BATCH_SIZE)):
+            chunk_ids = []
+            chunk_texts = []
+            for text in batch:
+                chunks = text_splitter.split_text(text)
+                chunk_ids.extend(_review_chunk_ids(text, len(chunks)))
+                chunk_texts.extend(chunks)
+            text_count += len(batch)
+            writer.add_lexical(chunk_ids, chunk_texts)  # No embedding needed, so always complete
+
+            existing_ids = writer.existing_ids(chunk_ids)
+            new_chunks = {}
+            for chunk_id, chunk_text in zip(chunk_ids, chunk_texts):
+                if chunk_id not in existing_ids:
+                    new_chunks[chunk_id] = chunk_text  # dict also drops duplicates within the batch
+            reused_chunk_count += len(chunk_ids) - len(new_chunks)
+
+            new_ids = list(new_chunks.keys())
+
+            def _write_batch(offset: int, batch_texts: list[str], vectors: list[list[float]]):
+                nonlocal new_chunk_count
+                writer.write(new_ids[offset:offset + len(batch_texts)], vectors, batch_texts)
+                new_chunk_count += len(batch_texts)
+
+            get_embedding_pipeline().embed(list(new_chunks.values()), on_batch=_write_batch)
+    except Exception as e:
+        logger.error(f"[RAG] Indexing for {product_id} stopped after {new_chunk_count} new chunks: {str(e)}")
+        index_error = str(e)
+
+    if text_count == 0:
+        return "Tidak ada teks ulasan untuk diindeks."
+
+    if new_chunk_count > 0:
+        chat_answer_cache.invalidate(product_id)  # Cached answers did not see the new reviews
+
+    writer.flush_lexical()
+    store, size_bytes = writer.resident_store()
+    vector_store_registry.register(
+        product_id,
+        store=ProductIndex(store, writer.lexical_index),
+        size_bytes=size_bytes + writer.lexical_index.nbytes
     )
-    return f"Berhasil mengindeks {len(texts)} ulasan menjadi {len(chunks)} potongan."
+    if new_chunk_count > 0:
+        _seen_index_generations[product_id] = get_shared_state().bump_generation(f"index:{product_id}")
+    if index_error:
+        return (f"Pengindeksan sebagian: {new_chunk_count} potongan baru tersimpan sebelum terjadi kesalahan "
+                f"({index_error}). Ulangi analisis untuk melanjutkan.")
+    return (f"Berhasil mengindeks {text_count} ulasan: {new_chunk_count} potongan baru, "
+            f"{reused_chunk_count} potongan sudah terindeks sebelumnya.")
+
+async def _generate_summary_text(prompt: str) -> str:
+    """One LLM call of the summariser, cached by the exact prompt."""
+    cache_key = prompt_cache_key(LLM_MODEL_NAME, prompt)
+    cached_summary = summary_cache.get(cache_key)
+    if cached_summary is not None:
+        return cached_summary
+    summary = await llm_gateway.generate(prompt)
+    summary_cache.put(cache_key, summary)
+    return summary
 
-def generate_initial_summary(reviews: list[str]) -> str:
-    sample_reviews = " ".join(reviews[:20])
+summarizer = MapReduceSummarizer(
+    _generate_summary_text,
+    group_token_budget=settings.SUMMARY_GROUP_TOKEN_BUDGET,
+    reduce_fan_in=settings.SUMMARY_REDUCE_FAN_IN,
+    max_concurrency=settings.SUMMARY_MAX_CONCURRENCY,
+    review_max_chars=settings.SUMMARY_REVIEW_MAX_CHARS,
+    max_map_groups=settings.SUMMARY_MAX_MAP_GROUPS
+)
+
+async def generate_initial_summary(reviews_data: list[dict]) -> str:
+    """Kelebihan/Kekurangan summary over all reviews (dicts with "text" and optional "rating")."""
+    try:
+        return await summarizer.summarize(reviews_data)
+    except Exception as e:
+        return f"Gagal membuat ringkasan: {str(e)}"
+
+# Chunks passed to the LLM per question; each retriever contributes twice as many candidates to the fusion
+RETRIEVAL_K = 5
+
+# How questions were answered: lexical fast path, hybrid BM25 + vector, or semantic cache
+retrieval_stats = Counter()
+
+def _retrieve(user_query: str, product_index: ProductIndex):
+    """
+    Returns (documents, query_vector). Keyword-heavy queries (sizes, model codes)
+    are answered from BM25 alone with no embedding call, and query_vector is None.
+    Otherwise BM25 and vector results are fused with reciprocal rank fusion.
+    """
+    lexical_index = product_index.lexical_index
+    if settings.LEXICAL_FAST_PATH and lexical_index.is_keyword_query(user_query):
+        lexical_docs = [doc for doc, _ in lexical_index.search(user_query, RETRIEVAL_K)]
+        if lexical_docs:
+            retrieval_stats["lexical"] += 1
+            return lexical_docs, None
+
+    # The query embedding is cached, so a repeated question costs no embedding call
+    query_vector = get_embedding_model().embed_query(user_query)
+    vector_docs = product_index.vector_store.similarity_search_by_vector(query_vector, k=RETRIEVAL_K * 2)
+    lexical_docs = [doc for doc, _ in lexical_index.search(user_query, RETRIEVAL_K * 2)]
+    retrieval_stats["hybrid"] += 1
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], RETRIEVAL_K), query_vector
+
+# Product descriptions are condensed once (LLM summary, cached by content) to fit their budget
+description_cache = ResponseCache(
+    max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS,
+    shared_namespace="descriptions"
+)
+_description_jobs = set()  # Cache keys of condensations already running
+_description_jobs_lock = threading.Lock()  # Chat threads and the event loop both claim jobs
+
+# Prompt size accounting: estimated tokens sent and saved versus the untrimmed prompt
+context_stats = Counter()
+
+async def _summarise_description(description: str, cache_key: str) -> str:
+    budget = settings.CHAT_DESCRIPTION_TOKEN_BUDGET
     prompt = f"""
-    Anda adalah seorang analis produk yang ahli. Berdasarkan ulasan berikut, buatlah ringkasan singkat dalam 2-3 poin utama mengenai kelebihan dan 2-3 poin utama mengenai kekurangan produk ini.
-    Gunakan format:
-    **Kelebihan:**
-    - Poin 1
-    - Poin 2
-    
-    **Kekurangan:**
-    - Poin 1
-    - Poin 2
-
-    Ulasan:
+    Ringkas deskripsi produk berikut menjadi paling banyak {budget * 3} karakter. Pertahankan spesifikasi penting
+    (ukuran, bahan, varian, kapasitas, kode model, isi paket, garansi) dan hilangkan kalimat promosi.
+
+    Deskripsi:
     ---
-    {sample_reviews}
+    {description}
     ---
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        condensed = trim_to_tokens(await llm_gateway.generate(prompt), budget)
+        description_cache.put(cache_key, condensed)
+        return condensed
     except Exception as e:
-        return f"Gagal membuat ringkasan: {str(e)}"
+        logger.warning(f"[RAG] Could not condense product description: {str(e)}")
+        return trim_to_tokens(description, budget)
+    finally:
+        with _description_jobs_lock:
+            _description_jobs.discard(cache_key)
+
+def _claim_description_job(cache_key: str) -> bool:
+    """True if the caller should start condensing this description; False if that is already running."""
+    with _description_jobs_lock:
+        if cache_key in _description_jobs:
+            return False
+        _description_jobs.add(cache_key)
+        return True
+
+async def condense_description(description: str) -> str:
+    """Description shortened to CHAT_DESCRIPTION_TOKEN_BUDGET; called after analysis so chat finds it cached."""
+    if not description or estimate_tokens(description) <= settings.CHAT_DESCRIPTION_TOKEN_BUDGET:
+        return description
+    cache_key = prompt_cache_key(LLM_MODEL_NAME, description)
+    cached = description_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    if not _claim_description_job(cache_key):
+        return trim_to_tokens(description, settings.CHAT_DESCRIPTION_TOKEN_BUDGET)
+    return await _summarise_description(description, cache_key)
+
+def _description_for_prompt(description: str) -> str:
+    """Cached condensed description; until it exists, a trimmed one while condensing runs in the background."""
+    if not description or estimate_tokens(description) <= settings.CHAT_DESCRIPTION_TOKEN_BUDGET:
+        return description
+    cache_key = prompt_cache_key(LLM_MODEL_NAME, description)
+    cached = description_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    if _claim_description_job(cache_key):
+        llm_gateway.submit(_summarise_description(description, cache_key))
+    return trim_to_tokens(description, settings.CHAT_DESCRIPTION_TOKEN_BUDGET)
+
+def _prepare_chat(user_query: str, product_id: str, product_metadata=None):
+    """
+    Shared by query_rag and stream_rag. Returns (answer, prompt, query_vector):
+    answer is set when no LLM call is needed (product not indexed, cache hit),
+    otherwise prompt holds the generation prompt.
+    """
+    _sync_index_generation(product_id)
+    product_index = vector_store_registry.get(product_id)
+    if product_index is None:
+        return "Database ulasan untuk produk ini belum dibuat. Lakukan analisis terlebih dahulu.", None, None
+
+    relevant_docs, query_vector = _retrieve(user_query, product_index)
+    if query_vector is not None:
+        cached_answer = chat_answer_cache.get(product_id, query_vector)
+        if cached_answer is not None:
+            retrieval_stats["cached"] += 1
+            return cached_answer, None, query_vector
+
+    return None, _build_chat_prompt(user_query, relevant_docs, product_metadata), query_vector
+
+def _build_chat_prompt(user_query: str, relevant_docs, product_metadata=None) -> str:
+    chunks = [doc.page_content for doc in relevant_docs]
+    context_chunks, context_tokens = assemble_context(chunks, settings.CHAT_CONTEXT_TOKEN_BUDGET)
+    context_text = "\n\n".join(context_chunks)
 
-def query_rag(user_query: str, product_metadata=None) -> str:
-    global vector_store
-    if vector_store is None:
-        return "Database ulasan belum dibuat. Lakukan analisis terlebih dahulu."
+    full_description = (product_metadata.description or "") if product_metadata else ""
+    description = _description_for_prompt(full_description)
 
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-    relevant_docs = retriever.invoke(user_query)  # Updated to use invoke instead of deprecated method
-    context_text = "\n\n".join([doc.page_content for doc in relevant_docs])
+    untrimmed_tokens = sum(estimate_tokens(chunk) for chunk in chunks) + estimate_tokens(full_description)
+    used_tokens = context_tokens + estimate_tokens(description)
+    context_stats["requests"] += 1
+    context_stats["context_tokens"] += used_tokens
+    context_stats["tokens_saved"] += untrimmed_tokens - used_tokens
+    logger.info(f"[RAG] Context: {used_tokens} tokens from {len(context_chunks)}/{len(chunks)} chunks "
+                f"({untrimmed_tokens - used_tokens} tokens saved)")
 
     # Add product metadata to context if available
     product_info = ""
@@ -83,11 +595,11 @@ Informasi Produk:
 - Total Ulasan: {product_metadata.total_reviews or 'Tidak tersedia'}
 - Toko: {product_metadata.shop_name or 'Tidak tersedia'}
 - Kategori: {product_metadata.category or 'Tidak tersedia'}
-- Deskripsi: {product_metadata.description or 'Tidak tersedia'}
+- Deskripsi: {description or 'Tidak tersedia'}
 
 """
 
-    prompt = f"""
+    return f"""
     Anda adalah asisten AI yang menjawab pertanyaan berdasarkan informasi produk dan ulasan pelanggan. Gunakan semua informasi yang tersedia untuk memberikan jawaban yang lengkap dan akurat.
 
     {product_info}
@@ -100,8 +612,55 @@ Informasi Produk:
 
     Jawaban Komprehensif Berdasarkan Informasi Produk dan Ulasan:
     """
+
+async def query_rag(user_query: str, product_id: str, product_metadata=None) -> str:
+    # Retrieval may embed the query or load an index from disk, so it runs in a worker thread
+    answer, prompt, query_vector = await asyncio.to_thread(_prepare_chat, user_query, product_id, product_metadata)
+    if answer is not None:
+        return answer
+
+    try:
+        answer = await llm_gateway.generate(prompt)
+        if query_vector is not None:
+            chat_answer_cache.put(product_id, query_vector, user_query, answer)
+        return answer
+    except Exception as e:
+        return f"Gagal mendapatkan jawaban dari AI: {str(e)}"
+
+async def stream_rag(user_query: str, product_id: str, product_metadata=None) -> AsyncIterator[str]:
+    """
+    Streaming variant of query_rag: yields answer text as the model generates it.
+    Closing the iterator early (e.g. when the client disconnects) cancels the
+    upstream generation, and the partial answer is not cached. Time from the
+    call to the first yielded chunk is recorded as time-to-first-token.
+    """
+    start_time = time.time()
+    first_token_recorded = False
+
+    def _first_token():
+        nonlocal first_token_recorded
+        if not first_token_recorded:
+            first_token_recorded = True
+            system_metrics.record_time_to_first_token(time.time() - start_time)
+
+    answer, prompt, query_vector = await asyncio.to_thread(_prepare_chat, user_query, product_id, product_metadata)
+    if answer is not None:
+        _first_token()
+        yield answer
+        return
+
+    answer_parts = []
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        async for text in llm_gateway.stream(prompt):
+            _first_token()
+            answer_parts.append(text)
+            yield text
+    except (asyncio.CancelledError, GeneratorExit):
+        logger.info(f"[RAG] Chat stream for {product_id} cancelled after {len(answer_parts)} chunks")
+        raise
     except Exception as e:
-        return f"Gagal mendapatkan jawaban dari AI: {str(e)}"
\ No newline at end of file
+        yield f"Gagal mendapatkan jawaban dari AI: {str(e)}"
+        return
+
+    if query_vector is not None:
+        chat_answer_cache.put(product_id, query_vector, user_query, "".join(answer_parts))
@@ -0,0 +1,188 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..core.config import settings
+from ..core.startup import Lazy
+
+logger = logging.getLogger(__name__)
+
+INSERT_BATCH_SIZE = 500  # Reviews per executemany while streaming reviews in
+
+
+def review_source(url: str) -> str:
+    """Marketplace a review came from, e.g. "tokopedia" for www.tokopedia.com."""
+    host = urlparse(url.strip()).netloc.lower().split(":")[0]
+    parts = [part for part in host.split(".") if part not in ("www", "m")]
+    return parts[0] if parts else "unknown"
+
+
+def _analysis_etag(product_id: str, version: str, payload: str) -> str:
+    digest = hashlib.sha256(f"{product_id}\0{version}\0{payload}".encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def encode_cursor(review_id: int) -> str:
+    return base64.urlsafe_b64encode(str(review_id).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Raises ValueError for a cursor this store did not issue."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii"))
+
+
+class ResultsStore:
+    """
+    SQLite store of scraped reviews and the latest analysis per product, so
+    results can be read back without scraping again. Reviews keep their row id
+    across re-analysis (duplicates by text are ignored), which makes the id a
+    stable keyset cursor; (product_id, id), (product_id, rating, id) and
+    (product_id, source, id) indexes keep every page an index range scan
+    regardless of product size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT NOT NULL, text_hash TEXT NOT NULL, "
+            "text TEXT NOT NULL, rating INTEGER, source TEXT NOT NULL, scraped_at REAL NOT NULL, "
+            "UNIQUE (product_id, text_hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS reviews_by_product ON reviews (product_id, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reviews_by_rating ON reviews (product_id, rating, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reviews_by_source ON reviews (product_id, source, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "product_id TEXT PRIMARY KEY, analyzed_at REAL NOT NULL, payload TEXT NOT NULL, etag TEXT)"
+        )
+        if "etag" not in {column[1] for column in self._db.execute("PRAGMA table_info(analyses)")}:
+            self._db.execute("ALTER TABLE analyses ADD COLUMN etag TEXT")  # Stores created before ETags
+        self._db.commit()
+
+    # --- Writes ---
+
+    def save_reviews(self, product_id: str, source: str, reviews: Iterable[dict]):
+        """Store reviews; error placeholders are skipped and already stored texts ignored."""
+        for _ in self.record_reviews(product_id, source, reviews):
+            pass
+
+    def record_reviews(self, product_id: str, source: str, reviews: Iterable[dict]) -> Iterator[dict]:
+        """Pass reviews through unchanged while storing them in batches, for chaining stages."""
+        added = 0
+        batch: List[tuple] = []
+        for review_data in reviews:
+            text = review_data.get("text", "")
+            if text and "ERROR:" not in text:
+                text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+                batch.append((product_id, text_hash, text, review_data.get("rating"), source, time.time()))
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    added += self._insert(batch)
+                    batch = []
+            yield review_data
+        if batch:
+            added += self._insert(batch)
+        logger.info(f"[RESULTS] Stored {added} new reviews for {product_id}")
+
+    def _insert(self, batch: List[tuple]) -> int:
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO reviews (product_id, text_hash, text, rating, source, scraped_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            self._db.commit()
+            return self._db.total_changes - before
+
+    def save_analysis(self, product_id: str, analysis: Dict[str, Any]) -> float:
+        """
+        Replace the product's latest analysis; returns its timestamp. The analysis
+        gets a strong ETag derived from the stored review set (reviews are
+        insert-only, so their count and highest id identify it) and the scrape time.
+        """
+        analyzed_at = time.time()
+        payload = json.dumps(analysis, ensure_ascii=False)
+        with self._lock:
+            review_count, last_review_id = self._db.execute(
+                "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM reviews WHERE product_id = ?", (product_id,)
+            ).fetchone()
+            etag = _analysis_etag(product_id, f"{review_count}:{last_review_id}:{analyzed_at!r}", payload)
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (product_id, analyzed_at, payload, etag) VALUES (?, ?, ?, ?)",
+                (product_id, analyzed_at, payload, etag)
+            )
+            self._db.commit()
+        return analyzed_at
+
+    # --- Reads ---
+
+    def get_reviews(
+        self, product_id: str, limit: int, cursor: Optional[str] = None,
+        rating: Optional[int] = None, source: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[int]]:
+        """
+        One page of reviews in scrape order; returns (reviews, next_cursor, total).
+        The total of matching reviews needs a count over the whole product, so it
+        is only computed for the first page (cursor None).
+        """
+        conditions = ["product_id = ?"]
+        params: List[Any] = [product_id]
+        if rating is not None:
+            conditions.append("rating = ?")
+            params.append(rating)
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        where = " AND ".join(conditions)
+        page_conditions = where + (" AND id > ?" if cursor else "")
+        page_params = params + ([decode_cursor(cursor)] if cursor else [])
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, text, rating, source, scraped_at FROM reviews WHERE {page_conditions} ORDER BY id LIMIT ?",
+                page_params + [limit + 1]
+            ).fetchall()
+            total = None if cursor else self._db.execute(f"SELECT COUNT(*) FROM reviews WHERE {where}", params).fetchone()[0]
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        reviews = [
+            {"id": row[0], "text": row[1], "rating": row[2], "source": row[3], "scraped_at": row[4]}
+            for row in rows
+        ]
+        next_cursor = encode_cursor(rows[-1][0]) if has_more else None
+        return reviews, next_cursor, total
+
+    def get_analysis(self, product_id: str) -> Optional[Tuple[float, Dict[str, Any], str]]:
+        """(analyzed_at, analysis, etag) of the product's latest analysis, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT analyzed_at, payload, etag FROM analyses WHERE product_id = ?", (product_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        analyzed_at, payload, etag = row
+        return analyzed_at, json.loads(payload), etag or _analysis_etag(product_id, repr(analyzed_at), payload)
+
+
+# --- Results store (created on first use) ---
+_results_store = Lazy("results_store", lambda: ResultsStore(settings.RESULTS_DB_PATH))
+
+def get_results_store() -> ResultsStore:
+    return _results_store.get()
@@ -1,16 +1,13 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 import time
 import re
+import math
+import hashlib
 import logging
+from typing import Iterator
 from urllib.parse import urlparse
 from .seller_reputation_service import analyze_seller_reputation
+from .system_metrics_service import STAGE_DRIVER_START, STAGE_PAGE_LOAD, STAGE_PARSE, system_metrics
 
 # Configure logging for scraper
 logging.basicConfig(level=logging.INFO)
@@ -34,6 +31,19 @@ def validate_url(url: str) -> bool:
         logger.error(f"Error parsing URL {url}: {str(e)}")
         return False
 
+def get_product_id(url: str) -> str:
+    """
+    Derive a stable product ID ("shop:product-slug") from a Tokopedia product or review URL.
+    """
+    parsed = urlparse(url.strip())
+    path_parts = [part for part in parsed.path.lower().split('/') if part]
+    if path_parts and path_parts[-1] == 'review':
+        path_parts = path_parts[:-1]
+    if len(path_parts) >= 2:
+        return f"{path_parts[0]}:{path_parts[1]}"
+    # Unusual URL shape - fall back to a hash of the normalised URL
+    return f"url:{hashlib.sha1((parsed.netloc.lower() + parsed.path.lower()).encode('utf-8')).hexdigest()[:16]}"
+
 def scrape_product_metadata(url: str) -> dict:
     """
     Mengambil metadata produk (nama, harga, rating, dll) dari halaman produk Tokopedia.
@@ -52,6 +62,14 @@ def scrape_product_metadata(url: str) -> dict:
             "image_url": ""
         }
 
+    # Selenium and webdriver_manager are imported on first scrape to keep startup fast
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+    from webdriver_manager.chrome import ChromeDriverManager
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--window-size=1920,1080")
@@ -63,7 +81,8 @@ def scrape_product_metadata(url: str) -> dict:
     options.add_experimental_option('useAutomationExtension', False)
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
 
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+    with system_metrics.stage(STAGE_DRIVER_START):
+        driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
     wait = WebDriverWait(driver, 15)  # 15 second timeout for explicit waits
     
     metadata = {
@@ -79,16 +98,18 @@ def scrape_product_metadata(url: str) -> dict:
 
     try:
         logger.info(f"[METADATA] Accessing product page: {url}")
-        driver.get(url)
-        
-        # Wait for main product container to load
-        try:
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'h1[data-testid="lblPDPDetailProductName"], h1')))
-            logger.info("[METADATA] Product page loaded successfully")
-        except TimeoutException:
-            logger.warning("[METADATA] Timeout waiting for product page to load")
+        with system_metrics.stage(STAGE_PAGE_LOAD):
+            driver.get(url)
+            
+            # Wait for main product container to load
+            try:
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'h1[data-testid="lblPDPDetailProductName"], h1')))
+                logger.info("[METADATA] Product page loaded successfully")
+            except TimeoutException:
+                logger.warning("[METADATA] Timeout waiting for product page to load")
         
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        with system_metrics.stage(STAGE_PARSE):
+            soup = BeautifulSoup(driver.page_source, 'html.parser')
         
         # Scrape product title with priority on stable selectors
         title_selectors = [
@@ -300,7 +321,8 @@ def scrape_product_metadata(url: str) -> dict:
             logger.info(f"[METADATA] No 'See More' button found or couldn't click: {str(e)}")
         
         # Re-get the page source after potential expansion
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        with system_metrics.stage(STAGE_PARSE):
+            soup = BeautifulSoup(driver.page_source, 'html.parser')
         
         for i, selector in enumerate(desc_selectors):
             desc_element = soup.select_one(selector)
@@ -366,14 +388,20 @@ def construct_review_url(product_url: str) -> str:
     return f"{cleaned_url}/review"
 
 
-def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
+def _error_review(message: str) -> dict:
+    return {"text": message, "rating": None, "has_rating": False}
+
+def iter_product_reviews(url: str, max_reviews: int = 50) -> Iterator[dict]:
     """
-    Mengambil ulasan produk dengan pagination, explicit waits, dan bounded retry logic.
-    Returns list of review data with ratings and text for real sentiment analysis.
+    Mengambil ulasan produk sebagai generator, halaman demi halaman.
+    Reviews are yielded as soon as each page is parsed, so callers can process
+    very large review sets without holding them all in memory. Failures are
+    yielded as a review whose text starts with "ERROR:".
     """
     # Validate domain first
     if not validate_url(url):
-        return ["ERROR: URL tidak valid atau domain tidak didukung. Hanya URL Tokopedia yang diperbolehkan."]
+        yield _error_review("ERROR: URL tidak valid atau domain tidak didukung. Hanya URL Tokopedia yang diperbolehkan.")
+        return
     
     # Stable selectors with data-testid priority - enhanced to extract ratings
     REVIEW_CONTAINER_SELECTOR = "section#review-feed article"  # This worked in old version
@@ -385,6 +413,14 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
     ]
     PAGINATION_BUTTON_SELECTOR = "button[data-unf='pagination-item']"  # This worked in old version
 
+    # Selenium and webdriver_manager are imported on first scrape to keep startup fast
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+    from webdriver_manager.chrome import ChromeDriverManager
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--window-size=1920,1080")
@@ -396,14 +432,18 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
     options.add_experimental_option('useAutomationExtension', False)
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
 
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+    with system_metrics.stage(STAGE_DRIVER_START):
+        driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
     wait = WebDriverWait(driver, 15)  # 15 second timeout
 
-    reviews = []
+    review_count = 0
+    seen_hashes = set()  # 8-byte digests, much smaller than keeping review texts around
     try:
         review_page_url = construct_review_url(url)
         logger.info(f"[REVIEWS] Starting review scraping for: {review_page_url}")
         
+        # One page_load sample per review page: from navigation until its content is scrolled in
+        load_started = time.perf_counter()
         driver.get(review_page_url)
         
         # Wait for initial review container to load
@@ -412,15 +452,17 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
             logger.info("[REVIEWS] Review page loaded successfully")
         except TimeoutException:
             logger.warning("[REVIEWS] Timeout waiting for review container")
-            return ["ERROR: Halaman ulasan tidak dapat dimuat dalam waktu yang ditentukan."]
+            yield _error_review("ERROR: Halaman ulasan tidak dapat dimuat dalam waktu yang ditentukan.")
+            return
 
         page_number = 1
-        max_pages = 8  # Bounded pagination to prevent infinite loops
+        # Bounded pagination to prevent infinite loops (Tokopedia shows ~10 reviews per page)
+        max_pages = max(8, math.ceil(max_reviews / 10) + 2)
         consecutive_empty_pages = 0  # Track empty pages for early termination
         max_consecutive_empty = 2   # Stop after 2 consecutive empty pages
         
-        while len(reviews) < max_reviews and page_number <= max_pages and consecutive_empty_pages < max_consecutive_empty:
-            logger.info(f"[REVIEWS] Processing page {page_number}/{max_pages} (target: {max_reviews} reviews, current: {len(reviews)})")
+        while review_count < max_reviews and page_number <= max_pages and consecutive_empty_pages < max_consecutive_empty:
+            logger.info(f"[REVIEWS] Processing page {page_number}/{max_pages} (target: {max_reviews} reviews, current: {review_count})")
             
             # Wait for review content to stabilize on current page
             try:
@@ -433,16 +475,21 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
             # Scroll to ensure all reviews are loaded on current page
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
             time.sleep(1)
+            system_metrics.record_stage(STAGE_PAGE_LOAD, time.perf_counter() - load_started)
             
             # Parse current page content
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            review_elements = soup.select(REVIEW_CONTAINER_SELECTOR)
+            with system_metrics.stage(STAGE_PARSE):
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                review_elements = soup.select(REVIEW_CONTAINER_SELECTOR)
             
             logger.info(f"[REVIEWS] Page {page_number}: Found {len(review_elements)} review elements")
             
             # Extract reviews from current page with ratings
-            page_reviews = []
+            reviews_found_this_page = 0
             for element in review_elements:
+                if review_count >= max_reviews:
+                    break
+
                 # Extract review text
                 text_element = element.select_one(REVIEW_TEXT_SELECTOR)
                 review_text = ""
@@ -505,12 +552,14 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
                 }
                 
                 # Check for duplicates based on text
-                if not any(existing["text"] == review_text for existing in reviews):
-                    page_reviews.append(review_data)
-                    reviews.append(review_data)
+                text_hash = hashlib.blake2b(review_text.encode("utf-8"), digest_size=8).digest()
+                if text_hash not in seen_hashes:
+                    seen_hashes.add(text_hash)
+                    reviews_found_this_page += 1
+                    review_count += 1
+                    yield review_data
             
-            reviews_found_this_page = len(page_reviews)
-            logger.info(f"[REVIEWS] Page {page_number}: Extracted {reviews_found_this_page} new unique reviews (total: {len(reviews)})")
+            logger.info(f"[REVIEWS] Page {page_number}: Extracted {reviews_found_this_page} new unique reviews (total: {review_count})")
             
             # Track consecutive empty pages
             if reviews_found_this_page == 0:
@@ -520,11 +569,12 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
                 consecutive_empty_pages = 0  # Reset counter
             
             # Check if we have enough reviews
-            if len(reviews) >= max_reviews:
-                logger.info(f"[REVIEWS] Target reached: {len(reviews)}/{max_reviews} reviews collected")
+            if review_count >= max_reviews:
+                logger.info(f"[REVIEWS] Target reached: {review_count}/{max_reviews} reviews collected")
                 break
             
             # Try to navigate to next page with retry logic
+            load_started = time.perf_counter()
             next_page_found = False
             for attempt in range(2):  # Bounded retry for pagination
                 try:
@@ -587,36 +637,31 @@ def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
         
         # Final summary
         total_pages_processed = page_number
-        logger.info(f"[REVIEWS] Scraping completed: {len(reviews)} reviews from {total_pages_processed} pages")
-        
-        # Remove any duplicate reviews that might have slipped through
-        unique_reviews = []
-        seen_texts = set()
-        for review in reviews:
-            if review["text"] not in seen_texts:
-                unique_reviews.append(review)
-                seen_texts.add(review["text"])
+        logger.info(f"[REVIEWS] Scraping completed: {review_count} reviews from {total_pages_processed} pages")
         
-        if len(unique_reviews) != len(reviews):
-            logger.info(f"[REVIEWS] Deduplication: {len(reviews)} -> {len(unique_reviews)} unique reviews")
-        
-        # Count how many reviews have ratings
-        reviews_with_ratings = sum(1 for r in unique_reviews if r["has_rating"])
-        logger.info(f"[REVIEWS] Ratings found: {reviews_with_ratings}/{len(unique_reviews)} reviews have star ratings")
-        
-        if not unique_reviews:
-            return [{"text": "ERROR: Tidak ada ulasan yang berhasil diekstrak dari semua halaman yang diakses.", "rating": None, "has_rating": False}]
+        if review_count == 0:
+            yield _error_review("ERROR: Tidak ada ulasan yang berhasil diekstrak dari semua halaman yang diakses.")
 
     except Exception as e:
         logger.error(f"[REVIEWS] Fatal error during scraping: {type(e).__name__}: {str(e)}")
-        return [{"text": f"ERROR: Terjadi kesalahan fatal saat scraping - {type(e).__name__}: {str(e)}", "rating": None, "has_rating": False}]
+        yield _error_review(f"ERROR: Terjadi kesalahan fatal saat scraping - {type(e).__name__}: {str(e)}")
     finally:
         driver.quit()
-    
-    # Limit to max_reviews if we got more than needed
-    if len(unique_reviews) > max_reviews:
-        unique_reviews = unique_reviews[:max_reviews]
-        logger.info(f"[REVIEWS] Limiting results to {max_reviews} reviews as requested")
+
+def scrape_product_reviews(url: str, max_reviews: int = 50) -> list[dict]:
+    """
+    Mengambil ulasan produk dengan pagination, explicit waits, dan bounded retry logic.
+    Returns list of review data with ratings and text for real sentiment analysis.
+    """
+    unique_reviews = []
+    for review in iter_product_reviews(url, max_reviews):
+        if review["text"].startswith("ERROR:"):
+            return [review]
+        unique_reviews.append(review)
+
+    # Count how many reviews have ratings
+    reviews_with_ratings = sum(1 for r in unique_reviews if r["has_rating"])
+    logger.info(f"[REVIEWS] Ratings found: {reviews_with_ratings}/{len(unique_reviews)} reviews have star ratings")
 
     logger.info(f"[REVIEWS] Final result: Returning {len(unique_reviews)} reviews")
     return unique_reviews
@@ -1,23 +1,20 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 import time
 import re
 import logging
 from urllib.parse import urljoin, urlparse
 from typing import Dict, Optional, Any
+from .llm_cache import ResponseCache
+from .system_metrics_service import STAGE_DRIVER_START, STAGE_PAGE_LOAD, STAGE_PARSE, system_metrics
 
 # Configure logging for seller reputation
 logger = logging.getLogger(__name__)
 
 class SellerReputationAnalyzer:
     def __init__(self):
-        self.cache = {}  # Simple in-memory cache for demo
         self.cache_ttl = 24 * 60 * 60  # 24 hours in seconds
+        # Per shop, shared by all workers so a shop is scraped once per day
+        self.cache = ResponseCache(max_entries=1000, ttl_seconds=self.cache_ttl, shared_namespace="seller_reputation")
         
     def get_seller_reputation(self, product_url: str) -> Dict[str, Any]:
         """
@@ -26,13 +23,19 @@ class SellerReputationAnalyzer:
         try:
             # Check cache first
             cache_key = self._get_shop_cache_key(product_url)
-            if cache_key in self.cache:
-                cached_data, timestamp = self.cache[cache_key]
-                if time.time() - timestamp < self.cache_ttl:
-                    logger.info(f"[SELLER] Using cached reputation data for {cache_key}")
-                    return cached_data
+            cached_data = self.cache.get(cache_key) if cache_key else None
+            if cached_data is not None:
+                logger.info(f"[SELLER] Using cached reputation data for {cache_key}")
+                return cached_data
             
             # Setup Chrome driver
+            # Selenium and webdriver_manager are imported on first scrape to keep startup fast
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service as ChromeService
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
+            from webdriver_manager.chrome import ChromeDriverManager
             options = webdriver.ChromeOptions()
             options.add_argument("--headless")
             options.add_argument("--window-size=1920,1080")
@@ -44,7 +47,8 @@ class SellerReputationAnalyzer:
             options.add_experimental_option('useAutomationExtension', False)
             options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
             
-            driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
+            with system_metrics.stage(STAGE_DRIVER_START):
+                driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=options)
             wait = WebDriverWait(driver, 15)
             
             try:
@@ -56,6 +60,7 @@ class SellerReputationAnalyzer:
                     logger.error(f"[SELLER] Invalid URL format: {product_url}")
                     raise ValueError("Invalid URL format")
                 
+                load_started = time.perf_counter()
                 driver.get(product_url)
                 
                 # Wait for page to load and check if we got the actual page
@@ -81,6 +86,7 @@ class SellerReputationAnalyzer:
                 
                 # Additional wait for dynamic content
                 time.sleep(5)  # Allow more time for dynamic content to load
+                system_metrics.record_stage(STAGE_PAGE_LOAD, time.perf_counter() - load_started)
                 
                 # Check page source for Tokopedia content
                 page_source = driver.page_source
@@ -89,20 +95,23 @@ class SellerReputationAnalyzer:
                     logger.info(f"[SELLER] Current URL: {driver.current_url}")
                     logger.info(f"[SELLER] Page title: {driver.title}")
                 
-                soup = BeautifulSoup(page_source, 'html.parser')
-                reputation_data = self._extract_pdp_seller_info(soup)
+                with system_metrics.stage(STAGE_PARSE):
+                    soup = BeautifulSoup(page_source, 'html.parser')
+                    reputation_data = self._extract_pdp_seller_info(soup)
                 
                 # Step 2: Try to get shop page URL and extract additional metrics
                 shop_url = self._find_shop_url(soup, product_url)
                 if shop_url:
                     try:
                         logger.info(f"[SELLER] Navigating to shop page: {shop_url}")
-                        driver.get(shop_url)
-                        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                        time.sleep(3)
+                        with system_metrics.stage(STAGE_PAGE_LOAD):
+                            driver.get(shop_url)
+                            wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+                            time.sleep(3)
                         
-                        shop_soup = BeautifulSoup(driver.page_source, 'html.parser')
-                        shop_metrics = self._extract_shop_metrics(shop_soup)
+                        with system_metrics.stage(STAGE_PARSE):
+                            shop_soup = BeautifulSoup(driver.page_source, 'html.parser')
+                            shop_metrics = self._extract_shop_metrics(shop_soup)
                         reputation_data.update(shop_metrics)
                         
                     except Exception as e:
@@ -114,7 +123,7 @@ class SellerReputationAnalyzer:
                 
                 # Cache the result
                 if cache_key:
-                    self.cache[cache_key] = (reputation_data, time.time())
+                    self.cache.put(cache_key, reputation_data)
                 
                 logger.info(f"[SELLER] Seller analysis complete. Score: {reputation_data.get('reliability_score', 'N/A')}")
                 return reputation_data
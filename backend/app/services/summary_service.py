@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .analysis_service import resolve_rating
+
+logger = logging.getLogger(__name__)
+
+# Rating buckets the reviews are grouped by before summarising
+RATING_BUCKETS = [
+    ("positif", "ulasan positif (bintang 4-5)", (4, 5)),
+    ("netral", "ulasan netral (bintang 3)", (3,)),
+    ("negatif", "ulasan negatif (bintang 1-2)", (1, 2)),
+]
+
+FINAL_FORMAT = """Gunakan format:
+    **Kelebihan:**
+    - Poin 1
+    - Poin 2
+
+    **Kekurangan:**
+    - Poin 1
+    - Poin 2"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+def _pack(items: list, cost: Callable[[Any], int], budget: int, max_items: Optional[int] = None,
+          min_items: int = 1) -> List[list]:
+    """
+    Greedy packing of items, in order, into batches of at most `budget` cost and
+    `max_items` items. A batch only closes on the budget once it holds min_items,
+    so an oversized item still shares a batch when min_items > 1.
+    """
+    batches, current, current_cost = [], [], 0
+    for item in items:
+        item_cost = cost(item)
+        full = max_items is not None and len(current) >= max_items
+        over_budget = len(current) >= min_items and current_cost + item_cost > budget
+        if current and (full or over_budget):
+            batches.append(current)
+            current, current_cost = [], 0
+        current.append(item)
+        current_cost += item_cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_summary_groups(reviews_data: List[dict], group_token_budget: int, review_max_chars: int,
+                         max_groups: Optional[int] = None) -> List[Dict]:
+    """
+    Split reviews into rating-bucket groups of at most group_token_budget
+    tokens, one map prompt each. Up to max_groups groups no review is left out;
+    beyond that each bucket keeps its share of the groups and is filled with an
+    evenly spaced sample of its reviews, so the number of LLM calls stops
+    growing with the number of reviews.
+    """
+    buckets = {name: [] for name, _, _ in RATING_BUCKETS}
+    for review in reviews_data:
+        text = review.get("text", "").strip()
+        if not text:
+            continue
+        rating, _ = resolve_rating(review)
+        for name, _, ratings in RATING_BUCKETS:
+            if rating in ratings:
+                buckets[name].append(text[:review_max_chars])
+                break
+
+    packed = {name: _pack(texts, estimate_tokens, group_token_budget) for name, texts in buckets.items()}
+    total_groups = sum(len(batches) for batches in packed.values())
+    groups = []
+    for name, label, _ in RATING_BUCKETS:
+        texts, batches = buckets[name], packed[name]
+        if max_groups is not None and total_groups > max_groups and batches:
+            quota = max(1, len(batches) * max_groups // total_groups)
+            if len(batches) > quota:
+                keep = len(texts) * quota // len(batches)
+                sample = [texts[i * len(texts) // keep] for i in range(keep)]
+                batches = _pack(sample, estimate_tokens, group_token_budget)[:quota]
+        groups.extend(
+            {"bucket": name, "label": label, "reviews": reviews, "bucket_size": len(texts)}
+            for reviews in batches
+        )
+    return groups
+
+
+def _single_prompt(reviews: List[str]) -> str:
+    sample_reviews = " ".join(reviews)
+    return f"""
+    Anda adalah seorang analis produk yang ahli. Berdasarkan ulasan berikut, buatlah ringkasan singkat dalam 2-3 poin utama mengenai kelebihan dan 2-3 poin utama mengenai kekurangan produk ini.
+    {FINAL_FORMAT}
+
+    Ulasan:
+    ---
+    {sample_reviews}
+    ---
+    """
+
+
+def _map_prompt(group: Dict) -> str:
+    reviews = "\n".join(f"- {text}" for text in group["reviews"])
+    return f"""
+    Anda adalah seorang analis produk. Berikut {len(group['reviews'])} {group['label']} dari total {group['bucket_size']} ulasan kelompok ini.
+    Catat hal-hal yang dipuji dan dikeluhkan pembeli dalam poin-poin singkat, dan sebutkan seberapa sering tiap hal muncul (sering/kadang/jarang).
+
+    Ulasan:
+    ---
+    {reviews}
+    ---
+    """
+
+
+def _combine_prompt(partials: List[Dict]) -> str:
+    sections = "\n\n".join(
+        f"Ringkasan dari {partial['review_count']} ulasan:\n{partial['summary']}" for partial in partials
+    )
+    review_count = sum(partial["review_count"] for partial in partials)
+    return f"""
+    Anda adalah seorang analis produk. Berikut beberapa ringkasan parsial yang bersama-sama mencakup {review_count} {partials[0]['label']}.
+    Gabungkan menjadi satu daftar poin singkat tentang hal-hal yang dipuji dan dikeluhkan pembeli, dan sebutkan seberapa sering tiap hal muncul (sering/kadang/jarang) dengan memperhitungkan jumlah ulasan tiap ringkasan.
+
+    Ringkasan parsial:
+    ---
+    {sections}
+    ---
+    """
+
+
+def _reduce_prompt(partials: List[Dict], total_reviews: int) -> str:
+    sections = "\n\n".join(
+        f"Ringkasan {partial['label']} ({partial['bucket_size']} ulasan):\n{partial['summary']}"
+        for partial in partials
+    )
+    return f"""
+    Anda adalah seorang analis produk yang ahli. Berikut ringkasan parsial dari {total_reviews} ulasan produk, dikelompokkan menurut rating.
+    Gabungkan menjadi ringkasan akhir dalam 2-3 poin utama mengenai kelebihan dan 2-3 poin utama mengenai kekurangan produk ini. Utamakan hal yang paling sering disebut, dengan memperhitungkan jumlah ulasan tiap kelompok.
+    {FINAL_FORMAT}
+
+    Ringkasan parsial:
+    ---
+    {sections}
+    ---
+    """
+
+
+class MapReduceSummarizer:
+    """
+    Summarises the full review set: every review is put in a rating-bucket
+    group and each group is summarised (map). While a bucket's partial summaries
+    are too long for one prompt, they are merged reduce_fan_in at a time within
+    the bucket (recursive reduce), then one final call turns them into the
+    Kelebihan/Kekurangan text. Each map wave and reduce level runs up to
+    max_concurrency LLM calls at once; the LLM gateway applies the global cap
+    on top.
+
+    Latency trade-off: covering every review costs one map call per group, so
+    latency grows with the review count (ceil(groups / max_concurrency) map
+    waves plus about log_fan_in(groups) reduce levels) instead of reviews being
+    dropped. max_map_groups caps that: past it the groups hold a sample of the
+    reviews, and since every reduce call merges at least two partials, one
+    summary never takes more than 2 * max_map_groups LLM calls. Review sets
+    that fit into one group take a single LLM call.
+    """
+
+    def __init__(self, generate: Callable[[str], Awaitable[str]], group_token_budget: int = 3000,
+                 reduce_fan_in: int = 8, max_concurrency: int = 8, review_max_chars: int = 600,
+                 max_map_groups: int = 64):
+        self.generate = generate
+        self.group_token_budget = group_token_budget
+        self.reduce_fan_in = max(2, reduce_fan_in)
+        self.max_concurrency = max_concurrency
+        self.review_max_chars = review_max_chars
+        self.max_map_groups = max(len(RATING_BUCKETS), max_map_groups)
+
+    async def summarize(self, reviews_data: List[dict]) -> str:
+        start_time = time.time()
+        groups = build_summary_groups(reviews_data, self.group_token_budget, self.review_max_chars,
+                                      max_groups=self.max_map_groups)
+        if not groups:
+            return await self.generate(_single_prompt([]))
+        all_reviews = [text for group in groups for text in group["reviews"]]
+        if sum(estimate_tokens(text) for text in all_reviews) <= self.group_token_budget:
+            return await self.generate(_single_prompt(all_reviews))
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def _call(prompt: str) -> str:
+            async with slots:
+                return await self.generate(prompt)
+
+        results = await asyncio.gather(*[_call(_map_prompt(group)) for group in groups], return_exceptions=True)
+        partials = []
+        for group, result in zip(groups, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[SUMMARY] Map step for {len(group['reviews'])} {group['bucket']} reviews failed: "
+                               f"{str(result)}")
+            else:
+                partials.append({
+                    "bucket": group["bucket"], "label": group["label"], "bucket_size": group["bucket_size"],
+                    "review_count": len(group["reviews"]), "summary": result
+                })
+        if not partials:
+            raise RuntimeError("semua ringkasan parsial gagal dibuat")
+
+        reduce_levels = 0
+        while sum(estimate_tokens(partial["summary"]) for partial in partials) > self.group_token_budget:
+            batches = [
+                batch
+                for name, _, _ in RATING_BUCKETS
+                for batch in _pack(
+                    [partial for partial in partials if partial["bucket"] == name],
+                    lambda partial: estimate_tokens(partial["summary"]),
+                    self.group_token_budget, max_items=self.reduce_fan_in, min_items=2
+                )
+            ]
+            if len(batches) == len(partials):
+                break  # One partial per bucket left; the final reduce takes them as they are
+            partials = await asyncio.gather(*[self._combine(batch, _call) for batch in batches])
+            reduce_levels += 1
+
+        # One partial per bucket (partials of the same bucket are merged in order)
+        merged: Dict[str, Dict] = {}
+        for partial in partials:
+            if partial["bucket"] in merged:
+                merged[partial["bucket"]]["summary"] += "\n" + partial["summary"]
+                merged[partial["bucket"]]["review_count"] += partial["review_count"]
+            else:
+                merged[partial["bucket"]] = dict(partial)
+        total_reviews = sum(partial["bucket_size"] for partial in merged.values())
+
+        summary = await self.generate(_reduce_prompt(list(merged.values()), total_reviews))
+        summarised = sum(partial["review_count"] for partial in merged.values())
+        logger.info(f"[SUMMARY] {summarised}/{len(reviews_data)} reviews summarised via {len(groups)} groups "
+                    f"and {reduce_levels} intermediate reduce levels in {time.time() - start_time:.2f}s")
+        return summary
+
+    @staticmethod
+    async def _combine(batch: List[Dict], call: Callable[[str], Awaitable[str]]) -> Dict:
+        """Merge partial summaries of one bucket into one; if the LLM call fails, they are concatenated instead."""
+        if len(batch) == 1:
+            return batch[0]
+        try:
+            summary = await call(_combine_prompt(batch))
+        except Exception as e:
+            logger.warning(f"[SUMMARY] Reduce step for {len(batch)} {batch[0]['bucket']} partials failed: {str(e)}")
+            summary = "\n".join(partial["summary"] for partial in batch)
+        return {**batch[0], "review_count": sum(partial["review_count"] for partial in batch), "summary": summary}
@@ -1,99 +1,363 @@
+import os
+import math
 import time
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from collections import deque
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Log-bucketed latency histograms: bucket i counts values up to
+# HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** i (0.1 ms .. ~55 min), plus one
+# overflow bucket. Percentiles are reported as the bucket's geometric midpoint,
+# within ~9% of the true value, with fixed memory per series.
+HISTOGRAM_MIN_SECONDS = 0.0001
+HISTOGRAM_GROWTH = 2 ** 0.25
+HISTOGRAM_BUCKETS = 100
+BUCKET_BOUNDS = [HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** i for i in range(HISTOGRAM_BUCKETS)]
+
+# Pipeline stages timed through SystemMetricsTracker.stage()
+STAGE_DRIVER_START = "driver_start"
+STAGE_PAGE_LOAD = "page_load"
+STAGE_PARSE = "parse"
+STAGE_EMBED = "embed"
+STAGE_LLM = "llm"
+STAGE_CHAT_FIRST_TOKEN = "chat_first_token"
+
+
+def bucket_index(seconds: float) -> int:
+    if seconds <= HISTOGRAM_MIN_SECONDS:
+        return 0
+    return min(HISTOGRAM_BUCKETS, math.ceil(math.log(seconds / HISTOGRAM_MIN_SECONDS, HISTOGRAM_GROWTH) - 1e-9))
+
+
+def summarise_latency(counts: List[int], total_seconds: float, max_seconds: float) -> Dict[str, Any]:
+    """Count, mean, p50/p95/p99 and max (milliseconds) of a bucket-count array."""
+    count = sum(counts)
+    if count == 0:
+        return {"count": 0, "avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+    def percentile(fraction: float) -> float:
+        rank = max(1, math.ceil(fraction * count))
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                if index == HISTOGRAM_BUCKETS:
+                    return max_seconds
+                return min(BUCKET_BOUNDS[index] / HISTOGRAM_GROWTH ** 0.5, max_seconds)
+        return max_seconds
+
+    return {
+        "count": count,
+        "avg_ms": round(total_seconds / count * 1000, 1),
+        "p50_ms": round(percentile(0.50) * 1000, 1),
+        "p95_ms": round(percentile(0.95) * 1000, 1),
+        "p99_ms": round(percentile(0.99) * 1000, 1),
+        "max_ms": round(max_seconds * 1000, 1)
+    }
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram for one route or stage. Lifetime bucket
+    counts, sum and count are kept for exporters; percentiles come from a
+    sliding window stored as a ring of time slices, each with its own buckets,
+    so old samples age out without keeping individual values.
+    """
+
+    def __init__(self, window_seconds: float, slices: int = 10):
+        self.window_seconds = window_seconds
+        self.slice_seconds = window_seconds / slices
+        self._slice_ids = [-1] * slices
+        self._slice_counts = [[0] * (HISTOGRAM_BUCKETS + 1) for _ in range(slices)]
+        self._slice_sums = [0.0] * slices
+        self._slice_maxes = [0.0] * slices
+        self.counts = [0] * (HISTOGRAM_BUCKETS + 1)
+        self.total_count = 0
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        index = bucket_index(seconds)
+        slice_id = int(time.time() // self.slice_seconds)
+        position = slice_id % len(self._slice_ids)
+        with self._lock:
+            if self._slice_ids[position] != slice_id:
+                self._slice_ids[position] = slice_id
+                self._slice_counts[position] = [0] * (HISTOGRAM_BUCKETS + 1)
+                self._slice_sums[position] = 0.0
+                self._slice_maxes[position] = 0.0
+            self._slice_counts[position][index] += 1
+            self._slice_sums[position] += seconds
+            self._slice_maxes[position] = max(self._slice_maxes[position], seconds)
+            self.counts[index] += 1
+            self.total_count += 1
+            self.total_seconds += seconds
+
+    def window(self) -> Tuple[List[int], float, float]:
+        """(bucket counts, sum, max) of the samples inside the sliding window."""
+        oldest_slice = int(time.time() // self.slice_seconds) - len(self._slice_ids) + 1
+        counts = [0] * (HISTOGRAM_BUCKETS + 1)
+        total_seconds = 0.0
+        max_seconds = 0.0
+        with self._lock:
+            for position, slice_id in enumerate(self._slice_ids):
+                if slice_id < oldest_slice:
+                    continue
+                for index, bucket_count in enumerate(self._slice_counts[position]):
+                    counts[index] += bucket_count
+                total_seconds += self._slice_sums[position]
+                max_seconds = max(max_seconds, self._slice_maxes[position])
+        return counts, total_seconds, max_seconds
+
+    def lifetime(self) -> Tuple[List[int], int, float]:
+        """(bucket counts, count, sum) since start, e.g. for cumulative exporters."""
+        with self._lock:
+            return list(self.counts), self.total_count, self.total_seconds
+
+    def summary(self) -> Dict[str, Any]:
+        return summarise_latency(*self.window())
+
+
 class SystemMetricsTracker:
-    """Tracks system health metrics in memory."""
-    
-    def __init__(self):
+    """
+    Tracks system health metrics in memory: thread-safe counters plus latency
+    histograms per route (recorded by the metrics middleware) and per pipeline
+    stage (driver start, page load, parse, embed, LLM).
+    """
+
+    def __init__(self, window_seconds: float = 300):
         self.start_time = time.time()
-        self.response_times = deque(maxlen=100)  # Keep last 100 requests
+        self.window_seconds = window_seconds
         self.api_call_count = 0
         self.cache_hits = 0
         self.cache_misses = 0
+        self.caches: Dict[str, List[int]] = {}  # cache name -> [hits, misses]
         self.downtime_seconds = 0  # Track any known downtime
-        
+        self.routes: Dict[str, LatencyHistogram] = {}  # Time to last byte
+        self.route_headers: Dict[str, LatencyHistogram] = {}  # Time to response headers
+        self.route_bytes: Dict[str, int] = {}  # Response body bytes sent
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.worker_id = str(os.getpid())
+        self._shared_state = None  # Set by start_publishing when metrics are aggregated across workers
+        self._publish_interval = 0.0
+        self._publish_stop: Optional[threading.Event] = None
+
         logger.info("[METRICS] System metrics tracker initialized")
-    
+
+    def _histogram(self, family: Dict[str, LatencyHistogram], name: str) -> LatencyHistogram:
+        histogram = family.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = family.setdefault(name, LatencyHistogram(self.window_seconds))
+        return histogram
+
     def record_api_call(self):
         """Record an API call."""
-        self.api_call_count += 1
-    
-    def record_response_time(self, response_time: float):
-        """Record a response time in seconds."""
-        self.response_times.append(response_time)
-    
-    def record_cache_hit(self):
-        """Record a cache hit."""
-        self.cache_hits += 1
-    
-    def record_cache_miss(self):
-        """Record a cache miss."""
-        self.cache_misses += 1
-    
+        with self._lock:
+            self.api_call_count += 1
+
+    def _families(self) -> Tuple[Tuple[str, Dict[str, LatencyHistogram]], ...]:
+        return (("routes", self.routes), ("route_headers", self.route_headers), ("stages", self.stages))
+
+    def record_request(self, route: str, seconds: float, time_to_headers: Optional[float] = None, bytes_sent: int = 0):
+        """
+        Record a request under its route template (e.g. "POST /api/v1/analyze"):
+        seconds until the last body byte was sent, seconds until the headers
+        were sent (they differ for streamed responses) and body bytes sent.
+        """
+        self._histogram(self.routes, route).record(seconds)
+        if time_to_headers is not None:
+            self._histogram(self.route_headers, route).record(time_to_headers)
+        if bytes_sent:
+            with self._lock:
+                self.route_bytes[route] = self.route_bytes.get(route, 0) + bytes_sent
+
+    def record_stage(self, stage: str, seconds: float):
+        """Record how long one run of a pipeline stage took."""
+        self._histogram(self.stages, stage).record(seconds)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """Time the enclosed block as one run of a pipeline stage."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start_time)
+
+    def record_time_to_first_token(self, seconds: float):
+        """Record how long a streaming answer took to produce its first token."""
+        self.record_stage(STAGE_CHAT_FIRST_TOKEN, seconds)
+
+    def record_cache_hit(self, cache: str = "other", count: int = 1):
+        """Record cache hits, per named cache (e.g. "summaries", "embeddings")."""
+        with self._lock:
+            self.cache_hits += count
+            self.caches.setdefault(cache, [0, 0])[0] += count
+
+    def record_cache_miss(self, cache: str = "other", count: int = 1):
+        """Record cache misses, per named cache."""
+        with self._lock:
+            self.cache_misses += count
+            self.caches.setdefault(cache, [0, 0])[1] += count
+
     def get_uptime_percentage(self) -> float:
         """Calculate uptime percentage."""
         current_time = time.time()
         total_uptime = current_time - self.start_time
         expected_uptime = total_uptime + self.downtime_seconds
-        
+
         if expected_uptime == 0:
             return 100.0
-        
+
         uptime_percentage = (total_uptime / expected_uptime) * 100
         return min(100.0, uptime_percentage)
-    
-    def get_avg_response_time(self) -> float:
-        """Get average response time in seconds."""
-        if not self.response_times:
-            return 0.0
-        return sum(self.response_times) / len(self.response_times)
-    
+
     def get_cache_hit_rate(self) -> float:
         """Get cache hit rate percentage."""
         total_cache_operations = self.cache_hits + self.cache_misses
         if total_cache_operations == 0:
             return 0.0
         return (self.cache_hits / total_cache_operations) * 100
-    
+
     def get_api_call_count(self) -> int:
         """Get total API calls count."""
         return self.api_call_count
-    
+
+    def lifetime(self) -> Dict[str, Any]:
+        """This worker's cumulative counters and (bucket counts, count, sum) per series since start."""
+        histograms = {
+            family_name: {name: histogram.lifetime() for name, histogram in list(family.items())}
+            for family_name, family in self._families()
+        }
+        with self._lock:
+            return {
+                "start_time": self.start_time,
+                "api_calls": self.api_call_count,
+                "caches": {name: list(counts) for name, counts in self.caches.items()},
+                "route_bytes": dict(self.route_bytes),
+                "histograms": histograms
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This worker's counters and windowed histograms in a form that can be summed across workers."""
+        lifetime = self.lifetime()
+        latency = {}
+        for family_name, family in self._families():
+            latency[family_name] = {}
+            for name, histogram in list(family.items()):
+                counts, total_seconds, max_seconds = histogram.window()
+                latency[family_name][name] = {
+                    # Sparse and string-keyed, so the snapshot stays small and JSON-serialisable
+                    "buckets": {str(index): bucket_count for index, bucket_count in enumerate(counts) if bucket_count},
+                    "sum": total_seconds,
+                    "max": max_seconds
+                }
+        with self._lock:
+            return {
+                "start_time": self.start_time,
+                "api_calls": self.api_call_count,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "total_requests": sum(histogram.total_count for histogram in list(self.routes.values())),
+                "latency": latency,
+                "caches": lifetime["caches"],
+                "route_bytes": lifetime["route_bytes"],
+                # Cumulative series for exporters that scrape one worker but report all of them
+                "lifetime": {
+                    family_name: {
+                        name: {
+                            "buckets": {str(index): bucket_count for index, bucket_count in enumerate(counts) if bucket_count},
+                            "count": total_count,
+                            "sum": total_seconds
+                        }
+                        for name, (counts, total_count, total_seconds) in series.items()
+                    }
+                    for family_name, series in lifetime["histograms"].items()
+                }
+            }
+
+    def start_publishing(self, shared_state, interval_seconds: float):
+        """Publish this worker's snapshot to the shared state periodically, so any worker can report for all."""
+        self._shared_state = shared_state
+        self._publish_interval = interval_seconds
+        stop = self._publish_stop = threading.Event()
+
+        def _publish_loop():
+            while not stop.is_set():
+                try:
+                    shared_state.publish_metrics(self.worker_id, self.snapshot())
+                except Exception as e:
+                    logger.warning(f"[METRICS] Could not publish worker metrics: {str(e)}")
+                stop.wait(interval_seconds)
+
+        threading.Thread(target=_publish_loop, name="metrics-publisher", daemon=True).start()
+        logger.info(f"[METRICS] Publishing worker {self.worker_id} metrics every {interval_seconds:g}s")
+
+    def stop_publishing(self):
+        """Stop the publisher thread; other workers drop this one once its last snapshot goes stale."""
+        if self._publish_stop is not None:
+            self._publish_stop.set()
+
+    def other_worker_snapshots(self) -> Dict[str, Dict[str, Any]]:
+        """Latest published snapshot of every other live worker, keyed by worker id."""
+        if self._shared_state is None:
+            return {}
+        # Workers that stopped publishing (exited) drop out after a few intervals
+        snapshots = self._shared_state.worker_metrics(self._publish_interval * 3)
+        snapshots.pop(self.worker_id, None)
+        return snapshots
+
+    def _combined_snapshots(self) -> list:
+        return [self.snapshot(), *self.other_worker_snapshots().values()]
+
+    @staticmethod
+    def _merge_latency(snapshots: list, family_name: str) -> Dict[str, Tuple[List[int], float, float]]:
+        merged: Dict[str, Tuple[List[int], float, float]] = {}
+        for snapshot in snapshots:
+            for name, series in snapshot.get("latency", {}).get(family_name, {}).items():
+                counts, total_seconds, max_seconds = merged.get(name, ([0] * (HISTOGRAM_BUCKETS + 1), 0.0, 0.0))
+                for index, bucket_count in series["buckets"].items():
+                    counts[int(index)] += bucket_count
+                merged[name] = (counts, total_seconds + series["sum"], max(max_seconds, series["max"]))
+        return merged
+
     def get_all_metrics(self) -> Dict[str, Any]:
-        """Get all system metrics."""
+        """Get all system metrics, summed over every live worker when publishing is enabled."""
+        snapshots = self._combined_snapshots()
+        cache_hits = sum(snapshot["cache_hits"] for snapshot in snapshots)
+        cache_operations = cache_hits + sum(snapshot["cache_misses"] for snapshot in snapshots)
+        routes = self._merge_latency(snapshots, "routes")
+        route_headers = self._merge_latency(snapshots, "route_headers")
+        stages = self._merge_latency(snapshots, "stages")
+
+        # Legacy averages are over the sliding window, across all routes
+        window_requests = sum(sum(counts) for counts, _, _ in routes.values())
+        window_seconds = sum(total_seconds for _, total_seconds, _ in routes.values())
+        first_token = summarise_latency(*stages[STAGE_CHAT_FIRST_TOKEN]) if STAGE_CHAT_FIRST_TOKEN in stages else None
         return {
             "uptime_percentage": round(self.get_uptime_percentage(), 1),
-            "avg_response_time": round(self.get_avg_response_time(), 2),
-            "cache_hit_rate": round(self.get_cache_hit_rate(), 1),
-            "api_calls": self.get_api_call_count(),
-            "start_time": datetime.fromtimestamp(self.start_time).isoformat(),
-            "total_requests": len(self.response_times)
+            "avg_response_time": round(window_seconds / window_requests, 2) if window_requests else 0.0,
+            "cache_hit_rate": round(cache_hits / cache_operations * 100, 1) if cache_operations else 0.0,
+            "api_calls": sum(snapshot["api_calls"] for snapshot in snapshots),
+            "start_time": datetime.fromtimestamp(min(snapshot["start_time"] for snapshot in snapshots)).isoformat(),
+            "total_requests": sum(snapshot.get("total_requests", 0) for snapshot in snapshots),
+            "avg_time_to_first_token": round(first_token["avg_ms"] / 1000, 2) if first_token else 0.0,
+            "workers": len(snapshots),
+            "latency": {
+                "window_seconds": self.window_seconds,
+                "routes": {name: summarise_latency(*series) for name, series in sorted(routes.items())},
+                "routes_time_to_headers": {name: summarise_latency(*series) for name, series in sorted(route_headers.items())},
+                "stages": {name: summarise_latency(*series) for name, series in sorted(stages.items())}
+            }
         }
-    
-    def add_mock_data(self):
-        """Add some mock data for demonstration."""
-        # Simulate some API calls and response times
-        import random
-        
-        for _ in range(50):
-            self.record_api_call()
-            self.record_response_time(random.uniform(0.5, 4.0))
-            
-            # Simulate cache operations
-            if random.random() < 0.8:  # 80% cache hit rate
-                self.record_cache_hit()
-            else:
-                self.record_cache_miss()
-        
-        logger.info("[METRICS] Mock data added for demonstration")
 
 # Global instance
-system_metrics = SystemMetricsTracker()
-
-# Add some initial mock data
-system_metrics.add_mock_data()
+system_metrics = SystemMetricsTracker(window_seconds=settings.METRICS_WINDOW_SECONDS)
@@ -0,0 +1,112 @@
+import logging
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .analysis_service import get_top_keywords
+from .rag_service import get_embedding_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Clustering parameters
+MIN_REVIEWS_FOR_CLUSTERING = 6   # Below this, clusters are not meaningful
+MAX_CLUSTERS = 6
+KMEANS_BATCH_SIZE = 256          # Rows per MiniBatchKMeans.partial_fit step
+SNIPPETS_PER_CLUSTER = 3
+SNIPPET_MAX_CHARS = 150
+
+
+def embed_reviews(texts: List[str]) -> np.ndarray:
+    """
+    Embed review texts through the shared embedding cache, so re-running on a
+    grown review set only embeds the reviews not seen before.
+    Returns an L2-normalised float32 matrix with one row per text.
+    """
+    matrix = np.asarray(get_embedding_pipeline().embed(texts), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _choose_cluster_count(n_reviews: int) -> int:
+    """Rule-of-thumb k = sqrt(n/2), bounded to a readable number of topics."""
+    return max(2, min(MAX_CLUSTERS, int(math.sqrt(n_reviews / 2))))
+
+
+def cluster_review_topics(reviews_data: list[dict]) -> List[Dict[str, Any]]:
+    """
+    Mengelompokkan ulasan ke dalam topik berdasarkan embedding.
+    Uses MiniBatchKMeans fed in batches so memory per step stays bounded on large review sets.
+    Returns labelled clusters with sizes and representative snippets, largest first.
+    """
+    # Keep one entry per unique text, preserving order
+    seen = set()
+    reviews = []
+    for review in reviews_data:
+        text = (review.get("text") or "").strip()
+        if text and "ERROR:" not in text and text not in seen:
+            seen.add(text)
+            reviews.append(review)
+
+    if len(reviews) < MIN_REVIEWS_FOR_CLUSTERING:
+        logger.info(f"[TOPICS] Only {len(reviews)} reviews, skipping topic clustering")
+        return []
+
+    texts = [review["text"].strip() for review in reviews]
+
+    try:
+        embeddings = embed_reviews(texts)
+    except Exception as e:
+        logger.error(f"[TOPICS] Failed to embed reviews: {str(e)}")
+        return []
+
+    from sklearn.cluster import MiniBatchKMeans  # Imported on first use; sklearn is slow to import
+
+    n_clusters = _choose_cluster_count(len(texts))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=KMEANS_BATCH_SIZE, random_state=42)
+
+    # partial_fit needs at least n_clusters rows in the first batch
+    first_batch = max(KMEANS_BATCH_SIZE, n_clusters)
+    kmeans.partial_fit(embeddings[:first_batch])
+    for start in range(first_batch, len(embeddings), KMEANS_BATCH_SIZE):
+        kmeans.partial_fit(embeddings[start:start + KMEANS_BATCH_SIZE])
+
+    labels = kmeans.predict(embeddings)
+    distances = np.linalg.norm(embeddings - kmeans.cluster_centers_[labels], axis=1)
+
+    clusters = []
+    for cluster_id in range(n_clusters):
+        member_rows = np.flatnonzero(labels == cluster_id)
+        if len(member_rows) == 0:
+            continue
+
+        member_texts = [texts[row] for row in member_rows]
+        keywords = get_top_keywords(member_texts, top_n=3)
+        label = " / ".join(keyword["text"] for keyword in keywords) or f"Topik {cluster_id + 1}"
+
+        # Representative snippets: members closest to the centroid
+        closest_rows = member_rows[np.argsort(distances[member_rows])[:SNIPPETS_PER_CLUSTER]]
+        snippets = []
+        for row in closest_rows:
+            snippet = texts[row]
+            if len(snippet) > SNIPPET_MAX_CHARS:
+                snippet = snippet[:SNIPPET_MAX_CHARS - 3] + "..."
+            snippets.append(snippet)
+
+        ratings = [reviews[row].get("rating") for row in member_rows]
+        ratings = [rating for rating in ratings if rating and 1 <= rating <= 5]
+
+        clusters.append({
+            "cluster_id": cluster_id,
+            "label": label,
+            "keywords": [keyword["text"] for keyword in keywords],
+            "size": int(len(member_rows)),
+            "share": round(len(member_rows) / len(texts) * 100, 1),
+            "average_rating": round(sum(ratings) / len(ratings), 2) if ratings else None,
+            "representative_snippets": snippets
+        })
+
+    clusters.sort(key=lambda cluster: cluster["size"], reverse=True)
+    logger.info(f"[TOPICS] Clustered {len(texts)} reviews into {len(clusters)} topics")
+    return clusters
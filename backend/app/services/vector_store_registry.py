@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough per-chunk footprint used for the memory budget: a float32 embedding
+# (embedding-001 has 768 dimensions) plus index/bookkeeping overhead.
+EMBEDDING_DIM = 768
+PER_CHUNK_OVERHEAD_BYTES = 1024
+
+# A loader rebuilds or reopens a product's store and returns (store, size_bytes), or None if there is nothing to load
+StoreLoader = Callable[[], Optional[Tuple[Any, int]]]
+
+
+def estimate_store_bytes(chunk_count: int, text_bytes: int) -> int:
+    """Estimate the resident size of a vector store holding chunk_count chunks."""
+    return chunk_count * (EMBEDDING_DIM * 4 + PER_CHUNK_OVERHEAD_BYTES) + text_bytes
+
+
+def collection_name_for(product_id: str, model_name: str) -> str:
+    """
+    Chroma-safe collection name (3-63 chars of [a-zA-Z0-9_-]) for a product ID.
+    The embedding model is part of the name because vectors from different models
+    (and dimensions) cannot share a collection.
+    """
+    digest = hashlib.sha1(f"{model_name}\0{product_id}".encode('utf-8')).hexdigest()[:16]
+    return f"product_{digest}"
+
+
+class VectorStoreRegistry:
+    """
+    Vector stores keyed by product ID with a memory budget and LRU eviction.
+    Stores are loaded on first use and reloaded the same way if they were
+    evicted, so memory use stays under the budget no matter how many products
+    have been analysed. A product registered with its own loader is reloaded
+    through it; every other product (including ones indexed before a restart)
+    goes through default_loader, so only explicitly registered loaders are kept.
+    Evicting a store drops the registry's reference to it; release, if given,
+    is called as well for stores that need explicit cleanup. Persisted stores
+    must not be deleted there, since they are reloaded from disk later.
+    """
+
+    def __init__(self, memory_budget_bytes: int,
+                 default_loader: Optional[Callable[[str], Optional[Tuple[Any, int]]]] = None,
+                 release: Optional[Callable[[str, Any], None]] = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._default_loader = default_loader
+        self._release_store = release
+        self._stores: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()  # product_id -> (store, size_bytes)
+        self._loaders: Dict[str, StoreLoader] = {}  # Only products registered with their own loader
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+        logger.info(f"[VECTORSTORE] Registry initialized with {memory_budget_bytes / (1024 * 1024):.0f} MB budget")
+
+    def register(self, product_id: str, loader: Optional[StoreLoader] = None, store: Any = None, size_bytes: int = 0):
+        """
+        Register a product's store. loader overrides default_loader for reloading
+        it after eviction. If an already built store is given it becomes resident
+        immediately and replaces any previous store.
+        """
+        with self._lock:
+            if loader is not None:
+                self._loaders[product_id] = loader
+            self._load_locks.setdefault(product_id, threading.Lock())
+            previous = self._stores.pop(product_id, None)
+            if store is not None:
+                self._stores[product_id] = (store, size_bytes)
+
+        if previous is not None and previous[0] is not store:
+            self._release(product_id, previous[0])
+        if store is not None:
+            self._enforce_budget(keep=product_id)
+
+    def get(self, product_id: str) -> Optional[Any]:
+        """Return the store for a product, loading it lazily. None if the product is unknown."""
+        with self._lock:
+            if product_id in self._stores:
+                self._stores.move_to_end(product_id)
+                return self._stores[product_id][0]
+            loader = self._loaders.get(product_id)
+            if loader is None and self._default_loader is not None:
+                default_loader = self._default_loader
+                loader = lambda: default_loader(product_id)
+            if loader is None:
+                return None
+            load_lock = self._load_locks.setdefault(product_id, threading.Lock())
+
+        # One load per product at a time; concurrent callers wait and reuse the result
+        with load_lock:
+            with self._lock:
+                if product_id in self._stores:
+                    self._stores.move_to_end(product_id)
+                    return self._stores[product_id][0]
+
+            start_time = time.time()
+            loaded = loader()
+            if loaded is None:
+                with self._lock:
+                    self._forget_load_lock(product_id)
+                return None
+            store, size_bytes = loaded
+            logger.info(f"[VECTORSTORE] Loaded store for {product_id} in {time.time() - start_time:.2f}s "
+                        f"(~{size_bytes / (1024 * 1024):.1f} MB)")
+
+            with self._lock:
+                self._stores[product_id] = (store, size_bytes)
+                self._load_locks.setdefault(product_id, load_lock)
+                self.loads += 1
+
+        self._enforce_budget(keep=product_id)
+        return store
+
+    def invalidate(self, product_id: str):
+        """Drop a product's resident store (e.g. rebuilt by another worker); the next get() reloads it."""
+        with self._lock:
+            evicted = self._stores.pop(product_id, None)
+            self._forget_load_lock(product_id)
+        if evicted is not None:
+            self._release(product_id, evicted[0])
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used stores until the budget is met. The store just used is kept."""
+        evicted = []
+        with self._lock:
+            while self._resident_bytes() > self.memory_budget_bytes and len(self._stores) > 1:
+                product_id, (store, size_bytes) = next(iter(self._stores.items()))
+                if product_id == keep:
+                    self._stores.move_to_end(product_id)
+                    continue
+                del self._stores[product_id]
+                self._forget_load_lock(product_id)
+                self.evictions += 1
+                evicted.append((product_id, store, size_bytes))
+
+        for product_id, store, size_bytes in evicted:
+            logger.info(f"[VECTORSTORE] Evicted {product_id} (~{size_bytes / (1024 * 1024):.1f} MB)")
+            self._release(product_id, store)
+
+    def _resident_bytes(self) -> int:
+        return sum(size_bytes for _, size_bytes in self._stores.values())
+
+    def _forget_load_lock(self, product_id: str):
+        # Load locks of products that are neither resident nor registered would otherwise pile up forever
+        if product_id not in self._loaders:
+            self._load_locks.pop(product_id, None)
+
+    def _release(self, product_id: str, store: Any):
+        if self._release_store is None:
+            return
+        try:
+            self._release_store(product_id, store)
+        except Exception as e:
+            logger.warning(f"[VECTORSTORE] Could not release store for {product_id}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "registered_products": len(self._loaders),
+                "resident_products": len(self._stores),
+                "resident_mb": round(self._resident_bytes() / (1024 * 1024), 1),
+                "budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
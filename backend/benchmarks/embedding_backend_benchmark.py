@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Compare embedding backends for indexing throughput and query latency.
+The cache is bypassed so every text is really embedded.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_backend_benchmark --backends local,remote --texts 1000 --queries 50
+
+The remote backend needs GEMINI_API_KEY; the local backend downloads
+LOCAL_EMBEDDING_MODEL on first use.
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from app.services.embedding_pipeline import EmbeddingPipeline
+from app.services.fake_embeddings import FakeEmbeddings
+from app.services.local_embeddings import LocalEmbeddings
+
+QUERIES = [
+    "apakah barang original?",
+    "bagaimana kualitas kemasannya?",
+    "pengiriman cepat atau lambat?",
+    "ukurannya sesuai tidak?",
+    "apakah baterainya awet?",
+]
+
+
+def create_backend(name: str, args):
+    """Returns (embeddings, pipeline workers) for a backend name."""
+    if name == "local":
+        model = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+        return LocalEmbeddings(model, batch_size=args.batch_size, num_threads=args.threads), 1
+    if name == "remote":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=os.environ["GEMINI_API_KEY"]), args.workers
+    if name == "fake":
+        return FakeEmbeddings(), args.workers
+    raise ValueError(f"Unknown backend: {name}")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def benchmark(name: str, texts: list[str], args) -> None:
+    embeddings, workers = create_backend(name, args)
+
+    start_time = time.time()
+    if hasattr(embeddings, "warm_up"):
+        embeddings.warm_up()
+    load_time = time.time() - start_time
+
+    pipeline = EmbeddingPipeline(embeddings, batch_size=args.batch_size, max_workers=workers)
+    start_time = time.time()
+    pipeline.embed(texts)
+    index_time = time.time() - start_time
+
+    latencies = []
+    for i in range(args.queries):
+        query = f"{QUERIES[i % len(QUERIES)]} ({i})"  # Unique text per query
+        start_time = time.time()
+        embeddings.embed_query(query)
+        latencies.append((time.time() - start_time) * 1000)
+
+    print(f"{name:<8} {load_time:>8.2f}s {len(texts) / index_time:>12.0f} "
+          f"{statistics.median(latencies):>10.1f} {percentile(latencies, 95):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="local,remote", help="Comma-separated: local, remote, fake")
+    parser.add_argument("--texts", type=int, default=1000, help="Reviews to index")
+    parser.add_argument("--queries", type=int, default=50, help="Queries for the latency measurement")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4, help="Pipeline workers for remote/fake backends")
+    parser.add_argument("--threads", type=int, default=4, help="Torch threads for the local backend")
+    args = parser.parse_args()
+
+    texts = [f"Ulasan ke-{i}: barang sesuai pesanan, pengiriman cepat, kualitas {i % 7}" for i in range(args.texts)]
+
+    print(f"{'backend':<8} {'load':>9} {'index txt/s':>12} {'query p50':>10} {'query p95':>10}  (ms)")
+    for name in [backend.strip() for backend in args.backends.split(",") if backend.strip()]:
+        try:
+            benchmark(name, texts, args)
+        except Exception as e:
+            print(f"{name:<8} skipped: {type(e).__name__}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the embedding pipeline.
+Embeds N synthetic reviews through FakeEmbeddings (simulated latency and quota)
+with different batch sizes and worker counts.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_pipeline_benchmark --texts 10000
+"""
+
+import argparse
+import time
+
+from app.services.embedding_pipeline import EmbeddingPipeline
+from app.services.fake_embeddings import FakeEmbeddings
+
+CONFIGURATIONS = [
+    # (label, batch_size, max_workers)
+    ("one text per call", 1, 1),
+    ("batched, sequential", 100, 1),
+    ("batched, 4 workers", 100, 4),
+    ("batched, 8 workers", 100, 8),
+]
+
+
+def run(label: str, texts: list[str], batch_size: int, max_workers: int, args) -> None:
+    fake = FakeEmbeddings(dim=args.dim, latency=args.latency, per_text_latency=args.per_text_latency,
+                          requests_per_second=args.quota)
+    pipeline = EmbeddingPipeline(fake, batch_size=batch_size, max_workers=max_workers,
+                                 base_delay=0.2, max_delay=2.0)
+
+    start_time = time.time()
+    vectors = pipeline.embed(texts)
+    elapsed = time.time() - start_time
+
+    assert len(vectors) == len(texts)
+    print(f"{label:<24} {elapsed:>8.2f}s {len(texts) / elapsed:>10.0f} {fake.requests:>9} "
+          f"{fake.quota_errors:>8} {pipeline.retries:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=10000, help="Number of reviews to embed")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated round trip per call (s)")
+    parser.add_argument("--per-text-latency", type=float, default=0.002, help="Simulated cost per text (s)")
+    parser.add_argument("--quota", type=float, default=10, help="Requests per second before 429s (0 = unlimited)")
+    parser.add_argument("--skip-unbatched", action="store_true", help="Skip the slow one-text-per-call baseline")
+    args = parser.parse_args()
+    args.quota = args.quota or None
+
+    texts = [f"Ulasan ke-{i}: barang sesuai pesanan, pengiriman cepat, kualitas {i % 7}" for i in range(args.texts)]
+
+    print(f"Embedding {len(texts)} texts (latency {args.latency}s/call, quota {args.quota or 'unlimited'} req/s)")
+    print(f"{'configuration':<24} {'time':>9} {'texts/s':>10} {'requests':>9} {'429s':>8} {'retries':>8}")
+    for label, batch_size, max_workers in CONFIGURATIONS:
+        if args.skip_unbatched and batch_size == 1:
+            continue
+        run(label, texts, batch_size, max_workers, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the pure ASGI MetricsMiddleware against the previous
+BaseHTTPMiddleware implementation (reproduced below), and what each records
+for a streamed response. Requests are driven straight through the ASGI
+interface, so the numbers are middleware + routing cost without a server.
+
+Usage (from backend/):
+    python -m benchmarks.metrics_middleware_benchmark --requests 20000 --chunks 20 --chunk-delay-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware.metrics_middleware import MetricsMiddleware, _route_label
+from app.services.system_metrics_service import system_metrics
+
+
+class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware version MetricsMiddleware replaced: times call_next, i.e. until headers."""
+
+    async def dispatch(self, request, call_next):
+        system_metrics.record_api_call()
+        start_time = time.time()
+        response = await call_next(request)
+        response_time = time.time() - start_time
+        system_metrics.record_request(_route_label(request.scope), response_time)
+        response.headers["X-Response-Time"] = f"{response_time:.3f}s"
+        return response
+
+
+def build_app(middleware, chunks: int, chunk_delay: float) -> FastAPI:
+    app = FastAPI()
+    if middleware is not None:
+        app.add_middleware(middleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: str):
+        return {"item_id": item_id, "status": "ok"}
+
+    @app.get("/stream")
+    async def stream():
+        async def tokens():
+            for index in range(chunks):
+                await asyncio.sleep(chunk_delay)
+                yield f"data: {index}\n\n"
+        return StreamingResponse(tokens(), media_type="text/event-stream")
+
+    return app
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000)
+    }
+
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if request_sent:
+            await asyncio.Event().wait()  # Like a server: nothing more until the client disconnects
+        request_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def per_request_us(app, requests: int) -> float:
+    for index in range(200):  # Warm up routing and label caches
+        await call(app, f"/items/{index}")
+    start_time = time.perf_counter()
+    for index in range(requests):
+        await call(app, f"/items/{index}")
+    return (time.perf_counter() - start_time) / requests * 1e6
+
+
+async def streamed_latency_ms(app, runs: int) -> float:
+    system_metrics.routes.clear()
+    for _ in range(runs):
+        await call(app, "/stream")
+    return system_metrics.routes["GET /stream"].summary()["avg_ms"]
+
+
+async def run(args):
+    chunk_delay = args.chunk_delay_ms / 1000
+    variants = [
+        ("none", None),
+        ("BaseHTTPMiddleware (old)", LegacyMetricsMiddleware),
+        ("pure ASGI (new)", MetricsMiddleware)
+    ]
+    baseline = None
+    print(f"{'middleware':>26} {'us/request':>11} {'overhead us':>12} {'stream recorded (ms)':>21}")
+    for label, middleware in variants:
+        app = build_app(middleware, args.chunks, chunk_delay)
+        samples = [await per_request_us(app, args.requests) for _ in range(args.repeats)]
+        cost = statistics.median(samples)
+        baseline = cost if baseline is None else baseline
+        recorded = f"{await streamed_latency_ms(app, 3):.1f}" if middleware else "-"
+        print(f"{label:>26} {cost:>11.1f} {cost - baseline:>12.1f} {recorded:>21}")
+    print(f"\nStreamed response: {args.chunks} chunks x {args.chunk_delay_ms:g}ms "
+          f"= ~{args.chunks * args.chunk_delay_ms:g}ms to the last byte")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
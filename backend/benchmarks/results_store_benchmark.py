@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Page latency of the stored-reviews API backend (ResultsStore) for a product
+with many reviews: the whole product is paged through with keyset cursors,
+unfiltered and filtered by star rating.
+
+Usage (from backend/):
+    python -m benchmarks.results_store_benchmark --reviews 100000 --page-size 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.results_store import ResultsStore
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def page_through(store: ResultsStore, product_id: str, page_size: int, rating=None) -> list[float]:
+    latencies = []
+    cursor = None
+    while True:
+        start_time = time.perf_counter()
+        _, cursor, _ = store.get_reviews(product_id, page_size, cursor, rating=rating)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        if cursor is None:
+            return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--other-products", type=int, default=20, help="Products of 1000 reviews stored alongside")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = ResultsStore(os.path.join(directory, "results.sqlite"))
+        start_time = time.time()
+        for product in range(args.other_products):
+            store.save_reviews(f"shop:other-{product}", "tokopedia", [
+                {"text": f"ulasan {i} produk lain {product}", "rating": rng.randint(1, 5)} for i in range(1000)
+            ])
+        store.save_reviews("shop:big", "tokopedia", (
+            {"text": f"ulasan nomor {i}, barang sesuai pesanan", "rating": rng.choice([1, 2, 3, 4, 5, 5, 5])}
+            for i in range(args.reviews)
+        ))
+        print(f"Stored {args.reviews} reviews in {time.time() - start_time:.1f}s")
+
+        print(f"{'filter':>10} {'pages':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'mean (ms)':>10}")
+        for label, rating in [("none", None), ("rating=5", 5), ("rating=1", 1)]:
+            latencies = page_through(store, "shop:big", args.page_size, rating)
+            print(
+                f"{label:>10} {len(latencies):>6} {percentile(latencies, 50):>9.2f} {percentile(latencies, 95):>9.2f} "
+                f"{percentile(latencies, 99):>9.2f} {statistics.mean(latencies):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Summary latency versus review count for the map-reduce summariser.
+The LLM is simulated with a fixed overhead plus a per-prompt-token cost, so
+the numbers show how the number and size of calls scale, not model quality.
+
+Usage (from backend/):
+    python -m benchmarks.summary_benchmark --counts 40,500,2000,5000 --call-latency 1.5
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.summary_service import MapReduceSummarizer, estimate_tokens
+
+SNIPPETS = [
+    "barang sesuai pesanan, kualitas bagus",
+    "pengiriman lambat, kemasan penyok",
+    "ukuran pas, bahan adem dipakai",
+    "warna beda dengan foto, agak kecewa",
+    "harga murah tapi jahitan kurang rapi",
+    "penjual responsif, recommended",
+]
+
+
+def make_reviews(count: int) -> list[dict]:
+    rng = random.Random(count)
+    return [
+        {"text": f"{rng.choice(SNIPPETS)}. {rng.choice(SNIPPETS)} (ulasan {i})", "rating": rng.choice([1, 2, 3, 4, 5, 5, 5])}
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="40,500,2000,5000", help="Comma-separated review counts")
+    parser.add_argument("--call-latency", type=float, default=1.5, help="Simulated seconds per LLM call")
+    parser.add_argument("--per-token", type=float, default=0.0001, help="Simulated seconds per prompt token")
+    parser.add_argument("--summary-tokens", type=int, default=400, help="Simulated tokens per map/reduce answer")
+    parser.add_argument("--fan-in", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'reviews':>8} {'calls':>6} {'prompt tokens':>14} {'latency (s)':>12}")
+    for count in [int(value) for value in args.counts.split(",")]:
+        calls = []
+
+        async def fake_generate(prompt: str) -> str:
+            tokens = estimate_tokens(prompt)
+            calls.append(tokens)
+            await asyncio.sleep(args.call_latency + tokens * args.per_token)
+            return ("- poin ringkasan " * args.summary_tokens)[:args.summary_tokens * 4]
+
+        summarizer = MapReduceSummarizer(fake_generate, reduce_fan_in=args.fan_in, max_concurrency=args.concurrency)
+        start_time = time.time()
+        asyncio.run(summarizer.summarize(make_reviews(count)))
+        print(f"{count:>8} {len(calls):>6} {sum(calls):>14} {time.time() - start_time:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Query latency of FlatVectorIndex versus an in-memory Chroma collection.
+Queries are issued by vector, so embedding cost is excluded and only the
+index itself is measured.
+
+Usage (from backend/):
+    python -m benchmarks.vector_index_benchmark --sizes 40,500,2000,10000 --queries 200
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+from app.services.fake_embeddings import FakeEmbeddings
+from app.services.flat_vector_index import FlatVectorIndex
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure(search, queries: np.ndarray, k: int) -> list[float]:
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        search(query, k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="40,500,2000,10000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    client = chromadb.EphemeralClient(settings=ChromaSettings(anonymized_telemetry=False))
+
+    print(f"{'chunks':>7} {'index':<7} {'build (ms)':>11} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for size in [int(value) for value in args.sizes.split(",")]:
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"doc-{i}" for i in range(size)]
+        documents = [f"ulasan {i}" for i in range(size)]
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        start_time = time.perf_counter()
+        flat_index = FlatVectorIndex(FakeEmbeddings(dim=args.dim))
+        flat_index.upsert(ids, vectors, documents)
+        flat_build = (time.perf_counter() - start_time) * 1000
+        flat_latencies = measure(lambda q, k: flat_index.similarity_search_by_vector(q, k), queries, args.k)
+
+        start_time = time.perf_counter()
+        collection = client.create_collection(f"bench_{uuid.uuid4().hex[:12]}")
+        for start in range(0, size, 1000):
+            collection.add(ids=ids[start:start + 1000], embeddings=vectors[start:start + 1000],
+                           documents=documents[start:start + 1000])
+        chroma_build = (time.perf_counter() - start_time) * 1000
+        chroma_latencies = measure(lambda q, k: collection.query(query_embeddings=[q], n_results=k), queries, args.k)
+        client.delete_collection(collection.name)
+
+        for name, build, latencies in (("flat", flat_build, flat_latencies), ("chroma", chroma_build, chroma_latencies)):
+            print(f"{size:>7} {name:<7} {build:>11.1f} {statistics.median(latencies):>9.3f} {percentile(latencies, 95):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Tests run from backend/ against the fake LLM and embedding backends, with all state in a scratch directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_scratch = tempfile.mkdtemp(prefix="market-analyzer-tests-")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("EMBEDDING_BACKEND", "fake")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_scratch, "chroma_db"))
+os.environ.setdefault("EMBEDDING_CACHE_DIR", os.path.join(_scratch, "embedding_cache"))
+os.environ.setdefault("RESULTS_DB_PATH", os.path.join(_scratch, "results.sqlite"))
+os.environ.setdefault("SHARED_STATE_PATH", os.path.join(_scratch, "shared_state.sqlite"))
+os.environ.setdefault("PROFILE_DIR", os.path.join(_scratch, "profiles"))
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+
+from app.services.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def make_index():
+    index = BM25Index()
+    index.add(
+        ["1", "2", "3", "4"],
+        [
+            "ukuran xl pas di badan, bahan adem",
+            "pengiriman cepat dan packing rapi",
+            "ukuran l kekecilan, tukar ke xl",
+            "baterai a52s awet seharian",
+        ]
+    )
+    return index
+
+
+def test_tokenize_keeps_sizes_and_model_codes():
+    assert tokenize("Ukuran 40/41, kabel USB-C 1.5m untuk A52s") == ["ukuran", "40/41", "kabel", "usb-c", "1.5m", "untuk", "a52s"]
+
+
+def test_search_ranks_matching_documents():
+    results = make_index().search("pengiriman cepat", k=2)
+    assert results[0][0].id == "2"
+    assert all(score > 0 for _, score in results)
+    assert {document.id for document, _ in make_index().search("ukuran xl", k=4)[:2]} == {"1", "3"}
+
+
+def test_add_skips_known_ids():
+    index = make_index()
+    assert index.add(["1", "5"], ["duplikat", "warna sesuai foto"]) == 1
+    assert len(index) == 5
+
+
+def test_keyword_query_needs_known_specific_terms():
+    index = make_index()
+    assert index.is_keyword_query("a52s")
+    assert index.is_keyword_query("ukuran xl")
+    assert not index.is_keyword_query("iphone 15")
+    assert not index.is_keyword_query("bagaimana kualitas bahannya")
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index()
+    path = str(tmp_path / "product.bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+
+    assert len(loaded) == len(index)
+    assert loaded.search("ukuran xl", k=3) == index.search("ukuran xl", k=3)
+    assert loaded.add(["4"], ["sudah ada"]) == 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    documents = {name: Document(page_content=name) for name in "abcd"}
+    vector = [documents["a"], documents["b"], documents["c"]]
+    lexical = [documents["c"], documents["d"], documents["b"]]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=3)
+    # b and c appear in both lists; c ranks higher overall (ranks 3 and 1 against 2 and 3)
+    assert [document.page_content for document in fused] == ["c", "b", "a"]
+
+
+def test_reciprocal_rank_fusion_deduplicates_by_content():
+    fused = reciprocal_rank_fusion([[Document(page_content="x")], [Document(page_content="x")]], k=5)
+    assert len(fused) == 1
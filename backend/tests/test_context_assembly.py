@@ -0,0 +1,43 @@
+from app.services.context_assembly import MIN_TRIMMED_TOKENS, assemble_context, trim_to_tokens
+from app.services.summary_service import estimate_tokens
+
+
+def test_chunks_within_budget_are_kept_in_order():
+    chunks = ["barang bagus sekali", "pengiriman cepat"]
+    selected, used = assemble_context(chunks, token_budget=100)
+    assert selected == chunks
+    assert used == sum(estimate_tokens(chunk) for chunk in chunks)
+
+
+def test_selection_stops_at_budget_and_trims_last_chunk():
+    chunks = [" ".join(["kata"] * 100), " ".join(["lain"] * 200), "tidak terpakai"]
+    budget = estimate_tokens(chunks[0]) + MIN_TRIMMED_TOKENS + 10
+    selected, used = assemble_context(chunks, token_budget=budget)
+
+    assert len(selected) == 2
+    assert selected[1].endswith(" …")
+    assert used <= budget + 1
+    assert "tidak terpakai" not in selected
+
+
+def test_small_remainder_is_not_trimmed_in():
+    chunks = [" ".join(["kata"] * 100), " ".join(["lain"] * 200)]
+    budget = estimate_tokens(chunks[0]) + MIN_TRIMMED_TOKENS - 1
+    selected, _ = assemble_context(chunks, token_budget=budget)
+    assert selected == chunks[:1]
+
+
+def test_overlap_between_neighbouring_chunks_is_kept_once():
+    shared = "bahan kaosnya tebal dan jahitannya rapi sekali"
+    first = "Saya beli dua kali. " + shared
+    second = shared + " Pasti beli lagi."
+    selected, _ = assemble_context([first, second, shared], token_budget=1000)
+    assert selected == [first, "Pasti beli lagi."]
+
+
+def test_trim_to_tokens_prefers_sentence_boundary():
+    text = "Kalimat pertama cukup panjang. " * 10
+    trimmed = trim_to_tokens(text, 20)
+    assert len(trimmed) <= 20 * 4 + 2
+    assert trimmed.endswith(". …")
+    assert trim_to_tokens("pendek", 20) == "pendek"
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_pipeline import EmbeddingPipeline
+
+
+class BlockingEmbeddings(Embeddings):
+    """Holds every call until gate_at of them are in flight at once, and records the peak."""
+
+    def __init__(self, gate_at, failures=None):
+        self.gate_at = gate_at
+        self.failures = list(failures or [])  # Exceptions raised by the first calls, in order
+        self.batch_sizes = []
+        self.in_flight = 0
+        self.peak = 0
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batch_sizes.append(len(texts))
+            if self.failures:
+                raise self.failures.pop(0)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            if self.in_flight >= self.gate_at:
+                self._full.set()
+        self._full.wait(timeout=2)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(text.split()[1]), 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_texts(count):
+    return [f"ulasan {i}" for i in range(count)]
+
+
+def test_batches_run_concurrently_up_to_max_workers():
+    embedder = BlockingEmbeddings(gate_at=3)
+    pipeline = EmbeddingPipeline(embedder, batch_size=4, max_workers=3)
+    vectors = pipeline.embed(make_texts(30))
+
+    assert embedder.peak == 3
+    assert sorted(embedder.batch_sizes) == [2] + [4] * 7
+    assert [vector[0] for vector in vectors] == list(range(30))
+
+
+def test_on_batch_reports_every_batch_with_its_offset():
+    seen = {}
+    pipeline = EmbeddingPipeline(BlockingEmbeddings(gate_at=2), batch_size=5, max_workers=2)
+    pipeline.embed(make_texts(12), on_batch=lambda offset, texts, vectors: seen.update({offset: (texts, vectors)}))
+
+    assert sorted(seen) == [0, 5, 10]
+    for offset, (texts, vectors) in seen.items():
+        assert texts == make_texts(12)[offset:offset + 5]
+        assert [vector[0] for vector in vectors] == list(range(offset, offset + len(texts)))
+
+
+def test_quota_errors_are_retried_and_other_errors_fail_fast():
+    embedder = BlockingEmbeddings(gate_at=1, failures=[RuntimeError("429 Resource has been exhausted")])
+    pipeline = EmbeddingPipeline(embedder, batch_size=10, max_workers=1, base_delay=0.0)
+    assert len(pipeline.embed(make_texts(3))) == 3
+    assert pipeline.retries == 1
+
+    embedder = BlockingEmbeddings(gate_at=1, failures=[ValueError("API key not valid")])
+    pipeline = EmbeddingPipeline(embedder, batch_size=10, max_workers=1, base_delay=0.0)
+    with pytest.raises(ValueError):
+        pipeline.embed(make_texts(3))
+    assert embedder.batch_sizes == [3]
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+
+from app.services.fake_embeddings import FakeEmbeddings
+from app.services.flat_vector_index import FlatVectorIndex
+
+
+def make_embeddings():
+    return FakeEmbeddings(dim=16, latency=0.0, per_text_latency=0.0)
+
+
+def brute_force_top_k(index, embeddings, query, k):
+    vectors = np.asarray(embeddings.embed_documents(index.get(include=["documents"])["documents"]))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ np.asarray(embeddings.embed_query(query))
+    return [index.get(include=["documents"])["documents"][i] for i in np.argsort(-scores)[:k]]
+
+
+def test_top_k_matches_brute_force_cosine():
+    embeddings = make_embeddings()
+    texts = [f"ulasan nomor {i}" for i in range(50)]
+    index = FlatVectorIndex.from_texts(texts, embeddings)
+
+    results = index.similarity_search_with_score("ulasan nomor 7", k=5)
+    assert results[0][0].page_content == "ulasan nomor 7"
+    assert abs(results[0][1] - 1.0) < 1e-5
+    assert [document.page_content for document, _ in results] == brute_force_top_k(index, embeddings, "ulasan nomor 7", 5)
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_k_larger_than_index_and_empty_index():
+    embeddings = make_embeddings()
+    assert FlatVectorIndex(embeddings).similarity_search("apa saja", k=3) == []
+    index = FlatVectorIndex.from_texts(["a", "b"], embeddings)
+    assert len(index.similarity_search("a", k=10)) == 2
+
+
+def test_upsert_replaces_existing_ids():
+    embeddings = make_embeddings()
+    index = FlatVectorIndex(embeddings)
+    index.upsert(["1", "2"], embeddings.embed_documents(["satu", "dua"]), ["satu", "dua"])
+    index.upsert(["2", "3"], embeddings.embed_documents(["dua baru", "tiga"]), ["dua baru", "tiga"])
+
+    assert index.count() == 3
+    assert index.get(ids=["2", "9"], include=["documents"]) == {"ids": ["2"], "documents": ["dua baru"]}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    embeddings = make_embeddings()
+    path = str(tmp_path / "product")
+    index = FlatVectorIndex.from_texts([f"ulasan {i}" for i in range(20)], embeddings, ids=[str(i) for i in range(20)])
+    index.save(path)
+
+    assert FlatVectorIndex.exists(path)
+    for mmap in (True, False):
+        loaded = FlatVectorIndex.load(path, embeddings, mmap=mmap)
+        assert loaded.count() == 20
+        assert loaded.get(include=["documents"]) == index.get(include=["documents"])
+        assert [document.id for document in loaded.similarity_search("ulasan 3", k=3)] == \
+            [document.id for document in index.similarity_search("ulasan 3", k=3)]
+
+    FlatVectorIndex.delete(path)
+    assert not FlatVectorIndex.exists(path)
+
+
+def test_save_never_replaces_files_a_loaded_index_maps(tmp_path):
+    embeddings = make_embeddings()
+    path = str(tmp_path / "product")
+    FlatVectorIndex.from_texts(["lama"], embeddings, ids=["1"]).save(path)
+    first_version = FlatVectorIndex.version(path)
+    live = FlatVectorIndex.load(path, embeddings, mmap=True)
+
+    FlatVectorIndex.from_texts(["lama", "baru"], embeddings, ids=["1", "2"]).save(path)
+    assert FlatVectorIndex.version(path) != first_version
+    assert FlatVectorIndex.load(path, embeddings).count() == 2
+    assert live.similarity_search("lama", k=1)[0].page_content == "lama"
+    # Only the current version's files remain (on Windows a mapped one would stay until a later save)
+    assert sorted(name.split(".", 1)[1] for name in os.listdir(tmp_path)) == ["current", "json", "npy"]
+
+
+def test_loads_indexes_saved_before_versioning(tmp_path):
+    embeddings = make_embeddings()
+    path = str(tmp_path / "product")
+    index = FlatVectorIndex.from_texts(["a", "b"], embeddings, ids=["1", "2"])
+    np.save(f"{path}.npy", index.get(include=["embeddings"])["embeddings"])
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump({"ids": ["1", "2"], "documents": ["a", "b"]}, f)
+
+    assert FlatVectorIndex.exists(path)
+    assert FlatVectorIndex.load(path, embeddings).count() == 2
+    FlatVectorIndex.load(path, embeddings, mmap=False).save(path)
+    assert not os.path.exists(f"{path}.npy")
+    assert FlatVectorIndex.load(path, embeddings).count() == 2
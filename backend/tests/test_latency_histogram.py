@@ -0,0 +1,46 @@
+from app.services.system_metrics_service import (
+    BUCKET_BOUNDS, HISTOGRAM_BUCKETS, LatencyHistogram, bucket_index, summarise_latency
+)
+
+
+def test_bucket_index_bounds():
+    assert bucket_index(0) == 0
+    assert bucket_index(BUCKET_BOUNDS[10]) == 10
+    assert bucket_index(BUCKET_BOUNDS[10] * 1.01) == 11
+    assert bucket_index(1e9) == HISTOGRAM_BUCKETS
+
+
+def test_percentiles_are_within_bucket_resolution():
+    histogram = LatencyHistogram(window_seconds=60)
+    for millis in range(1, 1001):
+        histogram.record(millis / 1000)
+    summary = histogram.summary()
+
+    assert summary["count"] == 1000
+    assert abs(summary["avg_ms"] - 500.5) < 0.1
+    assert summary["max_ms"] == 1000.0
+    for key, expected in (("p50_ms", 500), ("p95_ms", 950), ("p99_ms", 990)):
+        assert abs(summary[key] - expected) / expected < 0.1
+
+
+def test_percentile_never_exceeds_max_and_empty_summary():
+    histogram = LatencyHistogram(window_seconds=60)
+    histogram.record(0.0123)
+    summary = histogram.summary()
+    assert summary["p50_ms"] <= summary["max_ms"] == 12.3
+    assert summarise_latency([0] * (HISTOGRAM_BUCKETS + 1), 0.0, 0.0)["count"] == 0
+
+
+def test_window_forgets_old_slices_but_lifetime_keeps_them(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.system_metrics_service.time.time", lambda: now[0])
+    histogram = LatencyHistogram(window_seconds=10, slices=10)
+    histogram.record(0.5)
+    now[0] += 5
+    histogram.record(0.1)
+    assert histogram.summary()["count"] == 2
+
+    now[0] += 7  # The first sample's slice left the window
+    assert histogram.summary()["count"] == 1
+    counts, count, total_seconds = histogram.lifetime()
+    assert count == 2 and sum(counts) == 2 and abs(total_seconds - 0.6) < 1e-9
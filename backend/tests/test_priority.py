@@ -0,0 +1,100 @@
+import asyncio
+
+from app.core.priority import BACKGROUND, BULK, INTERACTIVE, PriorityScheduler, parse_lanes
+
+
+def make_scheduler(spec="interactive=64:8,bulk=8:2,background=4:1", max_concurrency=64):
+    return PriorityScheduler(parse_lanes(spec), max_concurrency)
+
+
+def test_parse_lanes_defaults_weight_to_one():
+    assert parse_lanes("interactive=10:4, bulk=2") == [("interactive", 10, 4), ("bulk", 2, 1)]
+
+
+def test_classify_uses_route_default_lane():
+    scheduler = make_scheduler()
+    assert scheduler.classify("/api/v1/chat") == INTERACTIVE
+    assert scheduler.classify("/api/v1/analyze") == BULK
+    assert scheduler.classify("/metrics") == BACKGROUND
+    assert scheduler.classify("/api/v1/system-stats") == BACKGROUND
+    assert scheduler.classify("/api/v1/admin/profiles") == BACKGROUND
+
+
+def test_classify_header_can_only_lower_priority():
+    scheduler = make_scheduler()
+    assert scheduler.classify("/api/v1/analyze", INTERACTIVE) == BULK
+    assert scheduler.classify("/metrics", BULK) == BACKGROUND
+    assert scheduler.classify("/api/v1/chat", BULK) == BULK
+    assert scheduler.classify("/api/v1/analyze", BACKGROUND) == BACKGROUND
+    assert scheduler.classify("/api/v1/chat", "urgent") == INTERACTIVE
+
+
+def test_classify_falls_back_to_lower_lane_when_unconfigured():
+    scheduler = make_scheduler("interactive=10:4,background=2:1")
+    assert scheduler.classify("/api/v1/analyze") == BACKGROUND
+    assert scheduler.classify("/api/v1/analyze", INTERACTIVE) == BACKGROUND
+    assert make_scheduler("interactive=10:4").classify("/metrics") == INTERACTIVE
+
+
+def test_lane_budget_holds_bulk_without_blocking_interactive():
+    async def scenario():
+        scheduler = make_scheduler("interactive=10:4,bulk=2:1", max_concurrency=10)
+        for _ in range(2):
+            assert await scheduler.acquire(BULK) == 0.0
+        third_bulk = asyncio.ensure_future(scheduler.acquire(BULK))
+        await asyncio.sleep(0)
+        assert not third_bulk.done()
+        assert scheduler.lanes[BULK].stats()["queued"] == 1
+
+        # Bulk is at its budget, but server-wide slots remain for interactive requests
+        assert await scheduler.acquire(INTERACTIVE) == 0.0
+
+        scheduler.release(BULK, 0.1)
+        await asyncio.wait_for(third_bulk, 1)
+        assert scheduler.lanes[BULK].active == 2
+        assert scheduler.lanes[BULK].completed == 1
+        assert scheduler.active == 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        scheduler = make_scheduler("interactive=1:1", max_concurrency=1)
+        await scheduler.acquire(INTERACTIVE)
+        waiter = asyncio.ensure_future(scheduler.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release(INTERACTIVE, 0.1)
+        assert scheduler.active == 0
+        assert scheduler.lanes[INTERACTIVE].stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stride_dispatch_shares_slots_by_weight():
+    async def scenario():
+        scheduler = make_scheduler("interactive=10:3,bulk=10:1", max_concurrency=1)
+        await scheduler.acquire(INTERACTIVE)
+        granted = []
+
+        async def request(lane):
+            await scheduler.acquire(lane)
+            granted.append(lane)
+
+        tasks = [asyncio.ensure_future(request(lane)) for lane in [INTERACTIVE] * 8 + [BULK] * 8]
+        await asyncio.sleep(0)
+        held = INTERACTIVE
+        for _ in range(8):
+            scheduler.release(held, 0.0)
+            await asyncio.sleep(0)
+            held = granted[-1]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return granted
+
+    granted = asyncio.run(scenario())
+    # Weights 3:1 give bulk one slot in every four, interleaved rather than after the interactive backlog
+    assert granted == [INTERACTIVE, BULK, INTERACTIVE, INTERACTIVE, INTERACTIVE, BULK, INTERACTIVE, INTERACTIVE]
@@ -0,0 +1,60 @@
+import re
+
+from app.services.prometheus_exporter import CONTENT_TYPE, METRIC_PREFIX, _Exposition, _labels, render_metrics
+from app.services.system_metrics_service import HISTOGRAM_BUCKETS, system_metrics
+
+
+def test_exposition_histogram_is_cumulative():
+    counts = [0] * (HISTOGRAM_BUCKETS + 1)
+    counts[0] = 2
+    counts[5] = 3
+    counts[HISTOGRAM_BUCKETS] = 1
+    exposition = _Exposition()
+    exposition.histogram("demo_seconds", "Demo.", _labels(route="/x"), counts, 6, 12.5)
+    lines = exposition.render().splitlines()
+
+    assert lines[0] == f"# HELP {METRIC_PREFIX}_demo_seconds Demo."
+    assert lines[1] == f"# TYPE {METRIC_PREFIX}_demo_seconds histogram"
+    buckets = [line for line in lines if "_bucket{" in line]
+    values = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert values == sorted(values)
+    assert buckets[0] == f'{METRIC_PREFIX}_demo_seconds_bucket{{route="/x",le="0.0001"}} 2'
+    assert buckets[-1] == f'{METRIC_PREFIX}_demo_seconds_bucket{{route="/x",le="+Inf"}} 6'
+    assert values[-2] == 5  # The overflow sample only shows up in +Inf
+    assert f'{METRIC_PREFIX}_demo_seconds_count{{route="/x"}} 6' in lines
+    assert f'{METRIC_PREFIX}_demo_seconds_sum{{route="/x"}} 12.5' in lines
+
+
+def test_label_values_are_escaped():
+    assert _labels(route='a"b\\c\nd') == 'route="a\\"b\\\\c\\nd"'
+
+
+def test_render_metrics_is_valid_text_format():
+    system_metrics.record_request("GET /api/v1/products/{product_id}/reviews", 0.02, time_to_headers=0.01, bytes_sent=512)
+    system_metrics.record_cache_hit("responses")
+    text = render_metrics()
+
+    assert text.endswith("\n")
+    label = r'[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+    sample = re.compile(rf'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{{{label}(,{label})*\}})? -?[0-9.e+Inf-]+$')
+    families = set()
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            name = line.split()[2]
+            assert name not in families  # One header per family
+            families.add(name)
+        elif not line.startswith("# HELP "):
+            assert sample.match(line), line
+    assert f"{METRIC_PREFIX}_request_duration_seconds" in families
+    assert 'route="/api/v1/products/{product_id}/reviews"' in text
+    assert re.search(rf'{METRIC_PREFIX}_cache_hits_total\{{worker="[^"]+",cache="responses"\}} [1-9]', text)
+
+
+def test_metrics_endpoint_content_type():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
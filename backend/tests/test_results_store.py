@@ -0,0 +1,96 @@
+import pytest
+
+from app.services.results_store import ResultsStore, decode_cursor, encode_cursor, review_source
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(str(tmp_path / "results.sqlite"))
+
+
+def reviews(count, rating=5):
+    return [{"text": f"ulasan {i}", "rating": rating} for i in range(count)]
+
+
+def test_review_source_from_url():
+    assert review_source("https://www.tokopedia.com/toko/produk") == "tokopedia"
+    assert review_source("https://m.shopee.co.id/x") == "shopee"
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(ValueError):
+        decode_cursor("bukan-cursor")
+
+
+def test_pages_follow_cursor_without_gaps_or_repeats(store):
+    store.save_reviews("p1", "tokopedia", reviews(25))
+    seen, cursor, totals = [], None, []
+    while True:
+        page, cursor, total = store.get_reviews("p1", limit=10, cursor=cursor)
+        seen.extend(review["text"] for review in page)
+        totals.append(total)
+        if cursor is None:
+            break
+
+    assert seen == [f"ulasan {i}" for i in range(25)]
+    assert totals == [25, None, None]  # The total is only counted for the first page
+
+
+def test_filters_and_duplicates(store):
+    store.save_reviews("p1", "tokopedia", reviews(3, rating=5))
+    store.save_reviews("p1", "tokopedia", reviews(3, rating=5))  # Same texts are ignored
+    store.save_reviews("p1", "shopee", [{"text": "jelek", "rating": 1}, {"text": "ERROR: gagal", "rating": None}])
+
+    assert store.get_reviews("p1", limit=10)[2] == 4
+    assert [review["text"] for review in store.get_reviews("p1", limit=10, rating=1)[0]] == ["jelek"]
+    assert store.get_reviews("p1", limit=10, source="tokopedia")[2] == 3
+    assert store.get_reviews("p2", limit=10) == ([], None, 0)
+
+
+def test_record_reviews_passes_reviews_through(store):
+    passed = list(store.record_reviews("p1", "tokopedia", iter(reviews(3))))
+    assert passed == reviews(3)
+    assert store.get_reviews("p1", limit=10)[2] == 3
+
+
+def test_analysis_etag_is_stable_until_data_changes(store):
+    store.save_reviews("p1", "tokopedia", reviews(3))
+    store.save_analysis("p1", {"summary": "bagus"})
+    analyzed_at, analysis, etag = store.get_analysis("p1")
+
+    assert analysis == {"summary": "bagus"}
+    assert etag.startswith('"') and etag.endswith('"')
+    assert store.get_analysis("p1") == (analyzed_at, analysis, etag)
+
+    store.save_reviews("p1", "tokopedia", [{"text": "ulasan baru", "rating": 4}])
+    store.save_analysis("p1", {"summary": "bagus"})
+    assert store.get_analysis("p1")[2] != etag
+    assert store.get_analysis("p2") is None
+
+
+def test_analysis_survives_reopening(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    ResultsStore(path).save_analysis("p1", {"summary": "bagus"})
+    _, analysis, etag = ResultsStore(path).get_analysis("p1")
+    assert analysis == {"summary": "bagus"}
+    assert etag == ResultsStore(path).get_analysis("p1")[2]
+
+
+def test_analysis_endpoint_answers_matching_etag_with_304():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.results_store import get_results_store
+
+    get_results_store().save_analysis("etag-product", {
+        "summary": "bagus", "product_metadata": {}, "seller_reputation": None,
+        "chart_data": {"rating_distribution": [], "positive_keywords": [], "negative_keywords": []}
+    })
+    with TestClient(app) as client:
+        first = client.get("/api/v1/products/etag-product/analysis")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        assert client.get("/api/v1/products/etag-product/analysis", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/api/v1/products/etag-product/analysis", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+        assert client.get("/api/v1/products/etag-product/analysis", headers={"If-None-Match": '"lain"'}).status_code == 200
@@ -0,0 +1,105 @@
+import asyncio
+
+from app.services.summary_service import MapReduceSummarizer, build_summary_groups, estimate_tokens
+
+
+def make_reviews(count, rating=5, words=20):
+    return [{"text": f"ulasan {i} " + "bagus " * words, "rating": rating} for i in range(count)]
+
+
+def test_groups_keep_every_review_within_budget():
+    reviews = make_reviews(300, rating=5) + make_reviews(120, rating=3) + make_reviews(80, rating=1)
+    groups = build_summary_groups(reviews, group_token_budget=500, review_max_chars=600)
+
+    assert sum(len(group["reviews"]) for group in groups) == len(reviews)
+    assert {group["bucket"] for group in groups} == {"positif", "netral", "negatif"}
+    for group in groups:
+        assert sum(estimate_tokens(text) for text in group["reviews"]) <= 500
+    assert {group["bucket"]: group["bucket_size"] for group in groups} == {"positif": 300, "netral": 120, "negatif": 80}
+
+
+def test_groups_skip_empty_and_truncate_long_reviews():
+    reviews = [{"text": "   ", "rating": 5}, {"text": "x" * 1000, "rating": 4}]
+    groups = build_summary_groups(reviews, group_token_budget=3000, review_max_chars=100)
+    assert [group["reviews"] for group in groups] == [["x" * 100]]
+
+
+def test_groups_past_the_cap_sample_each_bucket_proportionally():
+    reviews = make_reviews(3000, rating=5) + make_reviews(1000, rating=1)
+    groups = build_summary_groups(reviews, group_token_budget=500, review_max_chars=600, max_groups=20)
+
+    per_bucket = {}
+    for group in groups:
+        per_bucket[group["bucket"]] = per_bucket.get(group["bucket"], 0) + 1
+    assert len(groups) <= 20
+    assert per_bucket["positif"] > per_bucket["negatif"] >= 1
+    positive = [int(text.split()[1]) for group in groups if group["bucket"] == "positif" for text in group["reviews"]]
+    assert positive[0] == 0 and positive[-1] > 2500  # Sampled across the whole bucket, not just its head
+
+
+def test_oversized_review_gets_its_own_group():
+    reviews = [{"text": "a" * 400, "rating": 5}, {"text": "b" * 40, "rating": 5}]
+    groups = build_summary_groups(reviews, group_token_budget=50, review_max_chars=1000)
+    assert [len(group["reviews"]) for group in groups] == [1, 1]
+
+
+def test_small_review_set_takes_one_call():
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        return "ringkasan"
+
+    asyncio.run(MapReduceSummarizer(generate).summarize(make_reviews(5)))
+    assert len(prompts) == 1
+
+
+def test_large_review_set_is_reduced_recursively_without_dropping_reviews():
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        return "- poin " * 200
+
+    reviews = make_reviews(2000)
+    summarizer = MapReduceSummarizer(generate, group_token_budget=1000, reduce_fan_in=3, max_concurrency=4,
+                                     max_map_groups=100)
+    asyncio.run(summarizer.summarize(reviews))
+
+    map_prompts = [prompt for prompt in prompts if "Ulasan:" in prompt]
+    mapped = "".join(map_prompts)
+    assert all(f"ulasan {i} " in mapped for i in range(len(reviews)))
+    # Map answers exceed the budget together, so some merges happen before the final reduce
+    assert len(prompts) > len(map_prompts) + 1
+    assert "dari 2000 ulasan produk" in prompts[-1]
+
+
+def test_failed_reduce_step_keeps_partials():
+    calls = []
+
+    async def generate(prompt):
+        calls.append(prompt)
+        if "Gabungkan menjadi satu daftar" in prompt:
+            raise RuntimeError("LLM tidak tersedia")
+        return "- poin " * 200
+
+    summarizer = MapReduceSummarizer(generate, group_token_budget=1000, reduce_fan_in=2)
+    asyncio.run(summarizer.summarize(make_reviews(300)))
+    assert "Ringkasan parsial" in calls[-1]
+
+
+def test_llm_calls_stay_bounded_as_reviews_grow():
+    call_counts = []
+    for review_count in (2000, 20000):
+        prompts = []
+
+        async def generate(prompt):
+            prompts.append(prompt)
+            return "- poin " * 200
+
+        summarizer = MapReduceSummarizer(generate, group_token_budget=1000, reduce_fan_in=3, max_map_groups=16)
+        asyncio.run(summarizer.summarize(make_reviews(review_count)))
+        call_counts.append(len(prompts))
+
+    assert all(count <= 2 * 16 for count in call_counts)
+    assert call_counts[0] == call_counts[1]
@@ -0,0 +1,73 @@
+from app.services.vector_store_registry import VectorStoreRegistry
+
+
+def make_registry(budget_bytes=250):
+    released = []
+    registry = VectorStoreRegistry(budget_bytes, release=lambda product_id, store: released.append(product_id))
+    return registry, released
+
+
+def loader_for(product_id, size_bytes=100, calls=None):
+    def load():
+        if calls is not None:
+            calls.append(product_id)
+        return f"store-{product_id}", size_bytes
+    return load
+
+
+def test_least_recently_used_store_is_evicted_over_budget():
+    registry, released = make_registry()
+    for product_id in ("a", "b"):
+        registry.register(product_id, loader_for(product_id), store=f"store-{product_id}", size_bytes=100)
+    registry.get("a")  # "b" is now least recently used
+    registry.register("c", loader_for("c"), store="store-c", size_bytes=100)
+
+    assert released == ["b"]
+    assert registry.stats()["resident_products"] == 2
+    assert registry.stats()["evictions"] == 1
+
+
+def test_evicted_store_is_reloaded_through_its_loader():
+    registry, _ = make_registry()
+    calls = []
+    registry.register("a", loader_for("a", calls=calls), store="store-a", size_bytes=100)
+    registry.register("b", loader_for("b"), store="store-b", size_bytes=100)
+    registry.register("c", loader_for("c"), store="store-c", size_bytes=100)
+
+    assert registry.get("a") == "store-a"
+    assert calls == ["a"]
+    assert registry.stats()["loads"] == 1
+
+
+def test_store_just_used_is_kept_even_if_over_budget_alone():
+    registry, released = make_registry(budget_bytes=50)
+    registry.register("a", loader_for("a"), store="store-a", size_bytes=100)
+    assert released == []
+    assert registry.get("a") == "store-a"
+
+
+def test_unknown_product_uses_default_loader_or_returns_none():
+    registry = VectorStoreRegistry(1000, default_loader=lambda product_id: (f"disk-{product_id}", 10) if product_id == "x" else None,
+                                   release=lambda product_id, store: None)
+    assert registry.get("x") == "disk-x"
+    assert registry.get("missing") is None
+    assert registry.stats()["registered_products"] == 0  # Default-loaded products keep no loader of their own
+
+
+def test_products_without_a_loader_are_reloaded_through_the_default_loader():
+    calls = []
+    registry = VectorStoreRegistry(150, default_loader=lambda product_id: calls.append(product_id) or (f"disk-{product_id}", 100))
+    registry.register("a", store="store-a", size_bytes=100)
+    registry.register("b", store="store-b", size_bytes=100)  # Evicts "a"; without a release callback nothing is deleted
+
+    assert registry.get("a") == "disk-a"
+    assert calls == ["a"]
+    assert registry.stats()["registered_products"] == 0
+
+
+def test_replacing_a_store_releases_the_previous_one():
+    registry, released = make_registry(budget_bytes=1000)
+    registry.register("a", loader_for("a"), store="old", size_bytes=100)
+    registry.register("a", loader_for("a"), store="new", size_bytes=100)
+    assert released == ["a"]
+    assert registry.get("a") == "new"
@@ -38,6 +38,7 @@ interface SellerReputation {
 
 interface AnalysisResult {
   message: string;
+  product_id?: string;
   summary: string;
   product_metadata?: ProductMetadata;
   seller_reputation?: SellerReputation;
@@ -99,26 +100,45 @@ const DashboardPage = () => {
     try {
       const apiBaseUrl =
         import.meta.env.VITE_API_BASE_URL || "http://localhost:8000";
-      const response = await fetch(`${apiBaseUrl}/api/v1/chat`, {
+      const response = await fetch(`${apiBaseUrl}/api/v1/chat/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
         body: JSON.stringify({
           query: message, // Changed from 'message' to 'query' to match backend
+          product_id: analysisResult.product_id, // Scopes the chat to this product's reviews
           product_metadata: analysisResult.product_metadata, // Include product metadata
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error("Chat request failed");
       }
 
-      const result = await response.json();
-      setChatMessages([
-        ...newMessages,
-        { role: "assistant", content: result.answer }, // Changed from 'response' to 'answer'
-      ]);
+      // Server-Sent Events: each "data" line carries {"token": "..."}
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const event of events) {
+          const dataLine = event
+            .split("\n")
+            .find((line) => line.startsWith("data: "));
+          if (!dataLine || event.startsWith("event: done")) continue;
+          answer += JSON.parse(dataLine.slice(6)).token ?? "";
+        }
+        setChatMessages([
+          ...newMessages,
+          { role: "assistant", content: answer },
+        ]);
+      }
     } catch (error) {
       console.error("Chat error:", error);
       // Handle error